@@ -3,6 +3,7 @@ import os
 import pickle
 from comet_ml import API
 from joblib import Logger
+from package.ift6758.features.encoding import ENCODER_FILE, CategoryEncoder
 
 
 class CometMLClient:
@@ -52,4 +53,14 @@ class CometMLClient:
             return model
         except:
             logger.error(f'Failed to load model {model_name} from {model_file_path}')
-            return None
\ No newline at end of file
+            return None
+
+    def get_encoder(self, model_name, logger: Logger):
+        """
+        Loads the encoder saved with a model downloaded by get_model, None for models trained without one
+        """
+        encoder_file_path = os.path.join(self.data_dir, model_name, ENCODER_FILE)
+        if not os.path.exists(encoder_file_path):
+            logger.info(f'No encoder for model {model_name}, features are used as they are sent')
+            return None
+        return CategoryEncoder.load(encoder_file_path)
@@ -2,18 +2,19 @@ import requests
 import pandas as pd
 from ift6758.features.ingenierie import features_live_game
 from ift6758.data.cleaning import DataCleaner
+from ift6758.data import NHL_GAME_URL
 
 
 class LiveGameClient:
-    def __init__(self):
-        self.base_url = "https://api-web.nhle.com/v1/gamecenter"
+    def __init__(self, game_url=NHL_GAME_URL):
+        self.game_url = game_url
         self.cleaner = DataCleaner(data_raw=None, data_path_clean="./") # don't need args for live game
         self.current_game_id = None
         self.game_plays_cache = {}
         self.games_cached = {}
 
     def update_new_game_plays(self, game_id):
-        url = f"{self.base_url}/{game_id}/play-by-play"
+        url = self.game_url.format(GAME_ID=game_id)
         most_recent_play_num = self.game_plays_cache[game_id]['play_nums'][-1] if self.game_plays_cache[game_id]['play_nums'] else 0
 
         response = requests.get(url)
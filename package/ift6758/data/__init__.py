@@ -1,8 +1,13 @@
+import os
 from enum import Enum
 
-NHL_GAME_URL = 'https://api-web.nhle.com/v1/gamecenter/{GAME_ID}/play-by-play'
+# Both can be pointed at a local replay server (see replay_server.py) to work without the network
+NHL_GAME_URL = os.environ.get('NHL_GAME_URL', 'https://api-web.nhle.com/v1/gamecenter/{GAME_ID}/play-by-play')
+NHL_SCHEDULE_URL = os.environ.get('NHL_SCHEDULE_URL', 'https://api.nhle.com/stats/rest/en/game?cayenneExp=season={SEASON_ID}')
 NB_MAX_REGULAR_GAMES_PER_SEASON = 1353
 WANTED_EVENTS = ['shot-on-goal', 'goal', 'missed_shot']
+# Top-level keys of the play-by-play that DataCleaner needs, the rest is never decoded when cleaning
+CLEANING_GAME_KEYS = ['id', 'plays', 'homeTeam', 'awayTeam', 'rosterSpots']
 
 class SeasonType(Enum):
     REGULAR = '02'
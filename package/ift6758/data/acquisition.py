@@ -1,86 +1,132 @@
 import os
 import requests
 import pickle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-from package.ift6758.data import NB_MAX_REGULAR_GAMES_PER_SEASON, NHL_GAME_URL, SeasonType
-    
+from package.ift6758.data import NB_MAX_REGULAR_GAMES_PER_SEASON, NHL_GAME_URL, NHL_SCHEDULE_URL, SeasonType
+from package.ift6758.data.discovery import GameIndex, is_final
+from package.ift6758.data.fetcher import NHLApiFetcher
+from package.ift6758.data.storage import RawGameStore
+
+
 class NHLGameData:
-    def __init__(self, data_path, base_url=NHL_GAME_URL):
+    def __init__(self, data_path, base_url=NHL_GAME_URL, workers : int = 1, max_requests_per_second : float = None, schedule_url=NHL_SCHEDULE_URL, keep_in_memory : bool = True, fetcher : NHLApiFetcher = None):
+        """
+            Args:
+                data_path (str): Folder where the raw games are cached.
+                base_url (str): Play-by-play URL template with a {GAME_ID} placeholder.
+                schedule_url (str): Season schedule URL template with a {SEASON_ID} placeholder, used to discover game IDs.
+                workers (int): Number of games downloaded concurrently. 1 keeps the sequential behaviour.
+                max_requests_per_second (float): Per-host rate limit shared by all workers. None disables it.
+                keep_in_memory (bool): Keep every fetched game in self.data. When False, games stay on disk and are read through iter_games.
+                fetcher (NHLApiFetcher): HTTP layer (retries, backoff, rate limit). Defaults to one using max_requests_per_second.
+        """
         self.base_url = base_url
+        self.schedule_url = schedule_url
         self.data_path = data_path
         self.data = {}
+        self.keep_in_memory = keep_in_memory
+        self.store = RawGameStore(data_path)
+        self.index = GameIndex(data_path)
+        self.workers = max(1, workers)
+        self.fetcher = fetcher if fetcher is not None else NHLApiFetcher(max_requests_per_second)
+        self._revalidate = False
         
         os.makedirs(data_path, exist_ok=True)
 
     def __add__(self, other):
-        new_instance = NHLGameData(data_path=self.data_path)
+        new_instance = NHLGameData(data_path=self.data_path, base_url=self.base_url, workers=self.workers, schedule_url=self.schedule_url, keep_in_memory=self.keep_in_memory, fetcher=self.fetcher)
         new_instance.data = {**self.data, **other.data}
         return new_instance
 
     def _ensure_dir(self, path):
         os.makedirs(path, exist_ok=True)
-    
-    def _fetch_game_from_api(self, url : str):
+
+    def _fetch_game_from_api(self, url : str, validators : dict = None):
         """
-            Fetches game data from the NHL API and returns it as a dictionary.
+            Fetches game data from the NHL API.
+            Transient errors are retried by the fetcher and raise requests.HTTPError once the retries are exhausted.
             
             Args:
                 url (str): The URL to fetch the data from.
+                validators (dict): ETag / Last-Modified of the cached copy, to only download the game if it changed.
         """
-        response = self.session.get(url)
-        if response.status_code != 200:
-            return None
-
-        return response.json()
+        return self.fetcher.get_json(url, validators)
     
     def _get_from_cache(self, season: int, season_type: SeasonType) -> bool:
         """
             Retrieve games data from downloaded cache for a specific season and season type.
-            Returns True if cache was found, else return False.
+            Returns True if the season type was completely downloaded, else return False.
+            A season pickle written by older versions is split into the per-game cache the first time it is read.
             
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
                 season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
         """
-
-        games_path = os.path.join(self.data_path, str(season))
-        self._ensure_dir(games_path)
-        local_file_path = os.path.join(games_path, f"{season}-{season_type.name.lower()}.pkl")
-
         if season not in self.data:
             self.data[season] = {}
         
         if season_type.name.lower() not in self.data[season]:
             self.data[season][season_type.name.lower()] = []
 
-        if os.path.exists(local_file_path):
-            print(f'Loading from cache file {local_file_path}')
-            with open(local_file_path, 'rb') as pickle_file:
-                local_data = pickle.load(pickle_file)
-                self.data[season][season_type.name.lower()] = local_data
-                print(f'Found {len(local_data)} {season_type.name.lower()} games for season {season}-{season+1}')
-                return True
-        return False
+        if not self.store.is_complete(season, season_type):
+            legacy_file_path = os.path.join(self.data_path, str(season), f"{season}-{season_type.name.lower()}.pkl")
+            if not os.path.exists(legacy_file_path):
+                return False
+
+            print(f'Importing legacy cache file {legacy_file_path}')
+            with open(legacy_file_path, 'rb') as pickle_file:
+                self.store.import_games(season, season_type, pickle.load(pickle_file))
+
+        if self.keep_in_memory:
+            print(f'Loading {season_type.name.lower()} games for season {season}-{season+1} from cache')
+            self.data[season][season_type.name.lower()] = self.store.load_games(season, season_type)
+        print(f'Found {len(self.store.game_ids(season, season_type))} {season_type.name.lower()} games for season {season}-{season+1}')
+        return True
     
     def _save_to_cache(self, season: int, season_type: SeasonType):
         """
-            Save games data to cache for a specific season and season type
+            Marks a season type as completely downloaded.
+            Games themselves are written to the cache one by one as they are downloaded.
             
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
                 season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
         """
         print('Saving to cache...')
-        games_path = os.path.join(self.data_path, str(season))
-        self._ensure_dir(games_path)
-        local_file_path = os.path.join(games_path, f"{season}-{season_type.name.lower()}.pkl")
+        self.store.set_complete(season, season_type)
 
-        with open(local_file_path, 'wb') as out_file:
-            pickle.dump(self.data[season][season_type.name.lower()], out_file)
+    def load_games(self, season: int, season_type: SeasonType, game_ids: list[int] = None, keys: list[str] = None) -> list[dict]:
+        """
+            Loads games from the cache without downloading anything.
+            Only the manifest and the requested games are read from disk.
+            
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
+                game_ids (list[int]): Games to load. Defaults to every cached game of the season type.
+                keys (list[str]): Top-level keys to decode (e.g. CLEANING_GAME_KEYS). Defaults to every key.
+        """
+        return self.store.load_games(season, season_type, game_ids, keys)
+
+    def iter_games(self, season: int, season_type: SeasonType = None, game_ids: list[int] = None, keys: list[str] = None):
+        """
+            Lazily yields cached games, one at a time, in the same order as self.data[season] (regular then playoff games).
+            Only the requested top-level keys are decompressed, which keeps memory flat when going through several seasons.
+            
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): Restrict to one season type. Defaults to both.
+                game_ids (list[int]): Games to load. Defaults to every cached game.
+                keys (list[str]): Top-level keys to decode (e.g. CLEANING_GAME_KEYS). Defaults to every key.
+        """
+        for game_type in ([season_type] if season_type is not None else SeasonType):
+            yield from self.store.iter_games(season, game_type, game_ids, keys)
     
     def fetch_game(self, season : int, game_type : SeasonType, game_num : str) -> dict:
         """
-            Fetches game data from the NHL API and saves it to a local file.
+            Fetches game data from the NHL API. Returns None if the game does not exist.
             
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
@@ -90,12 +136,175 @@ class NHLGameData:
         game_id = f"{season}{game_type.value}{game_num}"
         url = self.base_url.format(GAME_ID=game_id)
         
-        return self._fetch_game_from_api(url)
+        return self._fetch_game_from_api(url).data
+
+    def _get_game(self, season : int, game_type : SeasonType, game_num : str) -> dict:
+        """
+            Returns a game from the per-game cache, or downloads and caches it if it is missing.
+            Game IDs the API confirmed do not exist are answered from the negative cache without a request,
+            a 404 for a game the schedule lists is not cached since the game exists (see GameIndex.add_missing).
+            When revalidating, cached games are requested again with their ETag / Last-Modified and only downloaded if they changed.
+            Games that are not over yet are returned without being cached, so they are downloaded again once they are.
+        """
+        game_id = int(f"{season}{game_type.value}{game_num}")
+        cached = self.store.has_game(season, game_type, game_id)
+        if cached and not self._revalidate:
+            return self.store.load_game(season, game_type, game_id)
+        if not cached and self.index.is_missing(season, game_id):
+            return None
+
+        validators = self.store.validators(season, game_type, game_id) if cached else None
+        result = self._fetch_game_from_api(self.base_url.format(GAME_ID=game_id), validators)
+        if result.status == 304:
+            return self.store.load_game(season, game_type, game_id)
+        if result.data is None:
+            self.index.add_missing(season, game_id)
+            return None
+        if not is_final(result.data):
+            return result.data
+
+        self.store.save_game(season, game_type, result.data, result.validators)
+        return result.data
+
+    def _discover_game_ids(self, season : int, game_type : SeasonType) -> list[int] | None:
+        """
+            Returns the IDs of every game of a season type that is over from the game index, loading the season schedule if needed.
+            Returns None when the schedule is unavailable, in which case games have to be found by probing.
+        """
+        if not self.index.is_complete(season, game_type):
+            self.index.load_schedule(season, self.fetcher, self.schedule_url)
+
+        if self.index.is_complete(season, game_type) or self.index.has_pending(season, game_type):
+            return self.index.valid_ids(season, game_type)
+        return None
+
+    def _fetch_games(self, season : int, game_type : SeasonType, game_ids : list[int]) -> tuple[list[dict], list[int]]:
+        """
+            Fetches a known list of games concurrently.
+            Returns the games found, in game ID order, and the IDs that failed because of a transient error or a 404.
+        """
+        def get_game(game_id):
+            try:
+                game = self._get_game(season, game_type, str(game_id)[6:])
+            except requests.RequestException:
+                return game_id
+            # Every ID comes from the schedule, so a game that was not found is retried on the next run like a transient error
+            return game_id if game is None else game
+
+        games, failed = [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(get_game, sorted(game_ids))
+            for result in tqdm(results, total=len(game_ids), desc=f"Downloading {game_type.name.lower()} games for season {season}-{season+1}"):
+                if isinstance(result, dict):
+                    games.append(result)
+                elif result is not None:
+                    failed.append(result)
+        return games, failed
+                
+    def _fetch_until_missing(self, season : int, game_type : SeasonType, game_nums, progress=None) -> tuple[list[dict], list[int]]:
+        """
+            Fetches games in the given order until the first one that does not exist.
+            Up to self.workers requests are in flight at once but results are consumed in order,
+            so the returned list is identical to a sequential download.
+            A transient error (e.g. a 503) skips the game instead of ending the season; its ID is returned so it can be retried.
+            
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                game_type (SeasonType): The type of game (regular or playoff).
+                game_nums (iterable): Game numbers (as formatted strings) to fetch, in order.
+                progress (tqdm): Optional progress bar updated for every game found.
+        """
+        games, failed = [], []
+        game_nums = iter(game_nums)
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            def submit_next():
+                game_num = next(game_nums, None)
+                if game_num is not None:
+                    pending.append((game_num, executor.submit(self._get_game, season, game_type, game_num)))
+
+            for _ in range(self.workers):
+                submit_next()
+
+            while pending:
+                game_num, future = pending.popleft()
+                try:
+                    game = future.result()
+                except requests.RequestException:
+                    failed.append(int(f"{season}{game_type.value}{game_num}"))
+                    submit_next()
+                    continue
+
+                if game is None:
+                    for _, future in pending:
+                        future.cancel()
+                    break
+                games.append(game)
+                if progress is not None:
+                    progress.update(1)
+                submit_next()
+
+        return games, failed
+
+    def _fetch_playoff_series(self, season : int, round : int, matchup : int) -> tuple[list[dict], list[int]]:
+        """
+            Fetches the games of one playoff series, stopping at the first game that was not played.
+            A transient error also stops the series since the following games cannot be told apart from unplayed ones.
+        """
+        games = []
+        for game in range(1, 8):
+            game_num = f"{round:02d}{matchup}{game}"
+            try:
+                game = self._get_game(season, SeasonType.PLAYOFF, game_num)
+            except requests.RequestException:
+                return games, [int(f"{season}{SeasonType.PLAYOFF.value}{game_num}")]
+            if game is None:
+                break
+            games.append(game)
+        return games, []
+
+    def _probe_playoff_games(self, season : int) -> tuple[list[dict], list[int]]:
+        """
+            Finds playoff games by probing IDs when the schedule is unavailable.
+            Round r has at most 8 / 2^(r-1) matchups and probing stops at the first round without any series.
+        """
+        games, failed = [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for round in tqdm(range(1, 5), desc=f"Probing {SeasonType.PLAYOFF.name.lower()} games for season {season}-{season+1}. Current round"):
+                results = list(executor.map(lambda matchup: self._fetch_playoff_series(season, round, matchup), range(1, 8 // 2 ** (round - 1) + 1)))
+                for series_games, series_failed in results:
+                    games.extend(series_games)
+                    failed.extend(series_failed)
+                if not any(series_games or series_failed for series_games, series_failed in results):
+                    break
+        return games, failed
+
+    def _finish_download(self, season : int, game_type : SeasonType, games : list[dict], failed : list[int]):
+        self.store.flush(season, game_type)
+        # IDs found missing while downloading, saved once instead of on every 404
+        self.index.save(season)
+        if self.keep_in_memory:
+            self.data[season][game_type.name.lower()].extend(games)
+        print(f"Found {len(games)} {game_type.name.lower()} games for season {season}-{season+1}")
+
+        if failed:
+            print(f"{len(failed)} {game_type.name.lower()} games could not be downloaded, fetch the season again to retry them")
+            return
+        if self.index.has_pending(season, game_type) or not all(is_final(game) for game in games):
+            # Not cached nor complete, so the next run looks for them again
+            print(f"Some {game_type.name.lower()} games are not over yet, fetch the season again once they are")
+            return
+
+        self.index.add_valid(season, game_type, [game['id'] for game in games])
+        self.index.set_complete(season, game_type)
+        self._save_to_cache(season, game_type)
                 
     def fetch_playoff_games(self, season : int):
         """
             Fetches all playoff games for a given season.
-            For playoff games, the 2nd digit of the specific number gives the round of the playoffs (1-4), 
+            Game IDs come from the season schedule when it is available.
+            Otherwise they are probed: for playoff games, the 2nd digit of the specific number gives the round of the playoffs (1-4), 
             the 3rd digit specifies the matchup (out of 8), 
             and the 4th digit specifies the game (out of 7).
             
@@ -104,43 +313,55 @@ class NHLGameData:
         """
         game_type = SeasonType.PLAYOFF
         if not self._get_from_cache(season, game_type):
-            for round in tqdm(range(1, 5), desc=f"Downloading {game_type.name.lower()} games for season {season}-{season+1}. Current round"):
-                for matchup in range(1, 9):
-                    for game in range(1, 8):
-                        game = self.fetch_game(season, SeasonType.PLAYOFF, f"{round:02d}{matchup}{game}")
-                        if game is None:
-                            break
-                        self.data[season][game_type.name.lower()].append(game)
-            print(f'Found {len(self.data[season][game_type.name.lower()])} {game_type.name.lower()} games for season {season}-{season+1}')
-            self._save_to_cache(season, game_type)
+            game_ids = self._discover_game_ids(season, game_type)
+            if game_ids is not None:
+                games, failed = self._fetch_games(season, game_type, game_ids)
+            else:
+                games, failed = self._probe_playoff_games(season)
+            self._finish_download(season, game_type, games, failed)
 
     def fetch_regular_games(self, season : int, num_games : int):
         """
             Fetches regular games for a given season.
+            Game IDs come from the season schedule when it is available, otherwise they are probed in order until the first missing game.
+            
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
-                num_games (int): The number of regular games to fetch.
+                num_games (int): The maximum number of regular games to probe.
         """
         game_type = SeasonType.REGULAR
         if not self._get_from_cache(season, game_type):
-            for game_num in tqdm(range(1, num_games + 1), desc=f"Downloading {game_type.name.lower()} games for season {season}-{season+1}"):
-                game = self.fetch_game(season, game_type, f"{game_num:04d}")
-                if game is None:
-                    break
-                self.data[season][game_type.name.lower()].append(game)
+            game_ids = self._discover_game_ids(season, game_type)
+            if game_ids is not None:
+                games, failed = self._fetch_games(season, game_type, game_ids)
+            else:
+                game_nums = (f"{game_num:04d}" for game_num in range(1, num_games + 1))
+                with tqdm(total=num_games, desc=f"Probing {game_type.name.lower()} games for season {season}-{season+1}") as progress:
+                    games, failed = self._fetch_until_missing(season, game_type, game_nums, progress)
+            self._finish_download(season, game_type, games, failed)
 
-            print(f"Found {len(self.data[season][game_type.name.lower()])} {game_type.name.lower()} games for season {season}-{season+1}")
-            self._save_to_cache(season, game_type)
-
-    def fetch_season(self, season : int, regular_games : int =NB_MAX_REGULAR_GAMES_PER_SEASON):
+    def fetch_season(self, season : int, regular_games : int =NB_MAX_REGULAR_GAMES_PER_SEASON, refresh : bool = False, revalidate : bool = False):
         """
             Fetches all games for a given season.
+            Games already in the cache are not downloaded again, so an interrupted download resumes where it stopped.
             
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
-                regular_games (int): The number of regular games to fetch.
+                regular_games (int): The maximum number of regular games to probe when the schedule is unavailable.
+                refresh (bool): Look for new games even if the season was completely downloaded before (e.g. ongoing playoffs).
+                revalidate (bool): Also check every cached game for changes with a conditional request, which costs a 304 per unchanged game.
         """
-        self.session = requests.Session()
-        self.fetch_regular_games(season, regular_games)
-        self.fetch_playoff_games(season)
-        self.session.close()
\ No newline at end of file
+        if refresh or revalidate:
+            for season_type in SeasonType:
+                self.store.set_complete(season, season_type, False)
+        if refresh:
+            for season_type in SeasonType:
+                self.index.reset(season, season_type)
+
+        self._revalidate = revalidate
+        try:
+            self.fetch_regular_games(season, regular_games)
+            self.fetch_playoff_games(season)
+        finally:
+            self._revalidate = False
+            self.fetcher.close()
\ No newline at end of file
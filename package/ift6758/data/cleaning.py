@@ -1,33 +1,136 @@
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from package.ift6758.data import WANTED_EVENTS
+from package.ift6758.data import WANTED_EVENTS, CLEANING_GAME_KEYS, SeasonType
 from package.ift6758.data.acquisition import NHLGameData
+from package.ift6758.data.events import EventBuilder, EVENT_COLUMN_NAMES, PREVIOUS_EVENT_COLUMNS, POWER_PLAY_COLUMNS, compact_events, concat_events, event_columns
+from package.ift6758.data.dataset import CleanedDataset, cleaned_season_file, event_arrow_schema
+from package.ift6758.data.fragments import CleanedFragmentStore, options_key
+from package.ift6758.data.plays import previous_event_features
+from package.ift6758.data.powerplay import PowerPlayTimeline
+from package.ift6758.data.storage import RawGameStore
+
+# Version of the event extraction, part of the key of the cleaned fragments.
+# Bump it whenever a change to the cleaning code changes its output, so fragments cleaned before are cleaned again
+CLEANER_VERSION = 3
+# Number of games a cleaning worker processes per task: large enough to amortize the inter-process overhead,
+# small enough to keep every core busy until the end of a season
+CLEANING_CHUNK_SIZE = 16
+# Number of games per batch when streaming events to Parquet, each batch becomes one row group
+STREAMING_BATCH_SIZE = 100
+
+
+def cleaning_options(includeShootouts : bool = True, keepPreviousEventInfo : bool = False, includePowerPlay : bool = False) -> tuple[dict, str]:
+    """
+        Returns a set of cleaning options and its key, which includes CLEANER_VERSION. Cleaned fragments, pickles and
+        dataset partitions are kept apart under it, so seasons cleaned with other options never replace them.
+    """
+    options = {'includeShootouts': includeShootouts, 'keepPreviousEventInfo': keepPreviousEventInfo, 'includePowerPlay': includePowerPlay}
+    return options, options_key(options, CLEANER_VERSION)
+
+
+class PlayerTable:
+    """
+        Interned player names keyed by player ID, shared by every game a cleaner goes through.
+        A name is formatted once per player, then every event of that player points to the same string.
+    """
+    def __init__(self):
+        self.names = {}
+
+    def name(self, player: dict) -> str:
+        """
+            Returns the interned full name of a player from the rosterSpots of a game.
+        """
+        name = self.names.get(player['playerId'])
+        if name is None:
+            name = f'{player["firstName"]["default"]} {player["lastName"]["default"]}'
+            self.names[player['playerId']] = name
+        return name
+
+    def roster_index(self, roster_spots: list[dict]) -> dict:
+        """
+            Builds the player ID -> name index of a game once, so every event looks its players up in constant time.
+        """
+        return {player['playerId']: self.name(player) for player in roster_spots}
+
+    def __getitem__(self, player_id: int) -> str:
+        return self.names[player_id]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
 
 class DataCleaner:
     def __init__(self, data_raw: NHLGameData, data_path_clean):
         self.data_raw = data_raw # TODO : move this to clean_season where it is used to preserve encapsulation
         self.data_path_clean = data_path_clean # should be ..../json_clean/ TODO make os env variable
         self.cache = {}
+        self.players = PlayerTable()
+        self.fragments = CleanedFragmentStore(data_path_clean)
         
         os.makedirs(data_path_clean, exist_ok=True)
     
-    def _get_from_cache(self, season: int) -> bool:
+    def _cleaning_options(self, includeShootouts : bool, keepPreviousEventInfo : bool, includePowerPlay : bool) -> tuple[dict, str]:
         """
-            Retrieve clean data from cache for a specific season .
-            Returns True if cache was found, else return False.
+            Returns the cleaning options and the key of their cleaned fragments, see cleaning_options.
+        """
+        return cleaning_options(includeShootouts, keepPreviousEventInfo, includePowerPlay)
+
+    def _raw_fingerprints(self, season: int) -> dict:
+        """
+            Returns the fingerprint of every raw game of a season, keyed by game ID.
+        """
+        if self.data_raw is None:
+            return {}
+        store = self.data_raw.store
+        return {
+            game_id: store.game_fingerprint(season, season_type, game_id)
+            for season_type in SeasonType for game_id in store.game_ids(season, season_type)
+        }
+
+    def _unsaved_games(self, season: int, fingerprints: dict) -> int:
+        """
+            Returns the number of games of a season NHLGameData holds in memory but not in the raw cache (games not over yet).
+        """
+        if self.data_raw is None:
+            return 0
+        games = self.data_raw.data.get(season, {}).values()
+        return sum(game['id'] not in fingerprints for season_games in games for game in season_games)
+
+    def _get_from_cache(self, season: int, includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False) -> bool:
+        """
+            Retrieve clean data from cache for a specific season and set of cleaning options.
+            Returns True if cache was found and is up to date with the raw games, else return False.
             
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
         """
-
-        cleaned_path = os.path.join(self.data_path_clean, str(season))
-        file = os.path.join(cleaned_path, f"{season}.pkl")
-
-        if os.path.exists(file):
-            self.cache[season] = pd.read_pickle(file)
+        _, key = self._cleaning_options(includeShootouts, keepPreviousEventInfo, includePowerPlay)
+        fingerprints = self._raw_fingerprints(season)
+        if fingerprints:
+            if not self.fragments.is_up_to_date(season, key, fingerprints):
+                return False
+            self.cache[(season, key)] = self.fragments.load_season(season, key)
             return True
-        return False
+
+        # Without raw games to compare with, take whatever was cleaned with these options
+        df = self.fragments.load_season(season, key)
+        if df is None:
+            # Seasons cleaned before the fragment cache existed (pickle, with the options in its name unless it is older still)
+            # or by stream_season (Parquet), whatever their options
+            cleaned_path = os.path.join(self.data_path_clean, str(season))
+            file = cleaned_season_file(self.data_path_clean, season, key)
+            if os.path.exists(file):
+                df = pd.read_pickle(file)
+            elif os.path.exists(os.path.join(cleaned_path, f"{season}.parquet")):
+                df = pd.read_parquet(os.path.join(cleaned_path, f"{season}.parquet"))
+            else:
+                return False
+            # They may have been saved before the compact schema existed
+            df = compact_events(df)
+        self.cache[(season, key)] = df
+        return True
 
     def _find_opposite_team_side(self, event : dict, home_team_id : int) -> str or None:
         home_team_side = event.get('homeTeamDefendingSide', None)
@@ -68,32 +171,35 @@ class DataCleaner:
         else:
             return situation_code[3] == '0'
     
-    def _extract_event_data(self, event : dict, game_id : str, opposite_team_side : str, empty_net: bool, players: dict, team_name: str) -> dict or None:
+    def _extract_event_data(self, event : dict, game_id : str, opposite_team_side : str, empty_net: bool, roster: dict, team_name: str) -> tuple or None:
+        """
+            Returns the event as a row ordered like EVENT_COLUMN_NAMES, or None if it lacks required information.
+        """
         try:
             shooter_id = event['details']['scoringPlayerId'] if event['typeDescKey'] == 'goal' else event['details']['shootingPlayerId']
             goalie_id = event['details']['goalieInNetId'] if not empty_net else None
             
-            shooter = next(f'{p["firstName"]["default"]} {p["lastName"]["default"]}' for p in players if p["playerId"] == shooter_id)
-            if not empty_net:
-                goalie = next(f'{p["firstName"]["default"]} {p["lastName"]["default"]}' for p in players if p["playerId"] == goalie_id)
-            else:
-                goalie = None
-
-            return {
-                'game_id': game_id,
-                'period': event['period'],
-                'period_time': self._convert_time_to_seconds(event['timeInPeriod']),
-                'type': event['typeDescKey'],
-                'team': team_name,
-                'x': event['details'].get('xCoord', None),
-                'y': event['details'].get('yCoord', None),
-                'shooter': shooter,
-                'goalie': goalie,
-                'shot_type': event['details'].get('shotType', None),
-                'empty_net': empty_net,
-                'strength': None,
-                'opposite_team_side': opposite_team_side,
-            }
+            # Events whose players are not on the roster are dropped
+            shooter = roster[shooter_id]
+            goalie = roster[goalie_id] if not empty_net else None
+
+            return (
+                game_id,
+                event['period'],
+                self._convert_time_to_seconds(event['timeInPeriod']),
+                event['typeDescKey'],
+                team_name,
+                event['details'].get('xCoord', None),
+                event['details'].get('yCoord', None),
+                shooter_id,
+                shooter,
+                goalie_id,
+                goalie,
+                event['details'].get('shotType', None),
+                empty_net,
+                None, # strength
+                opposite_team_side,
+            )
         except KeyError as e:
             return None
         except Exception as e:
@@ -103,134 +209,8 @@ class DataCleaner:
         minutes, seconds = map(int, time.split(':'))
         return minutes * 60 + seconds
         
-    def _extract_previous_event_data(self, previous_event : dict, event : dict) -> dict or None:
-        
-        try:
-            x = previous_event['coordinates']['x']
-            y = previous_event['coordinates']['y']
-            event_time = event['period_time'] * event['period']
-            prev_time = self._convert_time_to_seconds(previous_event['about']['periodTime']) * previous_event['about']['period']
-            return {
-                'prev_type': previous_event['result']['eventTypeId'],
-                'prev_x': x,
-                'prev_y': y,
-                'time_since_prev': event_time - prev_time,
-                'distance_from_prev': round(((event['x'] - x)**2 + (event['y'] - y)**2)**0.5,2) if x is not None and y is not None else None,
-            }
-        except KeyError as e:
-            return None
-        except Exception as e:
-            # will happen because we have a few events with missing coordinates but we clean the dataframe later so all is good
-            return None
-        
-    def extract_penalty_info(self, game_data: dict) -> list[dict]:
-        power_play_indices = game_data['liveData']['plays']['penaltyPlays']
-        all_plays = game_data['liveData']['plays']['allPlays']
-        
-        penalties = []
-        for i in power_play_indices:            
-            penalty_seconds = all_plays[i]['result']['penaltyMinutes'] * 60
-            penalty_start_time = self._convert_time_to_seconds(all_plays[i]['about']['periodTime'])
-            penalty_end_time = penalty_start_time + penalty_seconds
-            penalty_period = all_plays[i]['about']['period']
-                
-            penalty_player_team = all_plays[i]['team']['name']
-            penalty_severity = all_plays[i]['result']['penaltySeverity']
-            
-            end_time_next_period = penalty_end_time - 1200 if penalty_end_time > 1200 else None
-            end_period = penalty_period + 1 if penalty_end_time > 1200 else penalty_period
-            
-            penalties.append({
-                'start_time': penalty_start_time,
-                'end_time': penalty_end_time,
-                'end_time_next_period': end_time_next_period,
-                'start_period': penalty_period,
-                'end_period': end_period,
-                'team_name': penalty_player_team,
-                'severity': penalty_severity,
-            })
-        
-        return penalties
-    
-    def _penalty_is_active(self, penalty : dict, period : int, time : int) -> bool:
-        if penalty['start_period'] == period:
-            return penalty['start_time'] <= time <= penalty['end_time']
-        elif penalty['end_period'] == period:
-            return 0 <= time <= penalty['end_time_next_period']
-        return False
-    
-    def extract_power_play_info(self, penalties: list[dict], event: dict, home_team_name : str) -> dict:
-        
-        strength = event['result'].get('strength', {}).get('name', None)
-        if strength == 'Even':
-            return {
-            'PPActive': False,
-            'PPTimeElapsed': 0,
-            'HomeSkaters': 5,
-            'AwaySkaters': 5,
-        }
-                
-        current_time = self._convert_time_to_seconds(event['about']['periodTime'])
-        current_period = event['about']['period']
-        event_type = event['result']['eventTypeId']
-
-        # Update penalties end times if goal is scored
-        if event_type == 'GOAL':
-            team_who_scored = event['team']['name']
-            for p in penalties:
-                if self._penalty_is_active(p, current_period, current_time) and p['team_name'] != team_who_scored:
-                    
-                    if p['severity'] == 'Minor':
-                        if ['start_period'] == current_period:
-                            p['end_time'] = current_time
-                        elif p['end_period'] == current_period:
-                            p['end_time_next_period'] = current_time
-                        
-                    elif p['severity'] == 'Double Minor':
-                        mid = p['start_time'] + 120
-                        if p['start_time'] <= current_time < mid: # scored in the first half of the double minor
-                            p['end_time'] = p['end_time'] - (mid - current_time)
-                        else:
-                            p['end_time'] = current_time #scored in the second half; end the double minor penalty
-
-        
-        home_skaters = 5
-        away_skaters = 5
-        power_play_active = False
-        power_play_time_elapsed = 0
-        
-        # Determine number of skaters for each team
-        active_penalties = []
-        for p in penalties:
-            if self._penalty_is_active(p, current_period, current_time):
-                
-                penalized_team = 'home' if p['team_name'] == home_team_name else 'away'
-                
-                if p['severity'] in ['Minor', 'Double Minor', 'Major']: # Misconducts are not counted as removing a skater
-                    if penalized_team == 'home':
-                        home_skaters -= 1
-                    else:
-                        away_skaters -= 1
-                    
-                active_penalties.append(p)
-
-        # Determine if any penalties are still active
-        if active_penalties:
-            power_play_active = True
-            earliest_start_time = min(p['start_time'] for p in active_penalties)
-            power_play_time_elapsed = current_time - earliest_start_time
-
-        power_play_info = {
-            'PPActive': power_play_active,
-            'PPTimeElapsed': power_play_time_elapsed,
-            # "une équipe n’aura pas moins de 4 patineurs, y compris le gardien sur la glace à un moment donné"
-            'HomeSkaters': 3 if home_skaters < 3 else home_skaters,
-            'AwaySkaters': 3 if away_skaters < 3 else away_skaters,
-        }
-
-        return power_play_info
-            
-    def extract_events(self, game_data: dict, game_id :str, includeShootouts : bool, keepPreviousEventInfo :bool, includePowerPlay : bool) -> list[dict]:
+    def extract_events(self, game_data: dict, game_id :str, includeShootouts : bool, keepPreviousEventInfo :bool, includePowerPlay : bool,
+                       builder : EventBuilder = None) -> list[dict]:
         """
             Filters out events that are not shots or goals then extracts the relevant 
             information from the remaining events into a list of dictionaries.
@@ -238,17 +218,23 @@ class DataCleaner:
             Args:
                 game_path (dict): The game data.
                 game_id (str): The game ID.
+                keepPreviousEventInfo (bool): Adds the prev_type, prev_x, prev_y, time_since_prev and distance_from_prev columns (see previous_event_features).
+                includePowerPlay (bool): Adds the strength of each event and the PPActive, PPTimeElapsed, HomeSkaters and AwaySkaters columns (see PowerPlayTimeline).
+                builder (EventBuilder): When given, events are appended to its typed columns instead
+                    and an empty list is returned, which avoids creating one dict per event.
+                    Its columns must match includePowerPlay and keepPreviousEventInfo (see event_columns).
         """
         plays = game_data['plays']
         home_team_id = game_data['homeTeam']['id']
         home_team_name = game_data['homeTeam']['abbrev']
         away_team_name = game_data['awayTeam']['abbrev']
-        previous_event = None
-        
-        #penalties = self.extract_penalty_info(game_data)
+        roster = self.players.roster_index(game_data['rosterSpots'])
+        # Rows are completed once the whole game was read, when columns computed over all plays are added
+        complete_rows = builder is not None and not includePowerPlay and not keepPreviousEventInfo
         
-        events = []
-        for event in plays:
+        event_rows = []
+        positions = []
+        for position, event in enumerate(plays):
                  
             # Ignore shootouts
             if not includeShootouts and event['periodDescriptor']['periodType'] == 'SO':
@@ -274,79 +260,232 @@ class DataCleaner:
                 team_name = home_team_name if event['details']['eventOwnerTeamId'] == home_team_id else away_team_name
 
                 # Extract event information
-                event_data = self._extract_event_data(event, game_id, opposite_team_side, empty_net, game_data['rosterSpots'], team_name)
-                if event_data is None:
+                event_row = self._extract_event_data(event, game_id, opposite_team_side, empty_net, roster, team_name)
+                if event_row is None:
                     continue
                 
-                # Extract power play information
-                # if includePowerPlay:
-                #     power_play_info = self.extract_power_play_info(penalties, event, home_name)
-                #     # if power_play_info is not None:
-                #     event_data.update(power_play_info)
-                            
-                # Add previous event information
-                if keepPreviousEventInfo and previous_event is not None:
-                    previous_event_data = self._extract_previous_event_data(previous_event, event_data)
-                    if previous_event_data is not None:
-                        event_data.update(previous_event_data)
-                    
-                events.append(event_data)
-            
-            # update previous event
-            if 'coordinates' in event:
-                if len(event['coordinates']) == 2:
-                    previous_event = event
-                    
-        return events
+                if complete_rows:
+                    builder.append(event_row)
+                else:
+                    event_rows.append(event_row)
+                    positions.append(position)
+        
+        if keepPreviousEventInfo and event_rows:
+            # Previous events are found for every event of the game in one pass over all the plays
+            previous = previous_event_features(plays, positions)
+            extra_columns = zip(*(previous[name] for name, _, _ in PREVIOUS_EVENT_COLUMNS))
+            event_rows = [row + extra for row, extra in zip(event_rows, extra_columns)]
+        
+        if includePowerPlay and event_rows:
+            # Man-strength states are built once for the game, then every event is labeled in one lookup
+            timeline = PowerPlayTimeline(plays)
+            power_play = timeline.lookup(positions, [row[EVENT_COLUMN_NAMES.index('team')] == home_team_name for row in event_rows])
+            strength_index = EVENT_COLUMN_NAMES.index('strength')
+            strengths = power_play['strength'].tolist()
+            extra_columns = zip(*(power_play[name].tolist() for name, _, _ in POWER_PLAY_COLUMNS))
+            event_rows = [
+                row[:strength_index] + (strength,) + row[strength_index + 1:] + extra
+                for row, strength, extra in zip(event_rows, strengths, extra_columns)
+            ]
+        
+        if builder is not None:
+            builder.extend(event_rows)
+            return []
+        
+        columns = [name for name, _, _ in event_columns(includePowerPlay, keepPreviousEventInfo)]
+        return [dict(zip(columns, event_row)) for event_row in event_rows]
     
-    def clean_season(self, season :int, includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False):
+    def clean_season(self, season :int, includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False, workers : int = 1):
         """
             Extracts events from all games (playoffs and regular) in a given season and saves the data to a pickle file.
+            Only games that are new or changed since they were last cleaned with the same options are cleaned again (see clean_seasons).
+            Only games saved to the raw cache are cleaned: games that are not over yet, which NHLGameData keeps in memory
+            without saving them, are skipped with a warning until the season is fetched and cleaned again once they are.
             
             Args:
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                workers (int): Number of processes extracting events.
         """ 
-        season_events = []
-        for game_type in self.data_raw.data[season]:            
-            for game_data in self.data_raw.data[season][game_type]:                
-                # Extract events from game and convert it to a DataFrame
-                game_id = game_data['id']
-                events = self.extract_events(game_data, game_id, includeShootouts, keepPreviousEventInfo, includePowerPlay)
-                if events:
-                    season_events.extend(events)
-                
-        df = pd.DataFrame(season_events)
+        self.clean_seasons([season], includeShootouts, keepPreviousEventInfo, includePowerPlay, workers)
 
-        # Remove events with missing data
-        df = self.remove_bad_data(df, keepPreviousEventInfo)
+    def clean_seasons(self, seasons : list[int], includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False,
+                      workers : int = None, chunk_size : int = CLEANING_CHUNK_SIZE):
+        """
+            Cleans several seasons, incrementally and in parallel.
+            Events are cached per game for every set of options (see CleanedFragmentStore), so only games that are new
+            or whose raw data changed since they were cleaned with the same options and CLEANER_VERSION are cleaned again,
+            then the season frame is updated from the fragments and saved to {season}-{options key}.pkl.
+            Games to clean are split in chunks of consecutive game IDs that workers read straight from the raw cache,
+            and the events are merged back in the same order as the raw games (regular then playoff games, by game ID),
+            so the result is identical whatever the number of workers.
+            Chunks of every season share the same pool so all cores stay busy across season boundaries.
+            
+            Args:
+                seasons (list[int]): The season years (e.g. 2019 for the 2019-2020 season).
+                workers (int): Number of processes. Defaults to the number of CPUs, 1 cleans in this process.
+                chunk_size (int): Number of games per task.
+        """
+        options, key = self._cleaning_options(includeShootouts, keepPreviousEventInfo, includePowerPlay)
+        
+        fingerprints = {}
+        tasks = []
+        for season in seasons:
+            fingerprints[season] = self._raw_fingerprints(season)
+            unsaved = self._unsaved_games(season, fingerprints[season])
+            if unsaved:
+                print(f"Warning: {unsaved} games of season {season}-{season+1} are not over yet and are not cleaned, clean the season again once they are")
+            stale_games = self.fragments.stale_games(season, key, fingerprints[season])
+            for season_type in SeasonType:
+                game_ids = [game_id for game_id in stale_games if str(game_id)[4:6] == season_type.value]
+                for start in range(0, len(game_ids), chunk_size):
+                    tasks.append((season, season_type, game_ids[start:start + chunk_size], includeShootouts, keepPreviousEventInfo, includePowerPlay))
+        
+        season_fragments = {season: {} for season in seasons}
+        remaining = {season: sum(task[0] == season for task in tasks) for season in seasons}
+        
+        def finish_season(season):
+            df = self.fragments.update(season, key, options, season_fragments.pop(season), fingerprints[season])
+            self._finish_season(season, options, key, df)
+
+        # Seasons that are already up to date
+        for season in seasons:
+            if not remaining[season]:
+                finish_season(season)
+
+        executor = None
+        results = (self._clean_game_fragments(self.data_raw.store, task) for task in tasks)
+        if tasks and workers != 1:
+            executor = ProcessPoolExecutor(workers, initializer=_init_cleaning_worker, initargs=(self.data_raw.store.data_path, self.data_path_clean))
+            results = executor.map(_clean_games, tasks)
+        try:
+            # Results come back in submission order, so each season is finished as soon as its last chunk is back
+            for task, fragments in zip(tasks, results):
+                season = task[0]
+                season_fragments[season].update(fragments)
+                remaining[season] -= 1
+                if not remaining[season]:
+                    finish_season(season)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _clean_game_fragments(self, store : RawGameStore, task : tuple) -> dict:
+        """
+            Extracts the events of a chunk of games of one season type, reading the games from the raw cache.
+            Returns the cleaned events of every game, keyed by game ID.
+        """
+        season, season_type, game_ids, includeShootouts, keepPreviousEventInfo, includePowerPlay = task
+        builder = EventBuilder(event_columns(includePowerPlay, keepPreviousEventInfo))
+        for game_data in store.iter_games(season, season_type, game_ids, keys=CLEANING_GAME_KEYS):
+            self.extract_events(game_data, game_data['id'], includeShootouts, keepPreviousEventInfo, includePowerPlay, builder=builder)
+        df = self.remove_bad_data(builder.to_frame(), keepPreviousEventInfo)
+        
+        # Rows were appended game after game in game ID order, so each game is a contiguous slice
+        game_ids = sorted(game_ids)
+        bounds = df['game_id'].searchsorted(game_ids + [game_ids[-1] + 1])
+        return {game_id: df.iloc[bounds[i]:bounds[i + 1]] for i, game_id in enumerate(game_ids)}
+
+    def _finish_season(self, season : int, options : dict, key : str, df : pd.DataFrame):
+        df = compact_events(df)
         
         # Save to a pickle file
-        self.save_cleaned_data(df, season)
+        self.save_cleaned_data(df, season, key)
+        # and to the partitioned dataset FeatureEng queries, both apart for every set of options
+        CleanedDataset(self.data_path_clean, key).write_season(season, df, options)
         
         # Add to cache
-        self.cache[season] = df
+        self.cache[(season, key)] = df
+            
+    def iter_event_batches(self, season : int, includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False,
+                           batch_size : int = STREAMING_BATCH_SIZE):
+        """
+            Lazily yields the cleaned events of a season as DataFrames, one per batch of games,
+            in the same order as clean_season. Bad data is removed batch by batch, so only one batch is ever in memory.
+            
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                batch_size (int): Number of games per batch.
+        """
+        builder = EventBuilder(event_columns(includePowerPlay, keepPreviousEventInfo))
+        num_games = 0
+        for game_data in self.data_raw.iter_games(season, keys=CLEANING_GAME_KEYS):
+            self.extract_events(game_data, game_data['id'], includeShootouts, keepPreviousEventInfo, includePowerPlay, builder=builder)
+            num_games += 1
+            if num_games == batch_size:
+                if len(builder):
+                    yield self.remove_bad_data(builder.to_frame(), keepPreviousEventInfo)
+                builder = EventBuilder(event_columns(includePowerPlay, keepPreviousEventInfo))
+                num_games = 0
+        if len(builder):
+            yield self.remove_bad_data(builder.to_frame(), keepPreviousEventInfo)
+
+    def stream_season(self, season : int, includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False,
+                      batch_size : int = STREAMING_BATCH_SIZE) -> str:
+        """
+            Cleans a season without ever holding it in memory: every batch of events (see iter_event_batches)
+            is appended as a row group to {season}.parquet next to where clean_season saves its pickle.
+            Returns the path of the Parquet file. get_cleaned_data reads it back when there is no pickle.
             
-    def get_cleaned_data(self, season: int) -> pd.DataFrame:
-        if season not in self.cache:
-            if not self._get_from_cache(season):
-                self.clean_season(season)
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                batch_size (int): Number of games per batch / row group.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        cleaned_path = os.path.join(self.data_path_clean, str(season))
+        os.makedirs(cleaned_path, exist_ok=True)
+        file = os.path.join(cleaned_path, f"{season}.parquet")
+        tmp_file = f"{file}.tmp"
+        
+        writer = None
+        try:
+            for batch in self.iter_event_batches(season, includeShootouts, keepPreviousEventInfo, includePowerPlay, batch_size):
+                if writer is None:
+                    # The schema is fixed by the first batch, with the declared types of the columns that could vary
+                    schema = event_arrow_schema(batch)
+                    writer = pq.ParquetWriter(tmp_file, schema)
+                writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        if writer is None:
+            # No event at all, still leave an empty file behind so the season reads as cleaned
+            pd.DataFrame().to_parquet(tmp_file)
+        os.replace(tmp_file, file)
+        return file
+
+    def stream_seasons(self, seasons : list[int], includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False,
+                       batch_size : int = STREAMING_BATCH_SIZE) -> list[str]:
+        """
+            Streams several seasons to Parquet one after the other (see stream_season). Memory stays bounded by a single batch
+            however many seasons are processed.
+        """
+        return [self.stream_season(season, includeShootouts, keepPreviousEventInfo, includePowerPlay, batch_size) for season in seasons]
+
+    def get_cleaned_data(self, season: int, includeShootouts :bool = True, keepPreviousEventInfo :bool = False, includePowerPlay : bool = False) -> pd.DataFrame:
+        _, key = self._cleaning_options(includeShootouts, keepPreviousEventInfo, includePowerPlay)
+        if (season, key) not in self.cache:
+            if not self._get_from_cache(season, includeShootouts, keepPreviousEventInfo, includePowerPlay):
+                self.clean_season(season, includeShootouts, keepPreviousEventInfo, includePowerPlay)
                 
-        return self.cache[season]
+        return self.cache[(season, key)]
         
-    def save_cleaned_data(self, df : pd.DataFrame, season: int):
+    def save_cleaned_data(self, df : pd.DataFrame, season: int, key : str = None):
         """
             Saves a DataFrame to a pickle file.
             
             Args:
                 df (DataFrame): The DataFrame to save.
                 season (int): The season year (e.g. 2019 for the 2019-2020 season).
-                game_type (SeasonType): The type of game (regular or playoff).
-                game_id (str): The game ID.
+                key (str): Key of the cleaning options of the DataFrame, part of the file name ({season}-{key}.pkl),
+                    {season}.pkl if None.
         """
         cleaned_path = os.path.join(self.data_path_clean, str(season))
         os.makedirs(cleaned_path, exist_ok=True)
         
-        file = os.path.join(cleaned_path, f"{season}.pkl")
+        file = os.path.join(cleaned_path, f"{season}.pkl" if key is None else f"{season}-{key}.pkl")
         df.to_pickle(file)
         
     def remove_bad_data(self, df : pd.DataFrame, keepPreviousEvents: bool = False):
@@ -375,3 +514,18 @@ class DataCleaner:
         
         return df
         
+
+
+# State of a cleaning worker process, set once by _init_cleaning_worker
+_worker_store = None
+_worker_cleaner = None
+
+
+def _init_cleaning_worker(data_path : str, data_path_clean : str):
+    global _worker_store, _worker_cleaner
+    _worker_store = RawGameStore(data_path)
+    _worker_cleaner = DataCleaner(data_raw=None, data_path_clean=data_path_clean)
+
+
+def _clean_games(task : tuple) -> dict:
+    return _worker_cleaner._clean_game_fragments(_worker_store, task)
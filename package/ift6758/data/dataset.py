@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import pandas as pd
+from package.ift6758.data import SeasonType
+from package.ift6758.data.events import compact_events, event_columns
+
+ARROW_INTEGER_TYPES = {'b': 'int8', 'h': 'int16', 'i': 'int32', 'q': 'int64'}
+# Events are ordered by game ID in every file, so row groups of a few thousand events
+# let a query on a range of games skip the row groups outside of it
+EVENTS_PER_ROW_GROUP = 8192
+
+
+def event_arrow_schema(df: pd.DataFrame):
+    """
+        Returns the Arrow schema of cleaned events, with the type declared for every event column (see EVENT_COLUMNS),
+        so files written from different batches or seasons all share it whatever values they happen to hold:
+        categorical columns share one dictionary type whatever their number of categories,
+        and columns that are entirely empty are not written as nulls.
+    """
+    import pyarrow as pa
+
+    declared = {}
+    for name, kind, typecode in event_columns(includePowerPlay=True, keepPreviousEventInfo=True):
+        if kind in ('int', 'nullable_int'):
+            declared[name] = pa.type_for_alias(ARROW_INTEGER_TYPES[typecode])
+        elif kind == 'category':
+            declared[name] = pa.dictionary(pa.int32(), pa.string())
+        elif kind == 'float':
+            declared[name] = pa.float64()
+        else:
+            declared[name] = pa.bool_()
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(field.name, declared[field.name]) if field.name in declared
+        else pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(field.type)
+        else pa.field(field.name, pa.string()) if pa.types.is_null(field.type)
+        else field
+        for field in schema
+    ], metadata=schema.metadata)
+
+
+def cleaned_season_file(data_path: str, season: int, key: str = None) -> str:
+    """
+        Returns the pickle DataCleaner saves a season cleaned with a set of options to ({season}-{key}.pkl), or the pickle
+        of seasons cleaned before the options were part of its name ({season}.pkl) if key is None or there is none for key.
+    """
+    cleaned_path = os.path.join(data_path, str(season))
+    file = os.path.join(cleaned_path, f"{season}-{key}.pkl")
+    if key is None or not os.path.exists(file):
+        return os.path.join(cleaned_path, f"{season}.pkl")
+    return file
+
+
+class CleanedDataset:
+    """
+        Cleaned events of every season as one Parquet dataset partitioned by cleaning options, season and game type,
+        so a query only opens the partitions it filters on and only reads the columns it asks for.
+        Each partition is a single file replaced whenever its season is cleaned again with the same options,
+        seasons cleaned with other options are kept apart and never replace it.
+
+        Layout:
+            {data_path}/dataset/options={key}/options.json
+            {data_path}/dataset/options={key}/season={season}/game_type={type}/part-0.parquet
+
+        Args:
+            data_path (str): Folder of the cleaned data.
+            key (str): Key of the cleaning options to read and write (see options_key). By default the only set of options
+                stored, there is nothing to read if several of them are.
+    """
+    def __init__(self, data_path: str, key: str = None):
+        self.data_path = os.path.join(data_path, 'dataset')
+        self._key = key
+
+    def option_sets(self) -> dict:
+        """
+            Returns the cleaning options of every set stored in the dataset, keyed by their key.
+        """
+        if not os.path.exists(self.data_path):
+            return {}
+        option_sets = {}
+        for name in sorted(os.listdir(self.data_path)):
+            if name.startswith('options='):
+                with open(os.path.join(self.data_path, name, 'options.json'), 'r') as in_file:
+                    option_sets[name.split('=')[1]] = json.load(in_file)
+        return option_sets
+
+    @property
+    def key(self) -> str | None:
+        """
+            Key of the cleaning options the dataset reads, None if nothing was cleaned yet or if none was given
+            and seasons were cleaned with several sets of options.
+        """
+        if self._key is not None:
+            return self._key
+        option_sets = self.option_sets()
+        return next(iter(option_sets)) if len(option_sets) == 1 else None
+
+    def options_path(self) -> str:
+        return os.path.join(self.data_path, f"options={self.key}")
+
+    def season_path(self, season: int) -> str:
+        return os.path.join(self.options_path(), f"season={season}")
+
+    def _partition_path(self, season: int, season_type: SeasonType) -> str:
+        return os.path.join(self.season_path(season), f"game_type={season_type.name.lower()}")
+
+    def seasons(self) -> list[int]:
+        """
+            Returns the seasons stored in the dataset with its cleaning options.
+        """
+        if self.key is None or not os.path.exists(self.options_path()):
+            return []
+        return sorted(int(name.split('=')[1]) for name in os.listdir(self.options_path()) if name.startswith('season='))
+
+    def write_season(self, season: int, df: pd.DataFrame, options: dict):
+        """
+            Replaces the partitions of a season with its cleaned events, split by game type, under the key of the dataset.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                df (DataFrame): The cleaned events of the season.
+                options (dict): The cleaning options of the key, saved next to its seasons.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._key is None:
+            raise ValueError("A dataset needs the key of its cleaning options to write a season")
+        os.makedirs(self.options_path(), exist_ok=True)
+        with open(os.path.join(self.options_path(), 'options.json'), 'w') as out_file:
+            json.dump(options, out_file)
+
+        schema = event_arrow_schema(df)
+        # Game IDs are {season}{type}{number}, e.g. 2016020001 for a regular season game
+        game_types = df['game_id'] // 10000 % 100
+        for season_type in SeasonType:
+            partition_path = self._partition_path(season, season_type)
+            events = df[game_types == int(season_type.value)]
+            if not len(events):
+                shutil.rmtree(partition_path, ignore_errors=True)
+                continue
+
+            os.makedirs(partition_path, exist_ok=True)
+            file = os.path.join(partition_path, 'part-0.parquet')
+            # Through a temporary file (ignored by readers) so a crash never leaves a truncated partition behind
+            tmp_file = os.path.join(partition_path, '.part-0.parquet.tmp')
+            pq.write_table(pa.Table.from_pandas(events, schema=schema, preserve_index=False), tmp_file, row_group_size=EVENTS_PER_ROW_GROUP)
+            os.replace(tmp_file, file)
+
+    def read(self, seasons: list[int], season_types: list[SeasonType] = None, columns: list[str] = None, games: tuple[int, int] = None) -> pd.DataFrame:
+        """
+            Returns the cleaned events of some seasons and game types, reading only the partitions and columns asked for.
+            Events are ordered by game ID like the cleaned seasons, and have the compact event types (see compact_events).
+            Raises a KeyError if the seasons were cleaned with options that don't give some of the columns,
+            and a ValueError if no key was given and seasons were cleaned with several sets of options.
+
+            Args:
+                seasons (list[int]): The season years (e.g. 2019 for the 2019-2020 season).
+                season_types (list[SeasonType]): The game types to read, all of them by default.
+                columns (list[str]): The columns to read, all of them by default.
+                games (tuple[int, int]): First and last game IDs (included) to read, all games by default.
+        """
+        import pyarrow.dataset as ds
+
+        if self.key is None:
+            raise ValueError(f"No key of cleaning options to read the seasons with, choose one of them: {self.option_sets()}")
+        season_types = season_types or list(SeasonType)
+        # options.json is not part of the data
+        dataset = ds.dataset(self.options_path(), format='parquet', partitioning='hive', ignore_prefixes=['.', '_', 'options.json'])
+        missing = [name for name in columns or [] if name not in dataset.schema.names]
+        if missing:
+            raise KeyError(f"Columns {missing} are not in the seasons cleaned with options {self.option_sets().get(self.key)}")
+        filter = ds.field('season').isin(list(seasons)) & ds.field('game_type').isin([season_type.name.lower() for season_type in season_types])
+        if games is not None:
+            filter = filter & (ds.field('game_id') >= games[0]) & (ds.field('game_id') <= games[1])
+        # game_id is always read to put the events back in order
+        read_columns = None if columns is None else list(dict.fromkeys(['game_id', *columns]))
+        df = dataset.to_table(columns=read_columns, filter=filter).to_pandas()
+
+        df = df.sort_values('game_id', kind='stable', ignore_index=True)
+        if columns is None:
+            df = df.drop(columns=['season', 'game_type'])
+        else:
+            df = df[columns]
+        return compact_events(df)
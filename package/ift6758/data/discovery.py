@@ -0,0 +1,185 @@
+import os
+import json
+import threading
+import requests
+from package.ift6758.data import NHL_SCHEDULE_URL, SeasonType
+from package.ift6758.data.fetcher import NHLApiFetcher
+
+SCHEDULE_GAME_TYPES = {
+    2: SeasonType.REGULAR,
+    3: SeasonType.PLAYOFF,
+}
+# States of games that are over: gameState of the play-by-play and of the api-web schedule, gameStateId of the stats schedule
+FINAL_GAME_STATES = {'OFF', 'FINAL'}
+FINAL_GAME_STATE_IDS = {6, 7}
+
+
+def is_final(game: dict) -> bool:
+    """
+        Returns whether a game of the schedule or a play-by-play is over, so it won't change anymore.
+        Games without any state (older API) are.
+    """
+    if 'gameState' in game:
+        return game['gameState'] in FINAL_GAME_STATES
+    if 'gameStateId' in game:
+        return game['gameStateId'] in FINAL_GAME_STATE_IDS
+    return True
+
+
+class GameIndex:
+    """
+        Persistent per-season index of the game IDs that exist on the NHL API.
+        Valid IDs come from the season schedule, or from probing when the schedule is unavailable,
+        and IDs confirmed missing (404) are kept in a negative cache, unless the schedule lists them (their 404 is transient).
+        Only games that are over are valid: scheduled games that are not are pending, and a season type with pending games
+        is never complete, so its schedule is read again on the next run to pick up the games finished since.
+        Once a season type is complete, later runs know exactly which games to download without sending a single probe request.
+
+        Layout:
+            {data_path}/{season}/{season}-index.json
+    """
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.indexes = {}
+        self._lock = threading.RLock()
+
+    def _index_file(self, season: int) -> str:
+        return os.path.join(self.data_path, str(season), f"{season}-index.json")
+
+    def index(self, season: int) -> dict:
+        """
+            Returns the index of a season, reading it from disk the first time.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+        """
+        with self._lock:
+            if season not in self.indexes:
+                index = {
+                    'valid': {season_type: set() for season_type in SeasonType},
+                    'pending': {season_type: set() for season_type in SeasonType},
+                    'missing': set(),
+                    'complete': {season_type: False for season_type in SeasonType},
+                }
+                index_file = self._index_file(season)
+                if os.path.exists(index_file):
+                    with open(index_file, 'r') as in_file:
+                        content = json.load(in_file)
+                    for season_type in SeasonType:
+                        index['valid'][season_type] = set(content['valid'][season_type.name.lower()])
+                        # Indexes written before pending games were kept apart don't have them
+                        index['pending'][season_type] = set(content.get('pending', {}).get(season_type.name.lower(), []))
+                        index['complete'][season_type] = content['complete'][season_type.name.lower()]
+                    index['missing'] = set(content['missing'])
+                self.indexes[season] = index
+            return self.indexes[season]
+
+    def save(self, season: int):
+        """
+            Writes the index of a season to disk.
+        """
+        with self._lock:
+            index = self.index(season)
+            content = {
+                'valid': {season_type.name.lower(): sorted(index['valid'][season_type]) for season_type in SeasonType},
+                'pending': {season_type.name.lower(): sorted(index['pending'][season_type]) for season_type in SeasonType},
+                'missing': sorted(index['missing']),
+                'complete': {season_type.name.lower(): index['complete'][season_type] for season_type in SeasonType},
+            }
+            os.makedirs(os.path.join(self.data_path, str(season)), exist_ok=True)
+            tmp_file = f"{self._index_file(season)}.tmp"
+            with open(tmp_file, 'w') as out_file:
+                json.dump(content, out_file)
+            os.replace(tmp_file, self._index_file(season))
+
+    def valid_ids(self, season: int, season_type: SeasonType) -> list[int]:
+        return sorted(self.index(season)['valid'][season_type])
+
+    def is_complete(self, season: int, season_type: SeasonType) -> bool:
+        return self.index(season)['complete'][season_type]
+
+    def has_pending(self, season: int, season_type: SeasonType) -> bool:
+        """
+            Returns whether the schedule lists games of a season type that are not over yet.
+        """
+        return bool(self.index(season)['pending'][season_type])
+
+    def is_missing(self, season: int, game_id: int) -> bool:
+        return game_id in self.index(season)['missing']
+
+    def is_scheduled(self, season: int, game_id: int) -> bool:
+        """
+            Returns whether the schedule lists a game, over or not.
+        """
+        index = self.index(season)
+        return any(game_id in index['valid'][season_type] or game_id in index['pending'][season_type] for season_type in SeasonType)
+
+    def add_valid(self, season: int, season_type: SeasonType, game_ids):
+        with self._lock:
+            self.index(season)['valid'][season_type].update(game_ids)
+
+    def add_missing(self, season: int, game_id: int):
+        """
+            Records a game ID the API confirmed does not exist so it is never requested again, unless the schedule lists it.
+            The index is not saved, callers save it once they are done downloading (see save).
+        """
+        with self._lock:
+            if not self.is_scheduled(season, game_id):
+                self.index(season)['missing'].add(game_id)
+
+    def set_complete(self, season: int, season_type: SeasonType, complete: bool = True):
+        with self._lock:
+            self.index(season)['complete'][season_type] = complete
+            self.save(season)
+
+    def reset(self, season: int, season_type: SeasonType):
+        """
+            Forgets that a season type is complete and which of its IDs are missing or pending, so new games can be discovered.
+        """
+        with self._lock:
+            index = self.index(season)
+            index['complete'][season_type] = False
+            index['pending'][season_type] = set()
+            index['missing'] = {game_id for game_id in index['missing'] if str(game_id)[4:6] != season_type.value}
+            self.save(season)
+
+    def load_schedule(self, season: int, fetcher: NHLApiFetcher, schedule_url: str = NHL_SCHEDULE_URL) -> bool:
+        """
+            Fills the index with the games listed in the season schedule that are over, and the other ones as pending.
+            Marks the season types it lists as complete unless some of their games are pending.
+            Returns False if the schedule could not be retrieved, in which case callers fall back to probing.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                fetcher (NHLApiFetcher): The HTTP layer used to query the schedule.
+                schedule_url (str): Schedule URL template with a {SEASON_ID} placeholder.
+        """
+        try:
+            result = fetcher.get_json(schedule_url.format(SEASON_ID=f"{season}{season+1}"))
+        except (requests.RequestException, ValueError):
+            return False
+        if result.data is None:
+            return False
+        schedule = result.data.get('data', [])
+
+        found = {season_type: [] for season_type in SeasonType}
+        pending = {season_type: [] for season_type in SeasonType}
+        for game in schedule:
+            season_type = SCHEDULE_GAME_TYPES.get(game.get('gameType'))
+            if season_type is not None:
+                (found if is_final(game) else pending)[season_type].append(game['id'])
+
+        if not any(found.values()) and not any(pending.values()):
+            return False
+
+        with self._lock:
+            index = self.index(season)
+            for season_type in SeasonType:
+                if found[season_type] or pending[season_type]:
+                    self.add_valid(season, season_type, found[season_type])
+                    index['pending'][season_type] = set(pending[season_type])
+                    index['complete'][season_type] = not pending[season_type]
+            # Indexes written before scheduled games were kept out of the negative cache may have some of them
+            index['missing'] -= {game_id for season_type in SeasonType for game_id in found[season_type] + pending[season_type]}
+            self.save(season)
+        return True
@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+from array import array
+from package.ift6758.data import WANTED_EVENTS
+from package.ift6758.data.powerplay import STRENGTH_EVEN, STRENGTH_POWER_PLAY, STRENGTH_SHORT_HANDED
+
+# Columns of a cleaned event, in order, with how each one is stored:
+#   (name, 'int', typecode)           non-null integers in an array.array of that typecode
+#   (name, 'nullable_int', typecode)  integers with missing values, turned into a pandas nullable integer column
+#   (name, 'category', None)          values dictionary-encoded as they are appended, turned into a pandas categorical
+#   (name, 'bool', None)              booleans
+#   (name, 'float', 'd')              floats, None stored as NaN
+EVENT_COLUMNS = [
+    ('game_id', 'int', 'q'),
+    ('period', 'int', 'b'),
+    ('period_time', 'int', 'h'),
+    ('type', 'category', None),
+    ('team', 'category', None),
+    ('x', 'nullable_int', 'h'),
+    ('y', 'nullable_int', 'h'),
+    ('shooter_id', 'int', 'i'),
+    ('shooter', 'category', None),
+    ('goalie_id', 'nullable_int', 'i'),
+    ('goalie', 'category', None),
+    ('shot_type', 'category', None),
+    ('empty_net', 'bool', None),
+    ('strength', 'category', None),
+    ('opposite_team_side', 'category', None),
+]
+EVENT_COLUMN_NAMES = [name for name, _, _ in EVENT_COLUMNS]
+# Columns added after the event columns when cleaning with keepPreviousEventInfo (see previous_event_features)
+PREVIOUS_EVENT_COLUMNS = [
+    ('prev_type', 'category', None),
+    ('prev_x', 'nullable_int', 'h'),
+    ('prev_y', 'nullable_int', 'h'),
+    ('time_since_prev', 'nullable_int', 'h'),
+    ('distance_from_prev', 'float', 'd'),
+]
+# Columns added after the event columns when cleaning with includePowerPlay (see PowerPlayTimeline)
+POWER_PLAY_COLUMNS = [
+    ('PPActive', 'bool', None),
+    ('PPTimeElapsed', 'int', 'h'),
+    ('HomeSkaters', 'int', 'b'),
+    ('AwaySkaters', 'int', 'b'),
+]
+
+
+def event_columns(includePowerPlay: bool = False, keepPreviousEventInfo: bool = False) -> list[tuple]:
+    return EVENT_COLUMNS + (PREVIOUS_EVENT_COLUMNS if keepPreviousEventInfo else []) + (POWER_PLAY_COLUMNS if includePowerPlay else [])
+
+NUMPY_TYPES = {'b': np.int8, 'h': np.int16, 'i': np.int32, 'q': np.int64}
+NULLABLE_TYPES = {'b': pd.Int8Dtype(), 'h': pd.Int16Dtype(), 'i': pd.Int32Dtype(), 'q': pd.Int64Dtype()}
+# Categories that come first, in this order, in every cleaned season whatever values it actually has,
+# so the frames of different seasons share the same codes for them. Other values are sorted after.
+EVENT_VOCABULARIES = {
+    'type': WANTED_EVENTS,
+    'strength': [STRENGTH_EVEN, STRENGTH_POWER_PLAY, STRENGTH_SHORT_HANDED],
+    'opposite_team_side': ['left', 'right'],
+}
+
+
+class EventBuilder:
+    """
+        Struct-of-arrays accumulator of cleaned events.
+        Every column is appended straight into a typed buffer (int16 coordinates, int8 period, dictionary codes for
+        the string columns) instead of building one dict per event and letting pandas infer the types of the whole list,
+        then to_frame hands over a typed DataFrame without any conversion pass.
+        Rows are tuples ordered like the columns.
+
+        Args:
+            columns (list[tuple]): Columns of the events, see EVENT_COLUMNS and event_columns.
+    """
+    def __init__(self, columns: list[tuple] = EVENT_COLUMNS):
+        self.columns = columns
+        self.size = 0
+        self.values = {}
+        self.masks = {}
+        self.vocabularies = {}
+        self._appenders = []
+        for name, kind, typecode in columns:
+            if kind == 'int':
+                self.values[name] = array(typecode)
+                self._appenders.append(self.values[name].append)
+            elif kind == 'nullable_int':
+                self.values[name] = array(typecode)
+                self.masks[name] = bytearray()
+                self._appenders.append(self._nullable_appender(self.values[name], self.masks[name]))
+            elif kind == 'category':
+                self.values[name] = array('i')
+                self.vocabularies[name] = {}
+                self._appenders.append(self._category_appender(self.values[name], self.vocabularies[name]))
+            elif kind == 'float':
+                self.values[name] = array(typecode)
+                self._appenders.append(self._float_appender(self.values[name]))
+            else:
+                self.values[name] = bytearray()
+                self._appenders.append(self.values[name].append)
+
+    @staticmethod
+    def _nullable_appender(values: array, mask: bytearray):
+        append_value, append_mask = values.append, mask.append
+        def append(value):
+            if value is None:
+                append_value(0)
+                append_mask(1)
+            else:
+                append_value(value)
+                append_mask(0)
+        return append
+
+    @staticmethod
+    def _category_appender(codes: array, vocabulary: dict):
+        append_code = codes.append
+        def append(value):
+            if value is None:
+                append_code(-1)
+                return
+            code = vocabulary.get(value)
+            if code is None:
+                code = vocabulary[value] = len(vocabulary)
+            append_code(code)
+        return append
+
+    @staticmethod
+    def _float_appender(values: array):
+        append_value = values.append
+        def append(value):
+            append_value(np.nan if value is None else value)
+        return append
+
+    def append(self, row: tuple):
+        for append, value in zip(self._appenders, row):
+            append(value)
+        self.size += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+            Returns the events appended so far as a DataFrame with the types of the columns.
+        """
+        columns = {}
+        for name, kind, typecode in self.columns:
+            if kind == 'int':
+                columns[name] = np.frombuffer(self.values[name], dtype=NUMPY_TYPES[typecode]).copy()
+            elif kind == 'nullable_int':
+                columns[name] = pd.arrays.IntegerArray(
+                    np.frombuffer(self.values[name], dtype=NUMPY_TYPES[typecode]).copy(),
+                    np.frombuffer(self.masks[name], dtype=bool).copy(),
+                )
+            elif kind == 'category':
+                columns[name] = pd.Categorical.from_codes(np.frombuffer(self.values[name], dtype=np.int32).copy(), categories=list(self.vocabularies[name]))
+            elif kind == 'float':
+                columns[name] = np.frombuffer(self.values[name], dtype=np.float64).copy()
+            else:
+                columns[name] = np.frombuffer(self.values[name], dtype=bool).copy()
+        return pd.DataFrame(columns, columns=[name for name, _, _ in self.columns])
+
+
+def concat_events(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+        Concatenates event frames built by different EventBuilders (e.g. by several worker processes or for several seasons).
+        Categorical columns stay categorical, where pd.concat alone falls back to plain objects
+        as soon as two frames have different categories, and get the categories of compact_events.
+    """
+    frames = [frame for frame in frames if len(frame.columns)]
+    if not frames:
+        return EventBuilder().to_frame()
+    if len(frames) == 1:
+        return compact_events(frames[0].reset_index(drop=True))
+
+    # Encoding the concatenated values once is much cheaper than recoding every frame into the union of categories
+    return compact_events(pd.concat(frames, ignore_index=True))
+
+
+def compact_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        Returns cleaned events with the compact type declared for each of their columns (see EVENT_COLUMNS):
+        small integers, nullable integers for columns with missing values and categoricals for strings.
+        Categories are the known vocabulary of the column (see EVENT_VOCABULARIES) followed by the other values
+        of the season, sorted, so they do not depend on the order in which games were cleaned.
+        Frames that are already compact are returned almost as is, and columns that are not declared are left untouched
+        (e.g. seasons cleaned by an older version of the cleaner).
+
+        Args:
+            df (DataFrame): The cleaned events.
+    """
+    df = df.copy(deep=False)
+    for name, kind, typecode in event_columns(includePowerPlay=True, keepPreviousEventInfo=True):
+        if name not in df.columns:
+            continue
+        column = df[name]
+        if kind == 'category':
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                values = column.cat.remove_unused_categories().cat.categories
+            else:
+                values = column.dropna().unique()
+            known = EVENT_VOCABULARIES.get(name, [])
+            categories = known + sorted(set(values) - set(known))
+            dtype = pd.CategoricalDtype(categories)
+        elif kind == 'int':
+            dtype = NUMPY_TYPES[typecode]
+        elif kind == 'nullable_int':
+            dtype = NULLABLE_TYPES[typecode]
+        elif kind == 'float':
+            dtype = np.float64
+        else:
+            column = column.fillna(False) if column.dtype == object else column
+            dtype = bool
+        if isinstance(column.dtype, pd.CategoricalDtype) and kind == 'category':
+            # astype keeps the order of the categories, which unordered categorical types ignore when compared
+            if not column.cat.categories.equals(dtype.categories):
+                df[name] = column.cat.set_categories(dtype.categories)
+        elif column.dtype != dtype:
+            df[name] = column.astype(dtype)
+    return df
+
+
+def memory_report(frames: dict) -> pd.DataFrame:
+    """
+        Returns the memory used by every column of one or more frames, in MB, with their types and a total row.
+
+        Args:
+            frames (dict): The frames to compare, keyed by the name of their column in the report (e.g. 'before', 'after').
+    """
+    report = {}
+    for label, df in frames.items():
+        usage = df.memory_usage(deep=True, index=False) / 2**20
+        report[f'{label} type'] = df.dtypes.astype(str)
+        report[f'{label} MB'] = usage.round(2)
+    report = pd.DataFrame(report)
+    totals = {}
+    for label, df in frames.items():
+        totals[f'{label} type'] = ''
+        totals[f'{label} MB'] = round(df.memory_usage(deep=True, index=False).sum() / 2**20, 2)
+    report.loc['total'] = pd.Series(totals)
+    return report
@@ -0,0 +1,179 @@
+import time
+import random
+import threading
+import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+# Answers worth retrying: rate limited or the server is temporarily unable to answer
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+        Thread-safe limiter that spaces out requests made to the same host.
+        Each host gets its own schedule so a slow API does not throttle another one.
+
+        Args:
+            max_per_second (float): Maximum number of requests per second per host. None disables the limit.
+    """
+    def __init__(self, max_per_second : float = None):
+        self.min_interval = 1.0 / max_per_second if max_per_second else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url : str):
+        """
+            Blocks until a request to the host of the given URL is allowed.
+
+            Args:
+                url (str): The URL about to be requested.
+        """
+        if not self.min_interval:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FetchResult(NamedTuple):
+    """
+        Outcome of a GET request.
+        status is 200 (data holds the decoded JSON), 304 (the cached copy is still valid) or 404 (the resource does not exist).
+        validators holds the ETag / Last-Modified of the response, to be sent back on the next request.
+    """
+    status: int
+    data: dict
+    validators: dict
+
+
+class NHLApiFetcher:
+    """
+        HTTP layer used to talk to the NHL API.
+        Transient failures (connection errors, timeouts, 429 and 5xx answers) are retried a bounded number of times
+        with exponential backoff and full jitter, or after the delay asked for by a Retry-After header.
+        Requests can be made conditional on ETag / Last-Modified validators so unchanged resources cost a 304.
+        Each thread gets its own requests.Session since requests does not guarantee sharing one is safe.
+
+        Args:
+            max_requests_per_second (float): Per-host rate limit shared by all threads. None disables it.
+            max_retries (int): Number of retries after the first attempt before giving up.
+            backoff_base (float): Backoff cap in seconds of the first retry, doubled on every following retry.
+            max_delay (float): Upper bound in seconds of any wait, including the ones asked for by Retry-After.
+            timeout (float): Timeout in seconds of every request.
+            sleep (callable): Function used to wait between attempts, replaceable in tests.
+    """
+    def __init__(self, max_requests_per_second : float = None, max_retries : int = 5, backoff_base : float = 0.5,
+                 max_delay : float = 60.0, timeout : float = 30.0, sleep=time.sleep):
+        self.rate_limiter = RateLimiter(max_requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.sleep = sleep
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        """
+            Closes the sessions of every thread.
+        """
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._local = threading.local()
+
+    def _backoff_delay(self, attempt : int) -> float:
+        return random.uniform(0, min(self.max_delay, self.backoff_base * 2 ** attempt))
+
+    def _retry_after_delay(self, response : requests.Response) -> float | None:
+        """
+            Returns the delay asked for by the Retry-After header (in seconds or as an HTTP date), if any.
+        """
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, url : str, validators : dict = None) -> requests.Response:
+        """
+            Sends a GET request, retrying transient failures.
+            Returns the final response, whose status may still be an error once the retries are exhausted.
+            Connection errors and timeouts are raised once the retries are exhausted.
+
+            Args:
+                url (str): The URL to request.
+                validators (dict): 'etag' and/or 'last_modified' of a cached copy, sent as If-None-Match / If-Modified-Since.
+        """
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+            try:
+                response = self._get_session().get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.sleep(self._backoff_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+
+            delay = self._retry_after_delay(response)
+            self.sleep(min(self.max_delay, delay) if delay is not None else self._backoff_delay(attempt))
+
+        return response
+
+    def get_json(self, url : str, validators : dict = None) -> FetchResult:
+        """
+            Fetches a JSON resource.
+            Raises requests.HTTPError if the request still fails after the retries, so a transient error is never mistaken for a missing resource.
+
+            Args:
+                url (str): The URL to request.
+                validators (dict): Validators of a cached copy, see get.
+        """
+        response = self.get(url, validators)
+        if response.status_code in (304, 404):
+            return FetchResult(response.status_code, None, validators or {})
+
+        response.raise_for_status()
+        new_validators = {}
+        if response.headers.get('ETag'):
+            new_validators['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            new_validators['last_modified'] = response.headers['Last-Modified']
+        return FetchResult(response.status_code, response.json(), new_validators)
@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from package.ift6758.data.events import concat_events
+
+
+def options_key(options: dict, version: int) -> str:
+    """
+        Returns a short stable key identifying a set of cleaning options and a cleaner version.
+    """
+    content = json.dumps({'options': options, 'version': version}, sort_keys=True)
+    return hashlib.sha1(content.encode()).hexdigest()[:12]
+
+
+class CleanedFragmentStore:
+    """
+        Cache of cleaned events made of one fragment per game, kept apart for every set of cleaning options and cleaner version.
+        Each fragment remembers the fingerprint of the raw game it was cleaned from, so re-cleaning a season only
+        touches games that are new or changed. The season frame is kept assembled next to the fragments and
+        updated in place (rows of changed games swapped), so it is never rebuilt from every fragment unless it went missing.
+
+        Layout:
+            {data_path}/{season}/fragments/{options_key}/manifest.json
+            {data_path}/{season}/fragments/{options_key}/games/{game_id}.pkl
+            {data_path}/{season}/fragments/{options_key}/season.pkl
+    """
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.manifests = {}
+
+    def _fragments_path(self, season: int, key: str) -> str:
+        return os.path.join(self.data_path, str(season), 'fragments', key)
+
+    def _fragment_file(self, season: int, key: str, game_id: int) -> str:
+        return os.path.join(self._fragments_path(season, key), 'games', f"{game_id}.pkl")
+
+    def _season_file(self, season: int, key: str) -> str:
+        return os.path.join(self._fragments_path(season, key), 'season.pkl')
+
+    def _manifest_file(self, season: int, key: str) -> str:
+        return os.path.join(self._fragments_path(season, key), 'manifest.json')
+
+    def _write_pickle(self, df: pd.DataFrame, path: str):
+        # Through a temporary file so a crash never leaves a truncated fragment behind
+        tmp_path = f"{path}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    def manifest(self, season: int, key: str) -> dict:
+        """
+            Returns the manifest of a season for a set of options, reading it from disk the first time.
+            'games' maps every game ID that has a fragment to the fingerprint of the raw game it was cleaned from.
+        """
+        if (season, key) not in self.manifests:
+            manifest = {'options': None, 'games': {}}
+            manifest_file = self._manifest_file(season, key)
+            if os.path.exists(manifest_file):
+                with open(manifest_file, 'r') as in_file:
+                    content = json.load(in_file)
+                manifest = {'options': content['options'], 'games': {int(game_id): fingerprint for game_id, fingerprint in content['games'].items()}}
+            self.manifests[(season, key)] = manifest
+        return self.manifests[(season, key)]
+
+    def _save_manifest(self, season: int, key: str):
+        manifest = self.manifests[(season, key)]
+        tmp_file = f"{self._manifest_file(season, key)}.tmp"
+        with open(tmp_file, 'w') as out_file:
+            json.dump({'options': manifest['options'], 'games': {str(game_id): fingerprint for game_id, fingerprint in sorted(manifest['games'].items())}}, out_file)
+        os.replace(tmp_file, self._manifest_file(season, key))
+
+    def stale_games(self, season: int, key: str, fingerprints: dict) -> list[int]:
+        """
+            Returns the IDs of the games that have no fragment yet, or whose raw game changed since it was cleaned.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                key (str): Key of the cleaning options, see options_key.
+                fingerprints (dict): Fingerprint of every raw game of the season, keyed by game ID.
+        """
+        cleaned = self.manifest(season, key)['games']
+        return sorted(game_id for game_id, fingerprint in fingerprints.items() if cleaned.get(game_id) != fingerprint)
+
+    def is_up_to_date(self, season: int, key: str, fingerprints: dict) -> bool:
+        """
+            Whether the assembled season exists and matches exactly the given raw games.
+        """
+        return self.manifest(season, key)['games'] == fingerprints and os.path.exists(self._season_file(season, key))
+
+    def update(self, season: int, key: str, options: dict, fragments: dict, fingerprints: dict) -> pd.DataFrame:
+        """
+            Stores the fragments of newly cleaned games, drops the ones of games that are no longer in the raw data,
+            and returns the updated season frame, ordered by game ID like the raw games.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                key (str): Key of the cleaning options, see options_key.
+                options (dict): The cleaning options, recorded in the manifest for reference.
+                fragments (dict): Cleaned events of the new or changed games, keyed by game ID.
+                fingerprints (dict): Fingerprint of every raw game of the season, keyed by game ID.
+        """
+        manifest = self.manifest(season, key)
+        removed = set(manifest['games']) - set(fingerprints)
+        if not fragments and not removed and self.is_up_to_date(season, key, fingerprints):
+            return self.load_season(season, key)
+
+        os.makedirs(os.path.join(self._fragments_path(season, key), 'games'), exist_ok=True)
+        for game_id, df in fragments.items():
+            self._write_pickle(df, self._fragment_file(season, key, game_id))
+
+        for game_id in removed:
+            if os.path.exists(self._fragment_file(season, key, game_id)):
+                os.remove(self._fragment_file(season, key, game_id))
+
+        season_file = self._season_file(season, key)
+        if os.path.exists(season_file):
+            # Swap the rows of the changed games instead of concatenating every fragment again
+            season_df = pd.read_pickle(season_file)
+            season_df = season_df[~season_df['game_id'].isin(set(fragments) | removed)]
+            df = concat_events([season_df, *fragments.values()])
+        else:
+            df = concat_events([
+                fragments[game_id] if game_id in fragments else pd.read_pickle(self._fragment_file(season, key, game_id))
+                for game_id in sorted(fingerprints)
+            ])
+        df = df.sort_values('game_id', kind='stable', ignore_index=True)
+        self._write_pickle(df, season_file)
+
+        manifest['options'] = options
+        manifest['games'] = dict(fingerprints)
+        self._save_manifest(season, key)
+        return df
+
+    def load_season(self, season: int, key: str) -> pd.DataFrame | None:
+        """
+            Returns the assembled season for a set of options, or None if it was never cleaned with them.
+        """
+        season_file = self._season_file(season, key)
+        return pd.read_pickle(season_file) if os.path.exists(season_file) else None
@@ -0,0 +1,58 @@
+import numpy as np
+
+SECONDS_PER_PERIOD = 20 * 60
+
+
+def parse_clock(times: list[str]) -> np.ndarray:
+    """
+        Converts 'MM:SS' clock strings to seconds in one pass over their bytes.
+    """
+    if not times:
+        return np.zeros(0, dtype=np.int32)
+    if any(len(time) != 5 for time in times):
+        return np.array([int(time.split(':')[0]) * 60 + int(time.split(':')[1]) for time in times], dtype=np.int32)
+    digits = np.frombuffer(''.join(times).encode(), dtype=np.uint8).reshape(-1, 5).astype(np.int32) - ord('0')
+    return (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+
+
+def game_seconds(plays: list[dict]) -> np.ndarray:
+    """
+        Returns the time of every play in seconds since the start of the game.
+    """
+    periods = np.array([play.get('period', 1) for play in plays], dtype=np.int32)
+    return (periods - 1) * SECONDS_PER_PERIOD + parse_clock([play.get('timeInPeriod', '00:00') for play in plays])
+
+
+def previous_event_features(plays: list[dict], positions) -> dict:
+    """
+        Returns the information of the event before each of the given plays, as one list per column, computed in one pass
+        over the whole play stream: the coordinates of every play are gathered once and shifted onto the plays that follow them.
+        The previous event is the closest earlier play that has coordinates, whatever its type.
+        Plays without such a previous event get None / NaN.
+
+        Args:
+            plays (list[dict]): The plays of the game, in order.
+            positions (list[int]): Index in plays of the events to describe.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    x = np.array([play.get('details', {}).get('xCoord', np.nan) for play in plays], dtype=np.float64)
+    y = np.array([play.get('details', {}).get('yCoord', np.nan) for play in plays], dtype=np.float64)
+    seconds = game_seconds(plays)
+
+    located = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    previous = np.searchsorted(located, positions, side='left') - 1
+    found = previous >= 0
+    previous = np.where(found, located[np.maximum(previous, 0)] if len(located) else 0, 0)
+
+    prev_x = np.where(found, x[previous], np.nan)
+    prev_y = np.where(found, y[previous], np.nan)
+    distance = np.round(np.hypot(x[positions] - prev_x, y[positions] - prev_y), 2)
+    types = [play['typeDescKey'] for play in plays]
+
+    return {
+        'prev_type': [types[index] if ok else None for index, ok in zip(previous.tolist(), found.tolist())],
+        'prev_x': [None if np.isnan(value) else int(value) for value in prev_x.tolist()],
+        'prev_y': [None if np.isnan(value) else int(value) for value in prev_y.tolist()],
+        'time_since_prev': [int(value) if ok else None for value, ok in zip((seconds[positions] - seconds[previous]).tolist(), found.tolist())],
+        'distance_from_prev': distance.tolist(),
+    }
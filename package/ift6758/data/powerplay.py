@@ -0,0 +1,77 @@
+import numpy as np
+from package.ift6758.data.plays import game_seconds
+
+# situationCode of the play-by-play: away goalie, away skaters, home skaters, home goalie (e.g. '1451': home team on a 5 on 4)
+EVEN_STRENGTH_CODE = '1551'
+
+STRENGTH_EVEN = 'Even'
+STRENGTH_POWER_PLAY = 'Power Play'
+STRENGTH_SHORT_HANDED = 'Short Handed'
+
+
+class PowerPlayTimeline:
+    """
+        Man-strength states of a game, built once from the situationCode of every play.
+        Consecutive plays with the same situation form one interval, and consecutive intervals where the teams
+        do not have the same number of skaters form one power play (e.g. a 5 on 4 that becomes a 5 on 3 and back),
+        so any event is labeled with a sorted lookup of its play position among the interval starts.
+        A skater replacing a pulled goalie is not counted when deciding whether a power play is on.
+
+        Args:
+            plays (list[dict]): The plays of the game, in order.
+    """
+    def __init__(self, plays: list[dict]):
+        codes = []
+        code = EVEN_STRENGTH_CODE
+        for play in plays:
+            # Plays without a situation (e.g. period start) keep the one before them
+            code = play.get('situationCode') or code
+            codes.append(code if len(code) == 4 else EVEN_STRENGTH_CODE)
+        digits = np.frombuffer(''.join(codes).encode(), dtype=np.uint8).reshape(-1, 4).astype(np.int8) - ord('0')
+
+        self.seconds = game_seconds(plays)
+        self.shootout = np.array([play.get('periodDescriptor', {}).get('periodType') == 'SO' for play in plays], dtype=bool)
+
+        changes = np.ones(len(codes), dtype=bool)
+        changes[1:] = (digits[1:] != digits[:-1]).any(axis=1)
+        self.starts = np.flatnonzero(changes)
+
+        away_goalie, away_skaters, home_skaters, home_goalie = digits[self.starts].T
+        self.home_skaters = home_skaters
+        self.away_skaters = away_skaters
+        self.home_strength = home_skaters - (home_goalie == 0)
+        self.away_strength = away_skaters - (away_goalie == 0)
+        self.power_play = self.home_strength != self.away_strength
+
+        # Start time of the power play each interval belongs to
+        first_of_power_play = self.power_play.copy()
+        first_of_power_play[1:] &= ~self.power_play[:-1]
+        first_interval = np.maximum.accumulate(np.where(first_of_power_play, np.arange(len(self.starts)), 0))
+        self.power_play_start = self.seconds[self.starts][first_interval]
+
+    def lookup(self, positions: np.ndarray, is_home: np.ndarray) -> dict:
+        """
+            Returns the power play information of events, as one array per column.
+
+            Args:
+                positions (np.ndarray): Index of each event in the plays of the game.
+                is_home (np.ndarray): Whether each event belongs to the home team, to tell a power play from a short-handed situation.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        interval = np.searchsorted(self.starts, positions, side='right') - 1
+        shootout = self.shootout[positions]
+        power_play = self.power_play[interval] & ~shootout
+        elapsed = np.where(power_play, np.maximum(self.seconds[positions] - self.power_play_start[interval], 0), 0)
+
+        own = np.where(is_home, self.home_strength[interval], self.away_strength[interval])
+        other = np.where(is_home, self.away_strength[interval], self.home_strength[interval])
+        strength = np.where(own > other, STRENGTH_POWER_PLAY, np.where(own < other, STRENGTH_SHORT_HANDED, STRENGTH_EVEN)).astype(object)
+        strength[shootout] = None
+
+        return {
+            'PPActive': power_play,
+            'PPTimeElapsed': elapsed.astype(np.int16),
+            'HomeSkaters': self.home_skaters[interval],
+            'AwaySkaters': self.away_skaters[interval],
+            'strength': strength,
+        }
@@ -0,0 +1,222 @@
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from package.ift6758.data import SeasonType
+from package.ift6758.data.storage import RawGameStore
+
+GAME_PATH = re.compile(r'/v1/gamecenter/(\d{10})/play-by-play')
+SCHEDULE_PATH = re.compile(r'/stats/rest/en/game\?cayenneExp=season=(\d{8})')
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b'', headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        server.wait_latency()
+
+        error = server.draw_error()
+        if error is not None:
+            server.count(str(error))
+            return self._send(error, headers={'Retry-After': str(server.retry_after)} if error == 429 else None)
+
+        match = GAME_PATH.fullmatch(self.path)
+        if match:
+            body = server.game_body(int(match.group(1)))
+        else:
+            match = SCHEDULE_PATH.fullmatch(self.path)
+            body = server.schedule_body(int(match.group(1)[:4])) if match and server.serve_schedule else None
+
+        if body is None:
+            server.count('404')
+            return self._send(404)
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            server.count('304')
+            return self._send(304, headers={'ETag': etag})
+
+        server.count('200')
+        self._send(200, body, {'Content-Type': 'application/json', 'ETag': etag})
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+        Local stand-in for api-web.nhle.com serving the play-by-play of games in a raw cache (see RawGameStore),
+        plus a season schedule built from the cache manifests, so ingestion can be benchmarked and tested offline.
+        Point NHLGameData (base_url / schedule_url) or the NHL_GAME_URL / NHL_SCHEDULE_URL environment variables at game_url / schedule_url.
+
+        Args:
+            data_path (str): Raw cache folder of NHLGameData.
+            host (str): Interface to listen on.
+            port (int): Port to listen on, 0 picks a free one.
+            latency (float): Seconds added to every answer.
+            latency_jitter (float): Extra random latency, uniform between 0 and this many seconds.
+            error_rate (float): Probability of answering 429 (with Retry-After) or 503 instead of the resource.
+            retry_after (int): Seconds sent in the Retry-After header of 429 answers.
+            live_plays_per_second (float): When set, games are replayed as if live: the first request of a game starts its clock
+                and later requests reveal this many plays per second, with the score, clock and game state of the last revealed play.
+            serve_schedule (bool): Whether to serve the schedule. Without it clients have to probe game IDs.
+            seed (int): Seed of the error and jitter draws.
+    """
+    # The default backlog of 5 drops connections as soon as more clients than that connect at once
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, data_path: str, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, retry_after: int = 1, live_plays_per_second: float = None, serve_schedule: bool = True,
+                 seed: int = None):
+        super().__init__((host, port), ReplayRequestHandler)
+        self.store = RawGameStore(data_path)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.live_plays_per_second = live_plays_per_second
+        self.serve_schedule = serve_schedule
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._games = {}
+        self._live_start = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_port}'
+
+    @property
+    def game_url(self) -> str:
+        return f'{self.base_url}/v1/gamecenter/{{GAME_ID}}/play-by-play'
+
+    @property
+    def schedule_url(self) -> str:
+        return f'{self.base_url}/stats/rest/en/game?cayenneExp=season={{SEASON_ID}}'
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def wait_latency(self):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def draw_error(self) -> int | None:
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice([429, 503])
+        return None
+
+    def _load_game(self, game_id: int) -> dict | None:
+        """
+            Returns a cached game, read from disk the first time it is requested. None if the game is not in the cache.
+        """
+        with self._lock:
+            if game_id in self._games:
+                return self._games[game_id]
+
+        season, season_type = int(str(game_id)[:4]), str(game_id)[4:6]
+        season_type = next((known for known in SeasonType if known.value == season_type), None)
+        game = None
+        if season_type is not None and self.store.has_game(season, season_type, game_id):
+            game = self.store.load_game(season, season_type, game_id)
+
+        with self._lock:
+            return self._games.setdefault(game_id, game)
+
+    def _live_view(self, game: dict) -> dict:
+        """
+            Returns the game as it would look while being played: only the plays revealed so far,
+            with the matching score, clock and game state.
+        """
+        with self._lock:
+            start = self._live_start.setdefault(game['id'], time.monotonic())
+        revealed = int((time.monotonic() - start) * self.live_plays_per_second)
+        plays = game.get('plays', [])
+        if revealed >= len(plays):
+            return game
+
+        plays = plays[:revealed]
+        home_team, away_team = dict(game['homeTeam']), dict(game['awayTeam'])
+        goals = Counter(play['details']['eventOwnerTeamId'] for play in plays if play.get('typeDescKey') == 'goal')
+        home_team['score'], away_team['score'] = goals[home_team['id']], goals[away_team['id']]
+        clock = dict(game.get('clock', {}))
+        if plays and 'timeRemaining' in plays[-1]:
+            clock['timeRemaining'] = plays[-1]['timeRemaining']
+        return {**game, 'plays': plays, 'homeTeam': home_team, 'awayTeam': away_team, 'clock': clock, 'gameState': 'LIVE'}
+
+    def game_body(self, game_id: int) -> bytes | None:
+        game = self._load_game(game_id)
+        if game is None:
+            return None
+        if self.live_plays_per_second:
+            game = self._live_view(game)
+        return json.dumps(game).encode()
+
+    def schedule_body(self, season: int) -> bytes | None:
+        games = [
+            # Cached games are over
+            {'id': game_id, 'gameType': int(season_type.value), 'season': int(f'{season}{season+1}'), 'gameStateId': 7}
+            for season_type in SeasonType for game_id in self.store.game_ids(season, season_type)
+        ]
+        return json.dumps({'data': games, 'total': len(games)}).encode() if games else None
+
+    def start(self) -> 'ReplayServer':
+        """
+            Serves requests from a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser(description='Replay cached NHL play-by-play data from a local server')
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_raw/', help='Raw cache folder to serve')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every answer')
+    parser.add_argument('--latency_jitter', type=float, default=0.0, help='Extra random latency in seconds')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Probability of answering 429 or 503')
+    parser.add_argument('--retry_after', type=int, default=1, help='Retry-After seconds of 429 answers')
+    parser.add_argument('--live_plays_per_second', type=float, default=None, help='Reveal plays progressively at this rate')
+    parser.add_argument('--no_schedule', dest='serve_schedule', action='store_false', help='Do not serve the schedule')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the error and jitter draws')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    server = ReplayServer(**vars(opts))
+    print(f'Serving {opts.data_path} at {server.base_url}')
+    print(f'  export NHL_GAME_URL={server.game_url}')
+    print(f'  export NHL_SCHEDULE_URL={server.schedule_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
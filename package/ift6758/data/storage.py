@@ -0,0 +1,292 @@
+import os
+import json
+import zlib
+import pickle
+import struct
+import threading
+from package.ift6758.data import SeasonType
+
+GAME_FILE_MAGIC = b'NHLG'
+GAME_FILE_HEADER = struct.Struct('>4sI')
+# Games recorded in the journal of a season type before it is folded into its manifest
+MANIFEST_JOURNAL_MAX_ENTRIES = 256
+
+
+def encode_game(game: dict, level: int = 6) -> bytes:
+    """
+        Encodes a game as one zlib-compressed JSON frame per top-level key, preceded by a header
+        giving the offset and length of every frame, so a single key can be decoded without touching the others.
+
+        Args:
+            game (dict): The play-by-play data of the game, as returned by the API.
+            level (int): zlib compression level.
+    """
+    frames = {}
+    offset = 0
+    for key, value in game.items():
+        frame = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), level)
+        frames[key] = (offset, frame)
+        offset += len(frame)
+
+    header = json.dumps({key: [start, len(frame)] for key, (start, frame) in frames.items()}).encode()
+    return GAME_FILE_HEADER.pack(GAME_FILE_MAGIC, len(header)) + header + b''.join(frame for _, frame in frames.values())
+
+
+def decode_game(in_file, keys: list[str] = None) -> dict:
+    """
+        Decodes the requested top-level keys of a game written by encode_game. Frames of the other keys are skipped unread.
+
+        Args:
+            in_file (file): Binary file object positioned at the start of the game.
+            keys (list[str]): Top-level keys to decode. Defaults to every key.
+    """
+    magic, header_length = GAME_FILE_HEADER.unpack(in_file.read(GAME_FILE_HEADER.size))
+    if magic != GAME_FILE_MAGIC:
+        raise ValueError('Not a raw game file')
+    header = json.loads(in_file.read(header_length))
+    data_start = GAME_FILE_HEADER.size + header_length
+
+    game = {}
+    for key in (header if keys is None else keys):
+        if key not in header:
+            continue
+        start, length = header[key]
+        in_file.seek(data_start + start)
+        game[key] = json.loads(zlib.decompress(in_file.read(length)))
+    return game
+
+
+class RawGameStore:
+    """
+        Per-game cache of raw play-by-play data.
+        Every game is written to its own compressed file as soon as it is downloaded and a manifest per season type
+        lists the cached game IDs, so an interrupted download resumes where it stopped.
+        Saved games are appended to a journal next to the manifest rather than rewriting the whole manifest every time;
+        the journal is folded into the manifest every MANIFEST_JOURNAL_MAX_ENTRIES games, when the season type is marked complete
+        and on flush, and replayed on top of the manifest when it is read.
+        Each top-level key of a game is compressed separately (see encode_game), so readers only decode the keys they need.
+
+        Layout:
+            {data_path}/{season}/{season}-{type}.manifest.json
+            {data_path}/{season}/{season}-{type}.journal.jsonl
+            {data_path}/{season}/{type}/{game_id}.nhlz
+    """
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.manifests = {}
+        # Entries in the journal of every season type since its manifest was last written
+        self.journal_entries = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(data_path, exist_ok=True)
+
+    def _games_path(self, season: int, season_type: SeasonType) -> str:
+        return os.path.join(self.data_path, str(season), season_type.name.lower())
+
+    def _game_file(self, season: int, season_type: SeasonType, game_id: int) -> str:
+        return os.path.join(self._games_path(season, season_type), f"{game_id}.nhlz")
+
+    def _manifest_file(self, season: int, season_type: SeasonType) -> str:
+        return os.path.join(self.data_path, str(season), f"{season}-{season_type.name.lower()}.manifest.json")
+
+    def _journal_file(self, season: int, season_type: SeasonType) -> str:
+        return os.path.join(self.data_path, str(season), f"{season}-{season_type.name.lower()}.journal.jsonl")
+
+    def _write_atomic(self, path: str, write):
+        """
+            Writes a file through a temporary file so a crash never leaves a truncated file behind.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as out_file:
+            write(out_file)
+        os.replace(tmp_path, path)
+
+    def _save_manifest(self, season: int, season_type: SeasonType):
+        manifest = self.manifests[(season, season_type)]
+        content = json.dumps({
+            'games': sorted(manifest['games']),
+            'complete': manifest['complete'],
+            'validators': {str(game_id): validators for game_id, validators in sorted(manifest['validators'].items())},
+        }).encode()
+        self._write_atomic(self._manifest_file(season, season_type), lambda f: f.write(content))
+        # Everything in the journal is in the manifest now, replaying it again after a crash right here changes nothing
+        if os.path.exists(self._journal_file(season, season_type)):
+            os.remove(self._journal_file(season, season_type))
+        self.journal_entries[(season, season_type)] = 0
+
+    def _apply(self, manifest: dict, game_id: int, validators: dict = None):
+        manifest['games'].add(game_id)
+        if validators:
+            manifest['validators'][game_id] = validators
+        else:
+            manifest['validators'].pop(game_id, None)
+
+    def manifest(self, season: int, season_type: SeasonType) -> dict:
+        """
+            Returns the manifest of a season type, reading it from disk the first time.
+            The manifest has the keys 'games' (set of cached game IDs), 'complete' (True once the whole season type was downloaded)
+            and 'validators' (ETag / Last-Modified of each game when the API sent them).
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
+        """
+        key = (season, season_type)
+        with self._lock:
+            if key not in self.manifests:
+                manifest = {'games': set(), 'complete': False, 'validators': {}}
+                manifest_file = self._manifest_file(season, season_type)
+                if os.path.exists(manifest_file):
+                    with open(manifest_file, 'r') as in_file:
+                        content = json.load(in_file)
+                    manifest['games'] = set(content['games'])
+                    manifest['complete'] = content['complete']
+                    manifest['validators'] = {int(game_id): validators for game_id, validators in content.get('validators', {}).items()}
+                entries = 0
+                journal_file = self._journal_file(season, season_type)
+                if os.path.exists(journal_file):
+                    with open(journal_file, 'r') as in_file:
+                        for line in in_file:
+                            try:
+                                entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                # Last line of a download killed while writing it, its game is downloaded again
+                                continue
+                            self._apply(manifest, entry['id'], entry['validators'])
+                            entries += 1
+                self.manifests[key] = manifest
+                self.journal_entries[key] = entries
+            return self.manifests[key]
+
+    def game_ids(self, season: int, season_type: SeasonType) -> list[int]:
+        """
+            Returns the cached game IDs of a season type in game ID order.
+        """
+        return sorted(self.manifest(season, season_type)['games'])
+
+    def has_game(self, season: int, season_type: SeasonType, game_id: int) -> bool:
+        return game_id in self.manifest(season, season_type)['games']
+
+    def is_complete(self, season: int, season_type: SeasonType) -> bool:
+        return self.manifest(season, season_type)['complete']
+
+    def validators(self, season: int, season_type: SeasonType, game_id: int) -> dict:
+        """
+            Returns the ETag / Last-Modified recorded when a game was downloaded, used to revalidate it with a conditional request.
+        """
+        return self.manifest(season, season_type)['validators'].get(game_id, {})
+
+    def save_game(self, season: int, season_type: SeasonType, game: dict, validators: dict = None):
+        """
+            Writes one game to the cache and records it in the journal of the manifest.
+            Safe to call from several download threads at once.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
+                game (dict): The play-by-play data of the game, as returned by the API.
+                validators (dict): ETag / Last-Modified sent by the API with the game.
+        """
+        os.makedirs(self._games_path(season, season_type), exist_ok=True)
+        content = encode_game(game)
+        self._write_atomic(self._game_file(season, season_type, game['id']), lambda f: f.write(content))
+
+        entry = json.dumps({'id': game['id'], 'validators': validators or None}) + '\n'
+        with self._lock:
+            self._apply(self.manifest(season, season_type), game['id'], validators)
+            with open(self._journal_file(season, season_type), 'a') as out_file:
+                out_file.write(entry)
+            self.journal_entries[(season, season_type)] += 1
+            if self.journal_entries[(season, season_type)] >= MANIFEST_JOURNAL_MAX_ENTRIES:
+                self._save_manifest(season, season_type)
+
+    def flush(self, season: int, season_type: SeasonType):
+        """
+            Folds the journal of a season type into its manifest.
+        """
+        with self._lock:
+            if self.journal_entries.get((season, season_type)):
+                self._save_manifest(season, season_type)
+
+    def set_complete(self, season: int, season_type: SeasonType, complete: bool = True):
+        """
+            Flags a season type as fully downloaded (or not) in its manifest.
+        """
+        with self._lock:
+            self.manifest(season, season_type)['complete'] = complete
+            os.makedirs(os.path.join(self.data_path, str(season)), exist_ok=True)
+            self._save_manifest(season, season_type)
+
+    def game_fingerprint(self, season: int, season_type: SeasonType, game_id: int) -> str:
+        """
+            Returns a fingerprint of a cached game (size and modification time of its file) that changes whenever the game is rewritten,
+            e.g. after a revalidation brought a new version of it.
+        """
+        game_file = self._game_file(season, season_type, game_id)
+        if not os.path.exists(game_file):
+            game_file = os.path.join(self._games_path(season, season_type), f"{game_id}.pkl")
+        stat = os.stat(game_file)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def load_game(self, season: int, season_type: SeasonType, game_id: int, keys: list[str] = None) -> dict:
+        """
+            Loads one cached game, decoding only the requested top-level keys.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
+                game_id (int): The game ID.
+                keys (list[str]): Top-level keys to decode (e.g. ['plays', 'rosterSpots']). Defaults to every key.
+        """
+        game_file = self._game_file(season, season_type, game_id)
+        if not os.path.exists(game_file):
+            # Games cached before compression was introduced
+            with open(os.path.join(self._games_path(season, season_type), f"{game_id}.pkl"), 'rb') as in_file:
+                game = pickle.load(in_file)
+            return game if keys is None else {key: game[key] for key in keys if key in game}
+
+        with open(game_file, 'rb') as in_file:
+            return decode_game(in_file, keys)
+
+    def iter_games(self, season: int, season_type: SeasonType, game_ids: list[int] = None, keys: list[str] = None):
+        """
+            Lazily yields cached games of a season type in game ID order, one game in memory at a time.
+            Only the manifest and the requested game files are read.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
+                game_ids (list[int]): Games to load. Defaults to every cached game.
+                keys (list[str]): Top-level keys to decode. Defaults to every key.
+        """
+        cached = self.manifest(season, season_type)['games']
+        if game_ids is None:
+            game_ids = cached
+        for game_id in sorted(game_ids):
+            if game_id in cached:
+                yield self.load_game(season, season_type, game_id, keys)
+
+    def load_games(self, season: int, season_type: SeasonType, game_ids: list[int] = None, keys: list[str] = None) -> list[dict]:
+        """
+            Loads cached games of a season type in game ID order.
+            Only the manifest and the requested game files are read.
+
+            Args:
+                season (int): The season year (e.g. 2019 for the 2019-2020 season).
+                season_type (SeasonType): The season type (e.g. REGULAR, PLAYOFF).
+                game_ids (list[int]): Games to load. Defaults to every cached game.
+                keys (list[str]): Top-level keys to decode. Defaults to every key.
+        """
+        return list(self.iter_games(season, season_type, game_ids, keys))
+
+    def import_games(self, season: int, season_type: SeasonType, games: list[dict]):
+        """
+            Splits a legacy season pickle into per-game files and marks the season type as complete.
+        """
+        os.makedirs(self._games_path(season, season_type), exist_ok=True)
+        for game in games:
+            content = encode_game(game)
+            self._write_atomic(self._game_file(season, season_type, game['id']), lambda f: f.write(content))
+        with self._lock:
+            self.manifest(season, season_type)['games'].update(game['id'] for game in games)
+        self.set_complete(season, season_type)
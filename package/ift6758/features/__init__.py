@@ -1 +1,5 @@
-from package.ift6758.features.ingenierie import FeatureEng
\ No newline at end of file
+from package.ift6758.features.chunked import ChunkedFeatures
+from package.ift6758.features.encoding import ENCODER_FILE, CategoryEncoder
+from package.ift6758.features.graph import FEATURE_GRAPH, FeatureGraph
+from package.ift6758.features.ingenierie import FeatureEng
+from package.ift6758.features.store import FeatureStore
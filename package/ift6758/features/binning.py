@@ -0,0 +1,177 @@
+import math
+import numpy as np
+import pandas as pd
+from package.ift6758.features.geometry import _as_float
+
+# Largest grid counted at once when several resolutions are asked for together,
+# beyond it every resolution is counted on its own
+MAX_FINE_BINS = 1 << 20
+
+
+class GoalRateTable:
+    """
+        Shot and goal counts of shots binned on one or more features, aligned bin by bin:
+        every bin is there, bins without goals count 0 goals and bins without shots have a NaN rate.
+        Counts are plain arrays with one axis per feature, small enough to be kept around or pickled.
+
+        Args:
+            labels (list[pd.Index]): Labels of the bins of every feature (intervals for numeric features, categories otherwise).
+            shots (np.ndarray): Number of shots in every bin.
+            goals (np.ndarray): Number of goals in every bin.
+    """
+    def __init__(self, labels: list[pd.Index], shots: np.ndarray, goals: np.ndarray):
+        self.labels = labels
+        self.shots = shots
+        self.goals = goals
+
+    @property
+    def rate(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.shots > 0, self.goals / self.shots, np.nan)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+            Returns the table with one row per bin (every combination of bins for several features).
+        """
+        index = self.labels[0] if len(self.labels) == 1 else pd.MultiIndex.from_product(self.labels)
+        return pd.DataFrame({'shots': self.shots.ravel(), 'goals': self.goals.ravel(), 'rate': self.rate.ravel()}, index=index)
+
+
+class GoalRateBinning:
+    """
+        Counts shots and goals of binned features with np.bincount instead of pd.cut and groupbys.
+        Numeric features are split in equal-width bins between their min and max (both included, like pd.cut with a number of bins)
+        and their bins are labelled with the intervals pd.cut gives them (rounded edges, last or first one widened by 0.1%),
+        categorical ones have one bin per category, and several features make a grid (e.g. distance x angle).
+        Several resolutions of the same features are counted in a single pass: shots are counted once on the finest grid
+        every resolution divides (the least common multiple of their numbers of bins), then each resolution sums
+        groups of neighbouring fine bins, so resolutions are exactly nested. The edges of a resolution are then every few edges
+        of the fine grid, which may differ from the edges pd.cut computes by a rounding error, so a value lying exactly on an edge
+        could fall in the other bin. Tables are cached by features and resolution.
+
+        Args:
+            df (DataFrame): The shots.
+            is_goal (str or array): Column, or values, telling which shots are goals.
+            closed (str): 'left' for [a, b) bins, 'right' for (a, b] bins.
+    """
+    def __init__(self, df: pd.DataFrame, is_goal = 'is_goal', closed: str = 'left'):
+        self.df = df
+        self.is_goal = np.asarray(df[is_goal] if isinstance(is_goal, str) else is_goal, dtype=np.float64)
+        self.closed = closed
+        self.cache = {}
+
+    def _categorical(self, column: str) -> pd.Categorical:
+        values = self.df[column]
+        return values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values)
+
+    def _size(self, column: str, num_bins: int | None) -> int:
+        return len(self._categorical(column).categories) if num_bins is None else num_bins
+
+    def _range(self, column: str) -> tuple[np.ndarray, float, float]:
+        """
+            Returns the values of a numeric feature as floats (missing values as NaN), and their min and max.
+        """
+        values = _as_float(self.df[column])
+        valid = values[~np.isnan(values)]
+        low, high = (valid.min(), valid.max()) if len(valid) else (0.0, 0.0)
+        return values, low, high
+
+    def _labels(self, column: str, num_bins: int) -> pd.IntervalIndex:
+        """
+            Returns the intervals pd.cut labels num_bins bins of a numeric feature with, computed from its min and max only.
+        """
+        _, low, high = self._range(column)
+        return pd.cut(np.array([low, high]), num_bins, right=self.closed == 'right').categories.rename(column)
+
+    def _fine_bins(self, column: str, num_bins: int | None) -> np.ndarray:
+        """
+            Returns the bin of every shot on a grid of num_bins bins (-1 when the value is missing).
+        """
+        if num_bins is None:
+            return self._categorical(column).codes.astype(np.int64)
+
+        values, low, high = self._range(column)
+        edges = np.linspace(low, high, num_bins + 1)
+        # Same edges and comparisons as pd.cut, the min and max always fall in the first and last bins
+        if self.closed == 'left':
+            indices = np.minimum(np.searchsorted(edges, values, side='right') - 1, num_bins - 1)
+        else:
+            indices = np.maximum(np.searchsorted(edges, values, side='left') - 1, 0)
+        return np.where(np.isnan(values), -1, indices).astype(np.int64)
+
+    def table(self, columns, bins) -> GoalRateTable:
+        """
+            Returns the counts of one resolution, e.g. table('distance_goal', 20) or table(('distance_goal', 'angle_shot'), (20, 10)).
+
+            Args:
+                columns (str or tuple): The features to bin on.
+                bins (int or tuple): Number of bins of every feature, None for categorical features.
+        """
+        return self.tables(columns, [bins])[bins if isinstance(bins, tuple) else (bins,)]
+
+    def tables(self, columns, resolutions: list) -> dict:
+        """
+            Returns the counts of several resolutions of the same features, counted in one pass, keyed by resolution (as tuples).
+
+            Args:
+                columns (str or tuple): The features to bin on.
+                resolutions (list): Number of bins of every feature for every resolution, e.g. [10, 20, 50] or [(20, 10), (40, 20)].
+        """
+        columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        resolutions = [resolution if isinstance(resolution, tuple) else (resolution,) for resolution in resolutions]
+        for resolution in resolutions:
+            if len(resolution) != len(columns):
+                raise ValueError(f"Resolution {resolution} does not give a number of bins for every one of {columns}")
+        for column, column_bins in zip(columns, zip(*resolutions)):
+            if None in column_bins and any(num_bins is not None for num_bins in column_bins):
+                raise ValueError(f"Bins of {column} are either None (categorical) or numbers in every resolution, not both: {column_bins}")
+        missing = [resolution for resolution in dict.fromkeys(resolutions) if (columns, resolution) not in self.cache]
+
+        if missing:
+            fine = [
+                None if resolution[0] is None else math.lcm(*resolution)
+                for resolution in zip(*missing)
+            ]
+            if np.prod([self._size(column, num_bins) for column, num_bins in zip(columns, fine)]) > MAX_FINE_BINS:
+                # Too fine to count at once, count every resolution on its own grid
+                for resolution in missing:
+                    self._count(columns, list(resolution), [resolution])
+            else:
+                self._count(columns, fine, missing)
+
+        return {resolution: self.cache[(columns, resolution)] for resolution in resolutions}
+
+    def _count(self, columns: tuple, fine: list, resolutions: list):
+        """
+            Counts shots and goals once on the fine grid, then caches the table of every resolution.
+        """
+        flat = np.zeros(len(self.df), dtype=np.int64)
+        valid = np.ones(len(self.df), dtype=bool)
+        shape = []
+        for column, num_bins in zip(columns, fine):
+            indices = self._fine_bins(column, num_bins)
+            size = self._size(column, num_bins)
+            flat = flat * size + indices
+            valid &= indices >= 0
+            shape.append(size)
+
+        size = int(np.prod(shape))
+        shots = np.bincount(flat[valid], minlength=size).reshape(shape)
+        goals = np.rint(np.bincount(flat[valid], weights=self.is_goal[valid], minlength=size)).astype(np.int64).reshape(shape)
+
+        for resolution in resolutions:
+            # Every bin of the resolution groups fine_size / num_bins neighbouring fine bins
+            grouped_shape = []
+            for fine_size, num_bins in zip(shape, resolution):
+                num_bins = fine_size if num_bins is None else num_bins
+                grouped_shape += [num_bins, fine_size // num_bins]
+            axes = tuple(range(1, 2 * len(shape), 2))
+            labels = [
+                pd.Index(self._categorical(column).categories, name=column) if num_bins is None else self._labels(column, num_bins)
+                for column, num_bins in zip(columns, resolution)
+            ]
+            self.cache[(columns, resolution)] = GoalRateTable(
+                labels,
+                shots.reshape(grouped_shape).sum(axis=axes),
+                goals.reshape(grouped_shape).sum(axis=axes),
+            )
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+import pandas as pd
+
+# Memory FeatureEng keeps for fetched seasons before it evicts the least recently used ones
+FEATURE_CACHE_MAX_MB = 1024
+
+
+class FrameCache:
+    """
+        Least recently used cache of DataFrames bounded by the memory they use, not by their number.
+        Frames are handed out as shallow copies: new columns, dropped columns or rows only change the copy,
+        so callers never pay a deep copy, but must build new columns instead of writing into existing ones in place
+        (df['x'] = ... is fine, df.loc[mask, 'x'] = ... is not).
+
+        Args:
+            max_mb (float): Memory the cached frames may use, in MB. A frame larger than that is never cached.
+    """
+    def __init__(self, max_mb: float = FEATURE_CACHE_MAX_MB):
+        self.max_bytes = max_mb * 2**20
+        self.frames = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size_mb(self) -> float:
+        return sum(self.sizes.values()) / 2**20
+
+    def __contains__(self, key) -> bool:
+        return key in self.frames
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def get(self, key) -> pd.DataFrame | None:
+        """
+            Returns a view of a cached frame and marks it as the most recently used, or None if it is not cached.
+        """
+        if key not in self.frames:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.frames.move_to_end(key)
+        return self.frames[key].copy(deep=False)
+
+    def put(self, key, df: pd.DataFrame) -> pd.DataFrame:
+        """
+            Caches a frame, evicting the least recently used ones until the cache fits in its memory, and returns a view of it.
+        """
+        self.pop(key)
+        size = df.memory_usage(deep=True).sum()
+        if size <= self.max_bytes:
+            while self.frames and sum(self.sizes.values()) + size > self.max_bytes:
+                self.pop(next(iter(self.frames)))
+            self.frames[key] = df
+            self.sizes[key] = size
+        return df.copy(deep=False)
+
+    def pop(self, key):
+        self.frames.pop(key, None)
+        self.sizes.pop(key, None)
+
+    def clear(self):
+        self.frames.clear()
+        self.sizes.clear()
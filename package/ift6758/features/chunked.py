@@ -0,0 +1,168 @@
+import os
+import pandas as pd
+from package.ift6758.data.events import compact_events
+from package.ift6758.features.ingenierie import FeatureEng
+
+# Memory the events fetched for a block of games and their features may use, in MB
+FEATURE_CHUNK_MAX_MB = 512
+# Games of the first block, before the memory used per event is known
+FIRST_BLOCK_GAMES = 20
+# Feature functions hold copies of some columns while they run, on top of the fetched events and the features
+MEMORY_OVERHEAD = 2
+
+
+def feature_arrow_schema(df: pd.DataFrame):
+    """
+        Returns the Arrow schema of a block of features with the types of its own columns (feature functions change
+        the types of some event columns), except that categorical columns share one dictionary type whatever
+        their number of categories and entirely empty columns are strings, so that every block can be written with it.
+    """
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(field.type)
+        else pa.field(field.name, pa.string()) if pa.types.is_null(field.type)
+        else field
+        for field in schema
+    ], metadata=schema.metadata)
+
+
+class ChunkedFeatures:
+    """
+        Computes a FeatureEng feature function over many seasons without ever holding them all in memory:
+        every season is processed one block of games at a time, and every block is appended to a single Parquet file
+        as soon as it is computed. Blocks are sized so that the events fetched for a block and its features stay under
+        a memory ceiling, from the memory per event measured on the blocks already computed.
+        Feature functions work event by event, so the file holds the same rows as the function called on the whole range.
+        Seasons that are only cleaned as pickles (not in the dataset) can't be read partially and make a single block.
+
+        Args:
+            features (FeatureEng): Computes the blocks, its cache is emptied after each of them.
+            max_memory_mb (float): Memory a block may use, in MB.
+    """
+    def __init__(self, features: FeatureEng, max_memory_mb: float = FEATURE_CHUNK_MAX_MB):
+        self.features = features
+        self.max_bytes = max_memory_mb * 2**20
+        self.bytes_per_event = None
+
+    def _season_games(self, season: int, function: str, options: dict) -> pd.Series | None:
+        """
+            Returns the number of cleaned events of every game of a season by game ID, None if the season is not in the dataset
+            the feature function reads.
+        """
+        dataset = self.features.dataset(self.features.cleaning_for(function, **options))
+        if season not in dataset.seasons():
+            return None
+        return dataset.read([season], columns=['game_id'])['game_id'].value_counts().sort_index()
+
+    def _blocks(self, games: pd.Series | None):
+        """
+            Yields the first and last game IDs of consecutive blocks of games, each as large as the memory ceiling allows
+            with what is known of the memory per event when it is asked for. Yields None for a season read whole.
+        """
+        if games is None or not len(games):
+            yield None
+            return
+        position = 0
+        while position < len(games):
+            if self.bytes_per_event is None:
+                size = FIRST_BLOCK_GAMES
+            else:
+                max_events = self.max_bytes / (self.bytes_per_event * MEMORY_OVERHEAD)
+                # At least one game, however large
+                size = max(1, int((games.iloc[position:].cumsum() <= max_events).sum()))
+            block = games.index[position:position + size]
+            yield int(block[0]), int(block[-1])
+            position += size
+
+    def _compute(self, function: str, season: int, games: tuple[int, int] | None, options: dict) -> pd.DataFrame:
+        self.features.games = games
+        try:
+            df = getattr(self.features, function)(season, season + 1, **options)
+            fetched_bytes = sum(self.features.cached_data.sizes.values())
+            fetched_events = sum(len(frame) for frame in self.features.cached_data.frames.values())
+        finally:
+            self.features.games = None
+            self.features.cached_data.clear()
+
+        if fetched_events:
+            bytes_per_event = (fetched_bytes + df.memory_usage(deep=True).sum()) / fetched_events
+            self.bytes_per_event = max(self.bytes_per_event or 0, bytes_per_event)
+        return df
+
+    def write(self, function: str, startYear: int, endYear: int, output_file: str, **options) -> int:
+        """
+            Computes a feature function for the seasons from startYear to endYear (excluded) block by block
+            and writes the features to a Parquet file (one row group per block), replacing it once complete.
+            Returns the number of rows written. The file is replaced even when there are none, with only the columns.
+
+            Args:
+                function (str): Name of the FeatureEng feature function (e.g. 'features_2').
+                output_file (str): The Parquet file to write.
+                options: Keyword arguments of the feature function (e.g. drop_teams=False).
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if startYear >= endYear:
+            raise ValueError(f"No season from {startYear} to {endYear}")
+
+        tmp_file = f"{output_file}.tmp"
+        writer = None
+        empty = None
+        rows = 0
+        try:
+            for season in range(startYear, endYear):
+                for games in self._blocks(self._season_games(season, function, options)):
+                    df = self._compute(function, season, games, options)
+                    print(f"Computed {function} for season {season}" + (f", games {games[0]} to {games[1]}" if games else "") + f": {len(df)} rows")
+                    if not len(df):
+                        empty = df
+                        continue
+                    if writer is None:
+                        # Types of the first block, so every block is written with the same ones
+                        schema = feature_arrow_schema(df)
+                        writer = pq.ParquetWriter(tmp_file, schema)
+                    writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+                    rows += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            # No rows at all, the file still replaces the one of a previous run
+            pq.write_table(pa.Table.from_pandas(empty, schema=feature_arrow_schema(empty), preserve_index=False), tmp_file)
+        os.replace(tmp_file, output_file)
+        return rows
+
+
+def _compact_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        Puts the categories of categorical columns back in the order of the cleaned events (see compact_events),
+        where reading blocks with different categories keeps them in the order they were met.
+    """
+    categorical = [name for name in df.columns if isinstance(df[name].dtype, pd.CategoricalDtype)]
+    if categorical:
+        compacted = compact_events(df[categorical])
+        for name in categorical:
+            df[name] = compacted[name]
+    return df
+
+
+def read_features(file: str, columns: list[str] = None) -> pd.DataFrame:
+    """
+        Returns the features written by ChunkedFeatures, as the feature function would have returned them for the whole range.
+    """
+    return _compact_categories(pd.read_parquet(file, columns=columns))
+
+
+def iter_features(file: str, columns: list[str] = None):
+    """
+        Yields the features written by ChunkedFeatures block by block, to go through them with the memory of a single block.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file)
+    for row_group in range(parquet_file.num_row_groups):
+        yield _compact_categories(parquet_file.read_row_group(row_group, columns=columns).to_pandas())
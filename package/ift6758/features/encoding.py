@@ -0,0 +1,144 @@
+import json
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from package.ift6758.features.geometry import _as_float
+
+# File the encoder of a model is saved to, next to model.pkl
+ENCODER_FILE = 'encoder.json'
+ENCODER_VERSION = 1
+
+
+class CategoryEncoder:
+    """
+        One-hot encoder with a vocabulary fixed when it is fitted, so every batch gets the same columns whatever categories
+        it holds, from a whole training set down to the shots of a single game. Unlike pd.get_dummies it never builds
+        a frame: categories are looked up column by column and written straight into a CSR matrix (or a dense array).
+
+        Layout: the numeric features in the order they were fitted, then one column per category of every categorical feature
+        (named like pd.get_dummies, f"{feature}_{category}"). Missing values and categories unseen at fit time have no column set.
+        Numeric zeros are not stored in the CSR matrix, and XGBoost takes entries that are not stored for missing values:
+        give tree models the dense array, so a 0 (e.g. empty_net) stays apart from NaN.
+
+        Args:
+            drop_first (bool): Leave out the first category of every feature (like pd.get_dummies(drop_first=True)),
+                unseen categories are then encoded like the first one.
+    """
+    def __init__(self, drop_first: bool = False):
+        self.drop_first = drop_first
+        self.numeric_features = []
+        self.vocabularies = {}
+
+    def fit(self, X, categorical_features: list = None, numeric_features: list = None):
+        """
+            Fixes the layout from a training set.
+
+            Args:
+                X (DataFrame): Training features.
+                categorical_features (list): Features to one-hot encode, by default the categorical, string and object columns.
+                numeric_features (list): Features passed through as floats, by default all other columns.
+        """
+        if categorical_features is None:
+            categorical_features = [
+                name for name in X.columns
+                if isinstance(X[name].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(X[name].dtype) or X[name].dtype == object
+            ]
+        if numeric_features is None:
+            numeric_features = [name for name in X.columns if name not in categorical_features]
+
+        self.numeric_features = list(numeric_features)
+        self.vocabularies = {}
+        for name in categorical_features:
+            values = X[name]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                vocabulary = values.cat.categories
+            else:
+                vocabulary = pd.Index(values.dropna().unique()).sort_values()
+            self.vocabularies[name] = pd.Index(vocabulary)
+        return self
+
+    @property
+    def feature_names(self) -> list[str]:
+        names = list(self.numeric_features)
+        for name, vocabulary in self.vocabularies.items():
+            names += [f"{name}_{category}" for category in vocabulary[int(self.drop_first):]]
+        return names
+
+    def _codes(self, name: str, values) -> np.ndarray:
+        """
+            Returns the position of every value in the vocabulary of a feature, -1 for missing or unseen values.
+        """
+        vocabulary = self.vocabularies[name]
+        if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+            # Only the categories are looked up, then taken by code
+            codes = np.asarray(values.cat.codes if isinstance(values, pd.Series) else values.codes)
+            positions = vocabulary.get_indexer(values.cat.categories if isinstance(values, pd.Series) else values.categories)
+            return np.where(codes >= 0, positions[codes], -1)
+        return vocabulary.get_indexer(np.asarray(values, dtype=object))
+
+    def codes(self, X) -> np.ndarray:
+        """
+            Returns the integer codes of the categorical features (one column each, -1 for missing or unseen values).
+
+            Args:
+                X (DataFrame or dict): Features of the batch, by column.
+        """
+        return np.column_stack([self._codes(name, X[name]) for name in self.vocabularies]).astype(np.int32)
+
+    def transform(self, X, dense: bool = False):
+        """
+            Returns the encoded batch as a CSR matrix, or a float array if dense, with the columns of feature_names.
+
+            Args:
+                X (DataFrame or dict): Features of the batch, by column (e.g. the columns of a JSON payload).
+                dense (bool): Return a dense array instead of a sparse matrix.
+        """
+        num_rows = len(X[next(iter(self.numeric_features or self.vocabularies))])
+        num_numeric = len(self.numeric_features)
+        num_columns = len(self.feature_names)
+
+        numeric = np.empty((num_rows, num_numeric), dtype=np.float64)
+        for column, name in enumerate(self.numeric_features):
+            numeric[:, column] = _as_float(X[name])
+
+        rows, columns = [], []
+        offset = num_numeric
+        for name, vocabulary in self.vocabularies.items():
+            codes = self._codes(name, X[name]) - int(self.drop_first)
+            present = codes >= 0
+            rows.append(np.flatnonzero(present))
+            columns.append(codes[present] + offset)
+            offset += len(vocabulary) - int(self.drop_first)
+
+        if dense:
+            encoded = np.zeros((num_rows, num_columns), dtype=np.float64)
+            encoded[:, :num_numeric] = numeric
+            for row, column in zip(rows, columns):
+                encoded[row, column] = 1.0
+            return encoded
+
+        # Non-zero numeric values (NaN included) followed by the set categories, all as (row, column, value) entries
+        numeric_rows, numeric_columns = np.nonzero(numeric != 0)
+        rows = np.concatenate([numeric_rows, *rows]).astype(np.int64)
+        columns = np.concatenate([numeric_columns, *columns]).astype(np.int64)
+        values = np.concatenate([numeric[numeric_rows, numeric_columns], np.ones(len(rows) - len(numeric_rows))])
+        return sparse.csr_matrix((values, (rows, columns)), shape=(num_rows, num_columns))
+
+    def save(self, path: str):
+        state = {
+            'version': ENCODER_VERSION,
+            'drop_first': self.drop_first,
+            'numeric_features': self.numeric_features,
+            'vocabularies': {name: vocabulary.tolist() for name, vocabulary in self.vocabularies.items()},
+        }
+        with open(path, 'w') as out_file:
+            json.dump(state, out_file)
+
+    @classmethod
+    def load(cls, path: str) -> 'CategoryEncoder':
+        with open(path, 'r') as in_file:
+            state = json.load(in_file)
+        encoder = cls(drop_first=state['drop_first'])
+        encoder.numeric_features = state['numeric_features']
+        encoder.vocabularies = {name: pd.Index(vocabulary) for name, vocabulary in state['vocabularies'].items()}
+        return encoder
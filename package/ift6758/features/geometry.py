@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# x coordinate of the goal attacked by the shooting team, for every value of opposite_team_side
+GOAL_X = {
+    'left': -90.0,
+    'right': 90.0,
+}
+
+
+def _as_float(values) -> np.ndarray:
+    """
+        Returns values as a float array, with missing values (None, NaN, pd.NA) as NaN.
+    """
+    return pd.Series(values, copy=False).astype(np.float64).to_numpy()
+
+
+def goal_x(side) -> np.ndarray:
+    """
+        Returns the x coordinate of the attacked goal for every value of side, NaN for unknown sides.
+    """
+    side = np.asarray(side, dtype=object)
+    return np.select([side == name for name in GOAL_X], list(GOAL_X.values()), np.nan)
+
+
+def goal_distance(side, x, y, decimals: int = 2) -> np.ndarray:
+    """
+        Returns the distance between every shot and the goal it is aimed at, computed on whole columns at once.
+        Gives the same values as get_dist_goal row by row: NaN where the side is unknown or a coordinate is missing,
+        and rounded like round() (np.round matches it on every integer rink coordinate).
+
+        Args:
+            side: opposite_team_side of every shot ('left' or 'right').
+            x: x coordinate of every shot.
+            y: y coordinate of every shot.
+            decimals (int): Number of decimals to round to, None to keep the exact distance.
+    """
+    distance = np.sqrt((_as_float(x) - goal_x(side)) ** 2 + _as_float(y) ** 2)
+    return distance if decimals is None else np.round(distance, decimals)
+
+
+def shot_angle(y, distance, decimals: int = None) -> np.ndarray:
+    """
+        Returns the angle in degrees between every shot and the axis of the goal it is aimed at, 0 for shots from the goal itself.
+
+        Args:
+            y: y coordinate of every shot.
+            distance: distance to the goal of every shot (see goal_distance).
+            decimals (int): Number of decimals to round to, None to keep the exact angle.
+    """
+    y = _as_float(y)
+    distance = _as_float(distance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angle = np.where(distance == 0, 0, np.degrees(np.arcsin(y / distance)))
+    return angle if decimals is None else np.round(angle, decimals)
+
+
+def mirror_coordinates(side, x, y) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Returns the coordinates of every shot mirrored so that all of them are aimed at the right goal.
+    """
+    left = np.asarray(side, dtype=object) == 'left'
+    x = _as_float(x)
+    y = _as_float(y)
+    return np.where(left, -x, x), np.where(left, -y, y)
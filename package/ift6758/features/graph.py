@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from package.ift6758.features.geometry import goal_distance, shot_angle
+
+# Types of the previous event that make a shot a rebound,
+# from the old API (seasons cleaned before the new API) and the new one
+BOUNCE_TYPES = ['SHOT', 'MISSED_SHOT', 'BLOCKED_SHOT', 'shot-on-goal', 'missed-shot', 'blocked-shot']
+
+
+class FeatureDefinition:
+    """
+        A feature computed column-wise from cleaned columns or other features.
+
+        Args:
+            name (str): Name of the feature.
+            inputs (list[str]): Cleaned columns or features it is computed from, passed to compute in this order.
+                An input named like the feature itself is the cleaned column, so a feature can replace a cleaned column.
+            compute (callable): Returns the values of the feature from the values of its inputs.
+    """
+    def __init__(self, name: str, inputs: list[str], compute):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+
+
+# Every feature the graph knows, by name (see feature)
+FEATURES = {}
+
+
+def feature(name: str, *inputs: str):
+    """
+        Registers the decorated function as the definition of a feature computed from inputs.
+    """
+    def register(compute):
+        FEATURES[name] = FeatureDefinition(name, list(inputs), compute)
+        return compute
+    return register
+
+
+@feature('game_seconds', 'period_time', 'period')
+def _game_seconds(period_time, period):
+    # Widened first, cleaned periods are stored on 8 bits
+    return period_time + period.astype(np.int32) * 20 * 60
+
+@feature('distance_goal', 'opposite_team_side', 'x', 'y')
+def _distance_goal(side, x, y):
+    return goal_distance(side, x, y)
+
+@feature('prev_distance_goal', 'opposite_team_side', 'prev_x', 'prev_y')
+def _prev_distance_goal(side, prev_x, prev_y):
+    return goal_distance(side, prev_x, prev_y)
+
+@feature('angle_shot', 'y', 'distance_goal')
+def _angle_shot(y, distance):
+    return shot_angle(y, distance, decimals=2)
+
+@feature('prev_angle_shot', 'prev_y', 'prev_distance_goal')
+def _prev_angle_shot(prev_y, prev_distance):
+    return shot_angle(prev_y, prev_distance, decimals=2)
+
+@feature('bounce', 'prev_type')
+def _bounce(prev_type):
+    return prev_type.isin(BOUNCE_TYPES)
+
+@feature('angle_change', 'bounce', 'angle_shot', 'prev_angle_shot')
+def _angle_change(bounce, angle, prev_angle):
+    return np.where(bounce, angle - prev_angle, 0)
+
+@feature('time_since_prev', 'time_since_prev')
+def _time_since_prev(time_since_prev):
+    # Replace 0 with 1 to avoid division by 0
+    return time_since_prev.replace(0, 1)
+
+@feature('speed', 'distance_from_prev', 'time_since_prev')
+def _speed(distance_from_prev, time_since_prev):
+    return round(distance_from_prev / time_since_prev, 2)
+
+@feature('empty_net', 'empty_net')
+def _empty_net(empty_net):
+    return empty_net.fillna(0).astype(int)
+
+@feature('is_goal', 'type')
+def _is_goal(event_type):
+    return event_type.str.contains('GOAL').astype(int)
+
+# Names the live game models were trained with
+@feature('distance', 'distance_goal')
+def _distance(distance):
+    return distance
+
+@feature('angle', 'angle_shot')
+def _angle(angle):
+    return angle
+
+
+class FeatureGraph:
+    """
+        Dependency graph of the feature definitions over the cleaned columns.
+        Asked for a list of names, it only reads the cleaned columns they need and only computes the features they
+        depend on, in an order where every feature comes after its inputs. Names that are not features are
+        cleaned columns passed through as they are. The same graph computes training sets and live game features.
+
+        Args:
+            features (dict): Feature definitions by name, FEATURES by default.
+    """
+    def __init__(self, features: dict = None):
+        self.features = FEATURES if features is None else features
+
+    def _is_feature(self, name: str, consumer: str = None) -> bool:
+        return name in self.features and name != consumer
+
+    def plan(self, names: list[str]) -> tuple[list[str], list[str]]:
+        """
+            Returns the cleaned columns the names need, and the features to compute in dependency order.
+        """
+        columns, order, visiting = [], [], set()
+
+        def visit(name, consumer=None):
+            if not self._is_feature(name, consumer):
+                if name not in columns:
+                    columns.append(name)
+                return
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Feature {name} depends on itself")
+            visiting.add(name)
+            for input_name in self.features[name].inputs:
+                visit(input_name, name)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return columns, order
+
+    def compute(self, df: pd.DataFrame, names: list[str]) -> pd.DataFrame:
+        """
+            Returns the requested features of the events in df, in the order of names, on the index of df.
+
+            Args:
+                df (DataFrame): Cleaned events, with at least the columns plan(names) needs.
+                names (list[str]): Features or cleaned columns to return.
+        """
+        columns, order = self.plan(names)
+        missing = [name for name in columns if name not in df.columns]
+        if missing:
+            raise KeyError(f"Columns {missing} are needed to compute {names}")
+
+        computed = {}
+        for name in order:
+            definition = self.features[name]
+            inputs = [computed[input_name] if self._is_feature(input_name, name) else df[input_name] for input_name in definition.inputs]
+            computed[name] = definition.compute(*inputs)
+
+        return pd.DataFrame({name: computed[name] if name in computed else df[name] for name in names}, index=df.index)
+
+
+FEATURE_GRAPH = FeatureGraph()
@@ -1,36 +1,135 @@
 import pandas as pd
 import numpy as np
 import os
+from package.ift6758.data import SeasonType
+from package.ift6758.data.cleaning import cleaning_options
+from package.ift6758.data.dataset import CleanedDataset, cleaned_season_file
+from package.ift6758.data.events import POWER_PLAY_COLUMNS, PREVIOUS_EVENT_COLUMNS, compact_events, concat_events
+from package.ift6758.features.binning import GoalRateBinning
+from package.ift6758.features.cache import FEATURE_CACHE_MAX_MB, FrameCache
+from package.ift6758.features.geometry import GOAL_X, goal_distance, shot_angle
+from package.ift6758.features.graph import FEATURE_GRAPH
+
+# Version of the feature functions, part of the key of the materialized features (see FeatureStore).
+# Bump it whenever a change to a feature function changes its output, so stored features are computed again
+FEATURE_VERSION = 1
+
+# Features features_2 adds to the cleaned events (see FeatureGraph)
+FEATURES_2 = ['game_seconds', 'distance_goal', 'prev_distance_goal', 'angle_shot', 'prev_angle_shot',
+              'bounce', 'angle_change', 'time_since_prev', 'speed', 'is_goal']
+# Features of the live game models
+LIVE_FEATURES = ['distance', 'angle', 'empty_net']
+# Cleaning options that add columns to the cleaned events, with the columns they add (see event_columns)
+CLEANING_COLUMNS = {'keepPreviousEventInfo': PREVIOUS_EVENT_COLUMNS, 'includePowerPlay': POWER_PLAY_COLUMNS}
         
 class FeatureEng:
-
-    def __init__(self, data_path: str):
+    """
+        Args:
+            data_path (str): Folder of the cleaned data.
+            cache_max_mb (float): Memory the fetched seasons may use, in MB.
+            cleaning (dict): Options of DataCleaner the seasons to read were cleaned with (e.g. {'keepPreviousEventInfo': True}),
+                by default the set of options every feature function needs (see dataset).
+    """
+    def __init__(self, data_path: str, cache_max_mb: float = FEATURE_CACHE_MAX_MB, cleaning: dict = None):
         self.data_path = data_path
-        self.cached_data = {}
-        
-    def _fetch_data(self, startYear: int, endYear: int, keepPlayoffs=False) -> pd.DataFrame:
+        # Seasons cleaned with other options are never read when given
+        self.cleaning = cleaning
+        # Fetched seasons are shared between calls, the feature functions never modify them in place
+        self.cached_data = FrameCache(cache_max_mb)
+        # First and last game IDs (included) fetched data is restricted to, all games when None (see ChunkedFeatures)
+        self.games = None
         
-        if (startYear, endYear, keepPlayoffs) in self.cached_data:
-            return self.cached_data[(startYear, endYear, keepPlayoffs)].copy()
-        
-        dfs = []
-        for year in range(startYear, endYear):
-            file_path = os.path.join(self.data_path, str(year), f'{year}.pkl')
-            if os.path.exists(file_path):
-                df = pd.read_pickle(file_path)
-                df['game_id'] = df['game_id'].astype(str)
-                # taking only the regular season for each year
-                if not keepPlayoffs:
-                    df = df[df['game_id'].str.startswith(f'{year}02')]
-                df['game_id'] = df['game_id'].astype(int)
-                dfs.append(df)
-            else:
-                print(f"File not found: {file_path}")
-        
-        data = pd.concat(dfs, ignore_index = True)
-        self.cached_data[(startYear, endYear, keepPlayoffs)] = data
+    def cleaning_for(self, function: str, names: list[str] = None, **options) -> dict:
+        """
+            Returns the cleaning options a feature function needs the seasons to be cleaned with, from the cleaned columns
+            its features are computed from, e.g. {'keepPreviousEventInfo': True} for features_2.
+
+            Args:
+                function (str): Name of the feature function (e.g. 'features_2').
+                names (list[str]): Features asked for, for the features function.
+                options: Other keyword arguments of the feature function, they don't change the columns it needs.
+        """
+        if function in ('features_2', 'getTestSet'):
+            names = FEATURES_2
+        columns, _ = FEATURE_GRAPH.plan(names or [])
+        return {
+            option: True
+            for option, option_columns in CLEANING_COLUMNS.items()
+            if any(name in columns for name, _, _ in option_columns)
+        }
+
+    def dataset(self, cleaning: dict = None) -> CleanedDataset:
+        """
+            Returns the dataset seasons are read from: the one cleaned with the options FeatureEng was given, otherwise
+            the only set of options seasons were cleaned with, or when there are several the one cleaned with the options needed
+            (and DataCleaner's defaults for the others), else the first one that has them.
+            Raises a ValueError if none of them has the options needed.
+
+            Args:
+                cleaning (dict): Cleaning options the features need (see cleaning_for).
+        """
+        if self.cleaning is not None:
+            return CleanedDataset(self.data_path, cleaning_options(**self.cleaning)[1])
+
+        option_sets = CleanedDataset(self.data_path).option_sets()
+        if len(option_sets) <= 1:
+            return CleanedDataset(self.data_path, next(iter(option_sets), None))
+        cleaning = cleaning or {}
+        key = cleaning_options(**cleaning)[1]
+        if key not in option_sets:
+            key = next((key for key, options in option_sets.items() if all(options.get(option) == value for option, value in cleaning.items())), None)
+        if key is None:
+            raise ValueError(f"No season was cleaned with {cleaning}, pass the cleaning options to read to FeatureEng: {option_sets}")
+        return CleanedDataset(self.data_path, key)
+
+    def _fetch_data(self, startYear: int, endYear: int, keepPlayoffs=False, columns: list[str] = None, cleaning: dict = None) -> pd.DataFrame:
+        """
+            Returns the cleaned events of the seasons from startYear to endYear (excluded), regular season games only unless keepPlayoffs.
+            Seasons are queried from the partitioned dataset written by DataCleaner (see CleanedDataset), which only opens
+            the partitions of the requested seasons and game types and only reads the requested columns.
+            Seasons that are not in it are read from their pickle.
+            Fetched frames are cached (see FrameCache) and every call returns a shallow copy of the cached frame, not a deep copy:
+            add or replace columns, never write into existing ones in place.
+            Only the games between self.games are fetched when it is set.
+            
+            Args:
+                columns (list[str]): The columns to read, all of them by default.
+                cleaning (dict): Cleaning options the features need, to choose the dataset to read (see dataset).
+        """
+        dataset = self.dataset(cleaning)
+        key = (startYear, endYear, keepPlayoffs, None if columns is None else tuple(columns), self.games, dataset.key)
+        data = self.cached_data.get(key)
+        if data is not None:
+            return data
         
-        return data.copy()
+        years = list(range(startYear, endYear))
+        season_types = list(SeasonType) if keepPlayoffs else [SeasonType.REGULAR]
+        stored = set(dataset.seasons())
+        if years and stored.issuperset(years):
+            data = dataset.read(years, season_types, columns, self.games)
+        else:
+            dfs = []
+            for year in years:
+                file_path = cleaned_season_file(self.data_path, year, dataset.key)
+                if year in stored:
+                    dfs.append(dataset.read([year], season_types, columns, self.games))
+                elif os.path.exists(file_path):
+                    df = pd.read_pickle(file_path)
+                    df['game_id'] = df['game_id'].astype(int)
+                    # taking only the regular season for each year, game IDs are {season}{type}{number}
+                    if not keepPlayoffs:
+                        df = df[df['game_id'] // 10000 % 100 == int(SeasonType.REGULAR.value)]
+                    if self.games is not None:
+                        df = df[df['game_id'].between(*self.games)]
+                    if columns is not None:
+                        df = df[columns]
+                    dfs.append(compact_events(df))
+                else:
+                    print(f"File not found: {file_path}")
+            
+            # Keeps the columns categorical across seasons, where pd.concat would turn them back into strings
+            data = concat_events(dfs)
+        return self.cached_data.put(key, data)
 
     def features_1(self, startYear: int, endYear: int):
         
@@ -42,163 +141,150 @@ class FeatureEng:
         
         #1 or 0 for goal or shot respectively
         trainValSets['is_goal'] = trainValSets['type'].str.contains('GOAL').astype(int)
-        trainValSets.drop(columns=['type'], inplace=True)
-        trainValSets['distance_goal'] = trainValSets.apply(lambda row: get_dist_goal(row['opposite_team_side'], row['x'], row['y']), axis=1)
-        trainValSets['angle_shot'] = np.where(trainValSets['distance_goal'] == 0, 
-                                         0, 
-                                         np.degrees(np.arcsin(trainValSets['y'] / trainValSets['distance_goal'])))
+        trainValSets = trainValSets.drop(columns=['type'])
+        trainValSets['distance_goal'] = goal_distance(trainValSets['opposite_team_side'], trainValSets['x'], trainValSets['y'])
+        trainValSets['angle_shot'] = shot_angle(trainValSets['y'], trainValSets['distance_goal'])
         
         anomalies = trainValSets.loc[trainValSets['distance_goal']>=100]
         anomalies = anomalies.loc[anomalies['is_goal']==1]
         anomalies = anomalies.loc[anomalies['empty_net']==0]
-        anorm_columns_to_drop = ['game_time', 'team', 'shooter', 'goalie', 'strength', 'shot_type',
+        anorm_columns_to_drop = ['game_time', 'team', 'shooter_id', 'shooter', 'goalie_id', 'goalie', 'strength', 'shot_type',
                            'prev_type', 'prev_x', 'prev_y', 'time_since_prev', 'distance_from_prev',
                            'opposite_team_side', 'x', 'y', 'prev_period_time']
-        anomalies.drop(columns=anorm_columns_to_drop, inplace=True, errors='ignore')
+        anomalies = anomalies.drop(columns=anorm_columns_to_drop, errors='ignore')
         anomalies = anomalies.sort_values(by=['distance_goal'])
         self.anomalies = anomalies
 
         columns_to_drop = ['game_id', 'period_time', 'game_time', 'period', 
-                           'team', 'shooter', 'goalie', 'strength', 'shot_type',
+                           'team', 'shooter_id', 'shooter', 'goalie_id', 'goalie', 'strength', 'shot_type',
                            'prev_type', 'prev_x', 'prev_y', 'time_since_prev', 'distance_from_prev',
                            'opposite_team_side', 'x', 'y', 'prev_period_time']
         
         
-        trainValSets.drop(columns=columns_to_drop, inplace=True, errors='ignore')
+        trainValSets = trainValSets.drop(columns=columns_to_drop, errors='ignore')
         
         
         self.trainValSets = trainValSets
-        self.trainValSets.to_pickle('./TrainValSets.pkl')
+        self.goal_rates = GoalRateBinning(trainValSets, 'is_goal')
         return self.trainValSets
     
     def getProbabilities(self, bins: int):
-        
-        df = self.trainValSets.copy()
-        df_dist_bins = pd.cut(x=df['distance_goal'].to_numpy(), bins=bins, include_lowest = True, right = False)
-        df_angle_bins = pd.cut(x=df['angle_shot'].to_numpy(), bins=bins, include_lowest = True, right = False)
-        df['distance_range'] = df_dist_bins
-        df['angle_range'] = df_angle_bins
-
-        df_dist = df.loc[:,['is_goal', 'distance_range']]
-        df_angles = df.loc[:,['is_goal', 'angle_range']]
-        
-        df_dist_goals = df_dist[df_dist['is_goal']==1]
-        df_angle_goals = df_angles[df_angles['is_goal']==1]
-
-        shot_counts = df['is_goal'].count()
-        
-        #df_dist_counts = df_dist.groupby(['distance_range'])['is_goal'].count().reset_index(name = 'Total_Shots_Bin')        
-        df_distGoal_goalCounts = df_dist_goals.groupby(['distance_range'])['is_goal'].count().reset_index(name = 'Count_Goals_Bin')
-        df_distGoal_totalCounts = df.groupby(['distance_range'])['is_goal'].count().reset_index(name = 'Total_Count_Goals_Bin')
-        df_distGoal_rate = pd.DataFrame()
-        df_distGoal_rate['distances'] = df_distGoal_goalCounts['distance_range']
-        df_distGoal_rate['GoalDist_Rate'] = df_distGoal_goalCounts['Count_Goals_Bin'] / df_distGoal_totalCounts['Total_Count_Goals_Bin']
-        
-        #df_angle_counts = df_angles.groupby(['angle_range'])['is_goal'].count().reset_index(name='Total_Shots_Bin')
-        df_angleGoal_goalCounts = df_angle_goals.groupby(['angle_range'])['is_goal'].count().reset_index(name='Count_Goals_Bin')
-        df_angleGoal_totalCounts = df.groupby(['angle_range'])['is_goal'].count().reset_index(name='Total_Count_Goals_Bin')
-        df_angleGoal_rate = pd.DataFrame()
-        df_angleGoal_rate['angles'] = df_angleGoal_goalCounts['angle_range']
-        df_angleGoal_rate['GoalAngle_Rate'] = df_angleGoal_goalCounts['Count_Goals_Bin'] / df_angleGoal_totalCounts['Total_Count_Goals_Bin']
-        
-        final_df = pd.concat([df_distGoal_rate, df_angleGoal_rate], axis=1)
-        
-        return final_df
+        """
+            Returns the goal rate of every bin of distance_goal and of angle_shot, [a, b) bins between the min and the max.
+            Counts come from the GoalRateBinning of the last features_1 call, so other bin numbers or
+            distance x angle grids of the same shots (self.goal_rates.tables) reuse its cache.
+        """
+        distances, angles = [self.goal_rates.table(column, bins) for column in ['distance_goal', 'angle_shot']]
+        return pd.DataFrame({
+            'distances': distances.labels[0],
+            'GoalDist_Rate': distances.rate,
+            'angles': angles.labels[0],
+            'GoalAngle_Rate': angles.rate,
+        })
 
     def features_2(self, startYear: int, endYear: int, drop_teams = True, keepPlayoffs=False):
-        df = self._fetch_data(startYear, endYear, keepPlayoffs)
+        df = self._fetch_data(startYear, endYear, keepPlayoffs, cleaning=self.cleaning_for('features_2'))
         
-        # Convert period_time of event to total game time and rename to 'game_seconds'
-        df['period_time'] = df['period_time'] + (df['period'] * 20 * 60)
-        df.rename(columns={'period_time': 'game_seconds'}, inplace=True)
+        # Features of the feature graph, game_seconds takes the place of period_time
+        # and time_since_prev is replaced by the one speed is computed with
+        features = FEATURE_GRAPH.compute(df, FEATURES_2)
+        df = df.rename(columns={'period_time': 'game_seconds'})
+        for name in FEATURES_2:
+            df[name] = features[name]
         
-        # Distance
-        df['distance_goal'] = df.apply(lambda row: get_dist_goal(row['opposite_team_side'], row['x'], row['y']), axis=1)
-        df['prev_distance_goal'] = df.apply(lambda row: get_dist_goal(row['opposite_team_side'], row['prev_x'], row['prev_y']), axis=1)
-        
-        # Angle
-        df['angle_shot'] = np.where(df['distance_goal'] == 0, 0, round(np.degrees(np.arcsin(df['y'] / df['distance_goal'])),2))
-        df['prev_angle_shot'] = np.where(df['prev_distance_goal'] == 0, 0, round(np.degrees(np.arcsin(df['prev_y'] / df['prev_distance_goal'])),2))
-    
-        # Rebond
-        event_types = ['SHOT', 'MISSED_SHOT', 'BLOCKED_SHOT']
-        df['bounce'] = df['prev_type'].isin(event_types)
-        
-        # Changement d'angle de tir
-        df['angle_change'] = np.where((df['bounce']), df['angle_shot'] - df['prev_angle_shot'], 0)    
-            
-        # Vitesse
-        # Replace 0 with 1 to avoid division by 0
-        df['time_since_prev'] = df['time_since_prev'].replace(0, 1)
-        df['speed'] = round(df['distance_from_prev'] / df['time_since_prev'],2)
-        
-        # Add target column
-        df['is_goal'] = df['type'].str.contains('GOAL').astype(int)
-        
-        columns_to_drop = ['strength','shooter', 'goalie', 'opposite_team_side', 'prev_period_time', 'type']
+        columns_to_drop = ['strength', 'shooter_id', 'shooter', 'goalie_id', 'goalie', 'opposite_team_side', 'prev_period_time', 'type']
         if drop_teams:
             columns_to_drop += ['team']
-        df.drop(columns=columns_to_drop, inplace=True, errors='ignore')   
+        df = df.drop(columns=columns_to_drop, errors='ignore')
         
-        df.reset_index(drop=True, inplace=True)
+        df = df.reset_index(drop=True)
         return df
     
+    def features(self, startYear: int, endYear: int, names: list[str], keepPlayoffs=False) -> pd.DataFrame:
+        """
+            Returns the requested features of the seasons from startYear to endYear (excluded), computed with the feature graph:
+            only the cleaned columns they need are read and only the features they depend on are computed.
+            Names that are not features are cleaned columns, returned as they are.
+            
+            Args:
+                names (list[str]): Features to return, e.g. ['distance_goal', 'angle_shot', 'is_goal'].
+        """
+        columns, _ = FEATURE_GRAPH.plan(names)
+        df = self._fetch_data(startYear, endYear, keepPlayoffs, columns=columns, cleaning=self.cleaning_for('features', names))
+        return FEATURE_GRAPH.compute(df, names).reset_index(drop=True)
+
+    def team_game_index(self, startYear: int, endYear: int) -> pd.DataFrame:
+        """
+            Returns every game played by every team in the seasons from startYear to endYear (excluded), regular season and playoffs,
+            built in one pass over the team and game_id columns. Each row is a (team, game) pair with the season, whether it is a
+            playoff game, and game_number, the position of the game among the games of the team of that season and type (0 for the first).
+        """
+        # Events are ordered by game ID, so are the games of every team
+        games = self._fetch_data(startYear, endYear, keepPlayoffs=True, columns=['team', 'game_id']).drop_duplicates(ignore_index=True)
+        # Game IDs are {season}{type}{number}
+        index = pd.DataFrame({
+            'team': games['team'],
+            'season': games['game_id'] // 1000000,
+            'playoffs': games['game_id'] // 10000 % 100 == int(SeasonType.PLAYOFF.value),
+            'game_id': games['game_id'],
+        })
+        index['game_number'] = index.groupby(['team', 'season', 'playoffs'], observed=True).cumcount()
+        return index
+    
+    def _team_games(self, index: pd.DataFrame) -> dict:
+        teams = {}
+        for (team, season, playoffs), games in index.groupby(['team', 'season', 'playoffs'], observed=True)['game_id']:
+            seasons = teams.setdefault(team, {})
+            season_games = seasons.setdefault(int(season), {'regular': [], 'playoffs': []})
+            season_games['playoffs' if playoffs else 'regular'] = games.tolist()
+        return teams
+    
     def get_team_games(self, season: int) -> dict[list]:
         """
             Returns a dictionary of the teams that played in a given season.
             The keys are the team names and the values are lists of game IDs.
         """
-        output = {}
-        
-        df = self._fetch_data(season, season+1, keepPlayoffs=True)
-        team_games = df.groupby('team')['game_id'].unique().to_dict()
-        for team, games in team_games.items():
-            regular = []
-            playoffs = []
-            for id in games:
-                type = str(id)[4:6]
-                if type == '02':
-                    regular.append(id)
-                elif type == '03':
-                    playoffs.append(id)
-                    
-            assert len(regular) + len(playoffs) == len(games)
-            
-            output[team] = {'regular': regular, 'playoffs': playoffs}
-        
-        return output
+        return {team: seasons[season] for team, seasons in self._team_games(self.team_game_index(season, season+1)).items()}
     
     def get_team_games_seasons(self, seasonStart: int, seasonEnd: int) -> dict[list]:
         """
             Returns a dictionary of the teams that played in a given season range.
             The keys are the team names and the values are lists of game IDs.
         """
-        teams = {}
-        for season in range(seasonStart, seasonEnd):
-            team_games = self.get_team_games(season)
+        return self._team_games(self.team_game_index(seasonStart, seasonEnd))
+    
+    def first_team_games_mask(self, df: pd.DataFrame, team_games, num_regular : int = 5, num_playoffs : int = 0) -> np.ndarray:
+        """
+            Returns whether every event of the dataframe belongs to one of the first num_regular regular season games
+            or num_playoffs playoff games of its team, in one vectorized lookup of the (team, game_id) pairs.
             
-            for team, games in team_games.items():
-                if team not in teams:
-                    teams[team] = {}
-                
-                teams[team][season] = games
-                            
-        return teams
+            Args:
+                team_games: The games of every team, as returned by team_game_index or get_team_games_seasons.
+        """
+        if isinstance(team_games, pd.DataFrame):
+            first = team_games[team_games['game_number'] < np.where(team_games['playoffs'], num_playoffs, num_regular)]
+            pairs = pd.MultiIndex.from_arrays([first['team'].astype(object), first['game_id']])
+        else:
+            pairs = pd.MultiIndex.from_tuples([
+                (team, game_id)
+                for team, seasons in team_games.items() for games in seasons.values()
+                for game_id in games['regular'][:num_regular] + games['playoffs'][:num_playoffs]
+            ], names=['team', 'game_id'])
+        if not len(pairs):
+            return np.zeros(len(df), dtype=bool)
+        return pd.MultiIndex.from_arrays([df['team'].astype(object), df['game_id']]).isin(pairs)
     
-    def remove_first_team_games(self, df: pd.DataFrame, team_season_games: dict, num_regular : int = 5 , num_playoffs : int = 0):
+    def remove_first_team_games(self, df: pd.DataFrame, team_season_games, num_regular : int = 5 , num_playoffs : int = 0):
         """
             Removes the first num_regular regular season games and num_playoffs playoff games for each team in the given dataframe.
-        """
-        for team, seasons in team_season_games.items():
-            team_games_to_remove = []
-            for season, games in seasons.items():
-                team_games_to_remove += games['regular'][:num_regular]
-                team_games_to_remove += games['playoffs'][:num_playoffs]
             
-            df.drop(df[(df['team'] == team) & (df['game_id'].isin(team_games_to_remove))].index, inplace=True)
+            Args:
+                team_season_games: The games of every team, as returned by team_game_index or get_team_games_seasons.
+        """
+        df.drop(df.index[self.first_team_games_mask(df, team_season_games, num_regular, num_playoffs)], inplace=True)
             
     def getTestSet(self, year:int):
-        file_path = os.path.join(self.data_path, str(year), f'{year}.pkl')
+        file_path = cleaned_season_file(self.data_path, year, self.dataset(self.cleaning_for('getTestSet')).key)
         if os.path.exists(file_path):
             self.testSet = pd.read_pickle(file_path)
             return self.features_2(year, year+1, keepPlayoffs=True)
@@ -206,27 +292,17 @@ class FeatureEng:
             raise FileNotFoundError(f"No data found for year {year} at {file_path}.")
     
     def encodeCategories(self, df: pd.DataFrame, categorical_features: list):
+        # Columns depend on the categories of df, see CategoryEncoder for a layout shared by training and serving
         return pd.get_dummies(df, columns=categorical_features, drop_first=True)
     
 
-def features_live_game(game_events : pd.DataFrame): # new api (annoying) so we limit ourselves to the features we need for simple models   
-     
-    df = game_events.copy()
-    df['distance'] = df.apply(lambda row: get_dist_goal(row['opposite_team_side'], row['x'], row['y']), axis=1)
-    df['angle'] = np.where(df['distance'] == 0, 0, round(np.degrees(np.arcsin(df['y'] / df['distance'])),2))
-    
-    df['empty_net'] = df['empty_net'].fillna(0)
-    df['empty_net'] = df['empty_net'].astype(int)
-    
-    return df[['distance', 'angle', 'empty_net']]
+def features_live_game(game_events : pd.DataFrame, names: list[str] = LIVE_FEATURES): # new api (annoying) so we limit ourselves to the features we need for simple models   
+    # Same feature graph as the training sets, only computing what the models use
+    return FEATURE_GRAPH.compute(game_events, names)
 
 def get_dist_goal(side, x, y) -> float:
-    goal_x = {
-        'left': -90.0,
-        'right': 90.0
-    }
-    
-    if side not in goal_x:
+    # Distance of a single shot, see goal_distance for whole columns
+    if side not in GOAL_X:
         return None
     
-    return round(((x - goal_x[side]) ** 2 + y ** 2) ** 0.5,2)
\ No newline at end of file
+    return round(((x - GOAL_X[side]) ** 2 + y ** 2) ** 0.5,2)
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import json
+import pandas as pd
+from package.ift6758.data.dataset import cleaned_season_file
+from package.ift6758.data.fragments import options_key
+from package.ift6758.features.ingenierie import FEATURE_VERSION, FeatureEng
+
+
+def concat_features(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+        Concatenates the feature frames of several seasons, keeping categorical columns categorical
+        where pd.concat alone falls back to plain objects as soon as two seasons have different categories.
+    """
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for name in frames[0].columns:
+        if isinstance(frames[0][name].dtype, pd.CategoricalDtype) and not isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype('category')
+    return df
+
+
+class FeatureStore:
+    """
+        Materialized outputs of the FeatureEng feature functions, one file per season, kept apart for every feature set.
+        A feature set is a feature function with its options at a version of the feature code (FEATURE_VERSION),
+        identified by a short key. Asking for a range of seasons reads the seasons already materialized and only
+        computes the ones that are missing or whose cleaned data changed since.
+
+        Layout:
+            {store_path}/{key}/manifest.json
+            {store_path}/{key}/{season}.pkl
+
+        Args:
+            features (FeatureEng): Computes the seasons that are not materialized yet.
+            store_path (str): Folder of the store.
+    """
+    def __init__(self, features: FeatureEng, store_path: str):
+        self.features = features
+        self.store_path = store_path
+        self.manifests = {}
+
+        os.makedirs(store_path, exist_ok=True)
+
+    def _manifest_file(self, key: str) -> str:
+        return os.path.join(self.store_path, key, 'manifest.json')
+
+    def _season_file(self, key: str, season: int) -> str:
+        return os.path.join(self.store_path, key, f"{season}.pkl")
+
+    def key(self, function: str, **options) -> str:
+        """
+            Returns the key of a feature function with its options at the current FEATURE_VERSION.
+        """
+        return options_key({'function': function, **options}, FEATURE_VERSION)
+
+    def manifest(self, key: str) -> dict:
+        """
+            Returns the manifest of a feature set, reading it from disk the first time.
+            'seasons' maps every materialized season to the fingerprint of the cleaned data it was computed from.
+        """
+        if key not in self.manifests:
+            manifest = {'function': None, 'options': {}, 'version': FEATURE_VERSION, 'seasons': {}}
+            if os.path.exists(self._manifest_file(key)):
+                with open(self._manifest_file(key), 'r') as in_file:
+                    manifest = json.load(in_file)
+                manifest['seasons'] = {int(season): fingerprint for season, fingerprint in manifest['seasons'].items()}
+            self.manifests[key] = manifest
+        return self.manifests[key]
+
+    def _save_manifest(self, key: str):
+        manifest = self.manifests[key]
+        tmp_file = f"{self._manifest_file(key)}.tmp"
+        with open(tmp_file, 'w') as out_file:
+            json.dump({**manifest, 'seasons': {str(season): fingerprint for season, fingerprint in sorted(manifest['seasons'].items())}}, out_file)
+        os.replace(tmp_file, self._manifest_file(key))
+
+    def _source_fingerprint(self, season: int, function: str, options: dict) -> list | None:
+        """
+            Returns the size and modification time of the cleaned files a feature function reads a season from, or None if there are none.
+        """
+        dataset = self.features.dataset(self.features.cleaning_for(function, **options))
+        if season in dataset.seasons():
+            # The path of the files includes the key of the cleaning options, so other options make another fingerprint
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(dataset.season_path(season)) for name in names if name.endswith('.parquet'))
+        else:
+            files = [path for path in [cleaned_season_file(self.features.data_path, season, dataset.key)] if os.path.exists(path)]
+        if not files:
+            return None
+        return [[os.path.relpath(path, self.features.data_path), os.stat(path).st_size, os.stat(path).st_mtime_ns] for path in files]
+
+    def get(self, function: str, startYear: int, endYear: int, **options) -> pd.DataFrame:
+        """
+            Returns the output of a feature function for the seasons from startYear to endYear (excluded),
+            computing only the seasons that are not materialized yet.
+
+            Args:
+                function (str): Name of the FeatureEng feature function (e.g. 'features_2').
+                options: Keyword arguments of the feature function (e.g. drop_teams=False).
+        """
+        key = self.key(function, **options)
+        manifest = self.manifest(key)
+        if manifest['function'] is None:
+            manifest.update(function=function, options=options)
+        return self.load(key, startYear, endYear)
+
+    def load(self, key: str, startYear: int, endYear: int) -> pd.DataFrame:
+        """
+            Returns a feature set by key for the seasons from startYear to endYear (excluded),
+            computing the seasons that are missing with the function and options it was created with.
+        """
+        manifest = self.manifest(key)
+        if manifest['function'] is None:
+            raise KeyError(f"No feature set with key {key} in {self.store_path}")
+        function = getattr(self.features, manifest['function'])
+
+        frames = []
+        for season in range(startYear, endYear):
+            fingerprint = self._source_fingerprint(season, manifest['function'], manifest['options'])
+            season_file = self._season_file(key, season)
+            if fingerprint is not None and manifest['seasons'].get(season) == fingerprint and os.path.exists(season_file):
+                frames.append(pd.read_pickle(season_file))
+                continue
+
+            print(f"Computing {manifest['function']} for season {season}")
+            df = function(season, season + 1, **manifest['options'])
+            frames.append(df)
+            if fingerprint is None:
+                # Nothing was cleaned for this season, nothing worth keeping
+                continue
+            os.makedirs(os.path.dirname(season_file), exist_ok=True)
+            df.to_pickle(f"{season_file}.tmp")
+            os.replace(f"{season_file}.tmp", season_file)
+            manifest['seasons'][season] = fingerprint
+            self._save_manifest(key)
+
+        return concat_features(frames)
@@ -0,0 +1,192 @@
+import os
+import json
+import math
+import hashlib
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler
+from sklearn.utils import _safe_indexing
+
+# Fewest training samples per fit in the first rung of successive halving
+MIN_RESOURCES = 500
+
+
+def _to_json(value):
+    # Values drawn from scipy distributions are numpy scalars
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _fit_and_score(estimator, params: dict, X, y, train, test, scoring: str) -> float:
+    model = clone(estimator).set_params(**params)
+    model.fit(_safe_indexing(X, train), _safe_indexing(y, train))
+    return get_scorer(scoring)(model, _safe_indexing(X, test), _safe_indexing(y, test))
+
+
+class TrialStore:
+    """
+        Finished trials of hyperparameter searches, appended to a JSON lines file as soon as each of them finishes,
+        so that an interrupted search skips them when it is run again.
+
+        Args:
+            path (str): The file of the trials, nothing is kept on disk if None.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self.trials = {}
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as in_file:
+                for line in in_file:
+                    try:
+                        trial = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line of a search killed while writing it
+                        continue
+                    self.trials[trial['key']] = trial
+
+    def get(self, key: str) -> dict | None:
+        return self.trials.get(key)
+
+    def add(self, trial: dict):
+        self.trials[trial['key']] = trial
+        if self.path is not None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as out_file:
+                out_file.write(json.dumps(trial) + '\n')
+
+
+class HalvingSearch:
+    """
+        Random search of hyperparameters where the folds of every candidate are fitted in parallel on all cores,
+        and every finished trial (a candidate cross-validated on a number of samples) is saved to a TrialStore.
+        Candidates are drawn with a fixed seed, so running the search again resumes it.
+        With a halving factor, candidates go through rungs of successive halving: all of them are first fitted on few samples,
+        and only the best 1/factor of each rung go on to the next one with factor times more samples, up to the whole folds.
+
+        Args:
+            estimator: The model, cloned for every fit.
+            param_distributions (dict): Distributions or lists of values of every hyperparameter (like RandomizedSearchCV).
+            cv: Cross-validation splitter.
+            scoring (str): Scorer name, higher is better.
+            n_iter (int): Number of candidates.
+            factor (int): Halving factor, None for a plain random search on the whole folds.
+            n_jobs (int): Fits running at once, -1 for all cores.
+            results_path (str): File of the trials, to resume the search.
+            random_state (int): Seed of the candidates and of the samples of the rungs.
+    """
+    def __init__(self, estimator, param_distributions: dict, cv, scoring: str = 'accuracy', n_iter: int = 10,
+                 factor: int = None, n_jobs: int = -1, results_path: str = None, random_state: int = 42):
+        self.estimator = estimator
+        self.param_distributions = param_distributions
+        self.cv = cv
+        self.scoring = scoring
+        self.n_iter = n_iter
+        self.factor = factor
+        self.n_jobs = n_jobs
+        self.results_path = results_path
+        self.random_state = random_state
+
+    def _search_key(self, X, y) -> str:
+        """
+            Identifies the search: trials of another model, cross-validation, scoring or data are never reused.
+            The data is identified by the content of X (values of a CSR matrix and their positions included)
+            and its feature names when it has some, so features of the same width give another search.
+        """
+        content = json.dumps({
+            'estimator': type(self.estimator).__name__,
+            'params': self.estimator.get_params(),
+            'cv': repr(self.cv),
+            'scoring': self.scoring,
+            'shape': list(X.shape),
+            'features': list(map(str, X.columns)) if hasattr(X, 'columns') else None,
+            'X': joblib.hash(X),
+            'y': hashlib.sha1(np.ascontiguousarray(y).tobytes()).hexdigest(),
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(content.encode()).hexdigest()[:12]
+
+    def _resources(self, n_samples: int) -> list[int | None]:
+        """
+            Returns the number of training samples per fit of every rung, None for the whole folds.
+        """
+        if self.factor is None:
+            return [None]
+        # One rung more each time the candidates can be divided by factor
+        num_rungs = 1
+        while self.factor ** num_rungs <= self.n_iter:
+            num_rungs += 1
+        resources = sorted({max(min(n_samples, MIN_RESOURCES), n_samples // self.factor ** rung) for rung in range(1, num_rungs)})
+        return [n_resources for n_resources in resources if n_resources < n_samples] + [None]
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        store = TrialStore(self.results_path)
+        search = self._search_key(X, y)
+        candidates = [
+            {name: _to_json(value) for name, value in params.items()}
+            for params in ParameterSampler(self.param_distributions, self.n_iter, random_state=self.random_state)
+        ]
+        # Training samples of every fold in a fixed random order, rungs before the last one fit on growing prefixes of it
+        rng = np.random.default_rng(self.random_state)
+        splits = [(train, test, rng.permutation(train)) for train, test in self.cv.split(X, y)]
+
+        trials = []
+        remaining = list(range(len(candidates)))
+        resources = self._resources(min(len(train) for train, _, _ in splits))
+        for rung, n_resources in enumerate(resources):
+            rung_trials = self._run_rung(X, y, store, search, rung, n_resources, candidates, remaining, splits)
+            trials += rung_trials
+            # Best candidates go on to the next rung
+            ranked = sorted(rung_trials, key=lambda trial: trial['mean_test_score'], reverse=True)
+            remaining = [trial['candidate'] for trial in ranked[:max(1, math.ceil(len(ranked) / (self.factor or 1)))]]
+
+        best = max(rung_trials, key=lambda trial: trial['mean_test_score'])
+        self.best_params_ = best['params']
+        self.best_score_ = best['mean_test_score']
+        self.cv_results_ = {
+            'params': [trial['params'] for trial in trials],
+            'mean_test_score': np.array([trial['mean_test_score'] for trial in trials]),
+            'std_test_score': np.array([trial['std_test_score'] for trial in trials]),
+            'rung': np.array([trial['rung'] for trial in trials]),
+            'n_resources': np.array([trial['n_resources'] for trial in trials]),
+        }
+        return self
+
+    def _run_rung(self, X, y, store: TrialStore, search: str, rung: int, n_resources: int,
+                  candidates: list[dict], remaining: list[int], splits: list) -> list[dict]:
+        """
+            Cross-validates the remaining candidates on n_resources samples (the whole folds if None), fitting only those without a finished trial.
+        """
+        keys = {
+            candidate: hashlib.sha1(json.dumps([search, n_resources, candidates[candidate]], sort_keys=True).encode()).hexdigest()[:16]
+            for candidate in remaining
+        }
+        missing = [candidate for candidate in remaining if store.get(keys[candidate]) is None]
+        print(f"Rung {rung}: {len(remaining)} candidates on {n_resources or 'all'} samples, {len(remaining) - len(missing)} already done")
+
+        def fit_fold(candidate, fold):
+            train, test, shuffled_train = splits[fold]
+            if n_resources is not None:
+                train = shuffled_train[:n_resources]
+            return candidate, fold, _fit_and_score(self.estimator, candidates[candidate], X, y, train, test, self.scoring)
+
+        scores = {candidate: {} for candidate in missing}
+        tasks = (delayed(fit_fold)(candidate, fold) for candidate in missing for fold in range(len(splits)))
+        for candidate, fold, score in Parallel(n_jobs=self.n_jobs, return_as='generator_unordered')(tasks):
+            scores[candidate][fold] = score
+            if len(scores[candidate]) == len(splits):
+                # Saved as soon as all the folds of the candidate are done
+                fold_scores = [scores[candidate][fold] for fold in range(len(splits))]
+                store.add({
+                    'key': keys[candidate],
+                    'search': search,
+                    'rung': rung,
+                    'n_resources': n_resources,
+                    'params': candidates[candidate],
+                    'scores': fold_scores,
+                    'mean_test_score': float(np.mean(fold_scores)),
+                    'std_test_score': float(np.std(fold_scores)),
+                })
+
+        return [{**store.get(keys[candidate]), 'rung': rung, 'candidate': candidate} for candidate in remaining]
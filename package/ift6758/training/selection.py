@@ -0,0 +1,117 @@
+import math
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import get_scorer
+from sklearn.utils import _safe_indexing
+
+
+def _columns(X, features: np.ndarray):
+    return X.iloc[:, features] if hasattr(X, 'iloc') else X[:, features]
+
+
+def _fit_fold(estimator, X, y, train, test, features: np.ndarray, scoring: str, importance: str, random_state: int):
+    """
+        Fits a fold on some features and returns its test score and the importance of every one of them.
+    """
+    model = clone(estimator)
+    model.fit(_columns(_safe_indexing(X, train), features), _safe_indexing(y, train))
+    X_test, y_test = _columns(_safe_indexing(X, test), features), _safe_indexing(y, test)
+    score = get_scorer(scoring)(model, X_test, y_test)
+
+    if importance == 'permutation':
+        importances = permutation_importance(model, X_test, y_test, scoring=scoring, n_repeats=3, random_state=random_state).importances_mean
+    elif hasattr(model, 'feature_importances_'):
+        importances = model.feature_importances_
+    else:
+        importances = np.abs(np.asarray(model.coef_)).reshape(-1, len(features)).sum(axis=0)
+    return score, np.asarray(importances, dtype=np.float64)
+
+
+class FastFeatureSelector:
+    """
+        Recursive feature elimination that prunes many features at a time instead of one:
+        every round cross-validates the remaining features (folds fitted in parallel), then drops the given fraction
+        of the least important ones, by the importances of the model (feature_importances_ or coef_) or by permutation.
+        It stops once the score has not improved for a few rounds, and keeps the features of the best round.
+        Exposes the attributes of RFECV that AdvancedModel uses (cv_results_, support_, ranking_, get_support).
+
+        Args:
+            estimator: The model, cloned for every fit.
+            cv: Cross-validation splitter.
+            scoring (str): Scorer name, higher is better.
+            step (float or int): Fraction of the remaining features (float) or number of features (int) dropped every round.
+            importance (str): 'model' for the importances of the fitted model, 'permutation' for permutation importances.
+            patience (int): Rounds without improvement of the score before stopping.
+            tol (float): Smallest improvement of the score that counts.
+            min_features_to_select (int): Fewest features to keep.
+            n_jobs (int): Folds fitted at once, -1 for all cores.
+            random_state (int): Seed of the permutations.
+    """
+    def __init__(self, estimator, cv, scoring: str = 'accuracy', step: float = 0.2, importance: str = 'model', patience: int = 2,
+                 tol: float = 1e-4, min_features_to_select: int = 1, n_jobs: int = -1, random_state: int = 42):
+        self.estimator = estimator
+        self.cv = cv
+        self.scoring = scoring
+        self.step = step
+        self.importance = importance
+        self.patience = patience
+        self.tol = tol
+        self.min_features_to_select = min_features_to_select
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _num_dropped(self, num_features: int) -> int:
+        num_dropped = int(math.ceil(self.step * num_features)) if isinstance(self.step, float) else self.step
+        return max(1, min(num_dropped, num_features - self.min_features_to_select))
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        splits = list(self.cv.split(X, y))
+        num_features = X.shape[1]
+        features = np.arange(num_features)
+        # Round in which every feature was dropped, to rank them like RFECV (1 for the selected ones)
+        dropped_in = np.zeros(num_features, dtype=int)
+
+        rounds = []
+        best, stale = None, 0
+        with Parallel(n_jobs=self.n_jobs) as parallel:
+            while True:
+                results = parallel(
+                    delayed(_fit_fold)(self.estimator, X, y, train, test, features, self.scoring, self.importance, self.random_state)
+                    for train, test in splits
+                )
+                scores = np.array([score for score, _ in results])
+                rounds.append({'features': features, 'scores': scores})
+                print(f"{len(features)} features: {self.scoring} {scores.mean():.4f} (+/- {scores.std():.4f})")
+
+                if best is None or scores.mean() > rounds[best]['scores'].mean() + self.tol:
+                    best, stale = len(rounds) - 1, 0
+                else:
+                    stale += 1
+                if stale >= self.patience or len(features) <= self.min_features_to_select:
+                    break
+
+                importances = np.mean([importances for _, importances in results], axis=0)
+                order = np.argsort(importances, kind='stable')
+                dropped = order[:self._num_dropped(len(features))]
+                dropped_in[features[dropped]] = len(rounds)
+                features = np.sort(np.delete(features, dropped))
+
+        self.n_fits_ = len(rounds) * len(splits)
+        self.support_ = np.zeros(num_features, dtype=bool)
+        self.support_[rounds[best]['features']] = True
+        self.n_features_ = int(self.support_.sum())
+        # Selected features are ranked 1, then the later a feature was dropped the better its rank
+        self.ranking_ = np.where(self.support_, 1, best + 2 - dropped_in)
+        self.cv_results_ = {
+            'n_features': np.array([len(selection_round['features']) for selection_round in rounds]),
+            'mean_test_score': np.array([selection_round['scores'].mean() for selection_round in rounds]),
+            'std_test_score': np.array([selection_round['scores'].std() for selection_round in rounds]),
+            **{f'split{fold}_test_score': np.array([selection_round['scores'][fold] for selection_round in rounds]) for fold in range(len(splits))},
+        }
+        return self
+
+    def get_support(self, indices: bool = False) -> np.ndarray:
+        return np.flatnonzero(self.support_) if indices else self.support_
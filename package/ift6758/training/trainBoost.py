@@ -1,9 +1,12 @@
 import pickle
+import time
 import matplotlib.pyplot as plt
-from sklearn.model_selection import RandomizedSearchCV, RepeatedStratifiedKFold
+from sklearn.model_selection import RepeatedStratifiedKFold
 from sklearn.feature_selection import RFECV
 from sklearn.metrics import accuracy_score
 from sklearn.linear_model import LassoCV
+from ift6758.training.search import HalvingSearch
+from ift6758.training.selection import FastFeatureSelector
 
 class AdvancedModel():
     def __init__(self, clf):
@@ -21,24 +24,41 @@ class AdvancedModel():
     def get_pred_proba(self, X_val):
         return self.clf.predict_proba(X_val)[:, 1]
         
-    def cross_val(self, param_grid, X_train, y_train):
+    def cross_val(self, param_grid, X_train, y_train, n_iter = 10, n_jobs = -1, results_path = None, halving_factor = None):
+        """
+            Random search of the hyperparameters, folds fitted in parallel on n_jobs cores (see HalvingSearch).
+            Trials are saved to results_path as they finish so an interrupted search resumes,
+            and a halving_factor (e.g. 3) only fits the best candidates on the whole folds.
+        """
         kfold = RepeatedStratifiedKFold(n_splits=  5, n_repeats = 3, random_state=42)
-        g_search = RandomizedSearchCV(estimator = self.clf, param_distributions = param_grid, scoring = 'accuracy', cv=kfold, n_iter = 10)
+        g_search = HalvingSearch(estimator = self.clf, param_distributions = param_grid, scoring = 'accuracy', cv=kfold, n_iter = n_iter,
+                                 factor = halving_factor, n_jobs = n_jobs, results_path = results_path)
         result = g_search.fit(X_train, y_train)
         self.best_params = result.best_params_
         self.cvResults = result.cv_results_
         return self.best_params
 
-    def featureSelect(self, X_train, y_train):
+    def featureSelect(self, X_train, y_train, fast = False, step = 0.2, importance = 'model', n_jobs = -1):
+        """
+            Selects features by recursive feature elimination, RFECV one feature at a time or, if fast,
+            FastFeatureSelector dropping a fraction step of them every round with folds fitted on n_jobs cores
+            and stopping once the score stops improving. Its wall-clock time is kept in self.selectTime.
+        """
+        start = time.perf_counter()
         #repeated stratified kfold since we have a class imbalance
         kfold = RepeatedStratifiedKFold(n_splits=5, n_repeats=3, random_state=42)
-        #rfecv Reverse Feature Elimination with cross fold validation for best number of features
-        rfecv = RFECV(estimator = self.clf, step=1, cv=kfold, scoring='accuracy')
+        if fast:
+            rfecv = FastFeatureSelector(estimator = self.clf, cv=kfold, scoring='accuracy', step=step, importance=importance, n_jobs=n_jobs)
+        else:
+            #rfecv Reverse Feature Elimination with cross fold validation for best number of features
+            rfecv = RFECV(estimator = self.clf, step=1, cv=kfold, scoring='accuracy')
         
         rfecv.fit(X_train, y_train)
         self.featScores = rfecv.cv_results_
         self.selectedFeatures = rfecv.get_support(indices=True)
         self.rfecv = rfecv
+        self.selectTime = time.perf_counter() - start
+        print(f"{type(rfecv).__name__} selected {len(self.selectedFeatures)} of {X_train.shape[1]} features in {self.selectTime:.1f}s")
             
         return X_train.iloc[:,self.selectedFeatures]
 
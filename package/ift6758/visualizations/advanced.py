@@ -1,6 +1,7 @@
 import pandas as pd
 from scipy import stats
 import numpy as np
+from ift6758.features.geometry import mirror_coordinates
 
 class AdvancedVisualization:
     def __init__(self, data_path:str):
@@ -14,8 +15,7 @@ class AdvancedVisualization:
         return pd.read_pickle(path)
     
     def adjust_coordinates(self, df:pd.DataFrame) -> pd.DataFrame:
-        df.loc[df['opposite_team_side'] == 'left', 'x'] = -df.loc[df['opposite_team_side'] == 'left', 'x']
-        df.loc[df['opposite_team_side'] == 'left', 'y'] = -df.loc[df['opposite_team_side'] == 'left', 'y']
+        df['x'], df['y'] = mirror_coordinates(df['opposite_team_side'], df['x'], df['y'])
         return df    
     
     def get_density_prob(self, xy_kde:np.ndarray, grid_size:int, df:pd.DataFrame, bw_size = None, isLeague = False):
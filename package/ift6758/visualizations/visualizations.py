@@ -1,20 +1,15 @@
 import pandas as pd
-import os
-
-def getdist(row)-> float:
-    leftgoal_x = -90.0
-    rightgoal_x = 90.0
-    if row['opposite_team_side']=='left':
-        return ((row['x']-leftgoal_x)**2+row['y']**2)**(1/2)
-    if row['opposite_team_side']=='right':
-        return ((row['x']-rightgoal_x)**2+row['y']**2)**(1/2)
-    else:
-        return None
+import numpy as np
+from ift6758.data.cleaning import cleaning_options
+from ift6758.data.dataset import cleaned_season_file
+from ift6758.features.binning import GoalRateBinning
+from ift6758.features.geometry import goal_distance
 
 class Visualizer:
     
-    def __init__(self, data_path:str, season:int):
-        self.df = pd.read_pickle(os.path.join(data_path, str(season), f'{season}.pkl'))
+    def __init__(self, data_path:str, season:int, cleaning:dict = None):
+        # Season cleaned with the default options of DataCleaner unless other ones are given
+        self.df = pd.read_pickle(cleaned_season_file(data_path, season, cleaning_options(**(cleaning or {}))[1]))
     
     def getShotProbabilities(self) -> pd.DataFrame:
         
@@ -38,7 +33,7 @@ class Visualizer:
         #now investigating the distances
         dfcop = self.df.copy()
         df_dist = dfcop.loc[:,['shot_type', 'event_type', 'x','y', 'opposite_team_side']]
-        df_dist['distance_from_net'] = df_dist.apply(getdist, axis = 1)
+        df_dist['distance_from_net'] = goal_distance(df_dist['opposite_team_side'], df_dist['x'], df_dist['y'], decimals=None)
         if(decision == 'GOAL'):
             df_goals = df_dist.loc[df_dist['event_type']=='GOAL']
             df_goals = df_goals.dropna()
@@ -53,30 +48,23 @@ class Visualizer:
     def getDistGoalProbabilities(self, bins: int)-> pd.DataFrame:
         dfcop = self.df.copy()
         df_dist = dfcop.loc[:,['shot_type', 'event_type', 'x','y', 'opposite_team_side']]
-        df_dist['distance_from_net'] = df_dist.apply(getdist, axis = 1)
+        df_dist['distance_from_net'] = goal_distance(df_dist['opposite_team_side'], df_dist['x'], df_dist['y'], decimals=None)
         df_dist = df_dist.dropna()
         #taking out the extreme cases
         df_dist = df_dist.loc[df_dist['distance_from_net']<=100.0]
-        #df of all shot distances
-        dfdist_all = df_dist.loc[:,['shot_type', 'event_type', 'distance_from_net']]
-        
-        #making bins for distances
-        dfdist_bins = pd.cut(x = dfdist_all['distance_from_net'].to_numpy(), bins=bins, include_lowest = False, right = True)
-        dfdist_all['dist_intervals'] = dfdist_bins
-        
-        #make a df with just the number of shots and their intervals
-        hist_dists = dfdist_all.groupby([pd.Grouper(key='dist_intervals', sort = True), 'shot_type']).distance_from_net.count().reset_index(name = 'Total Shots')
-        
-        #make bins for goal distances
-        df_goals = dfdist_all.loc[dfdist_all['event_type']=='GOAL']
-
-        df_counts = hist_dists.groupby(['dist_intervals'])['Total Shots'].sum().reset_index(name = 'Total_Shots')
-        arg = df_counts.Total_Shots.repeat(7).reset_index()
 
-        #make df with the distance intervals and the number of goals
-        hist_goaldists = df_goals.groupby([pd.Grouper(key = 'dist_intervals', sort = True),'shot_type']).distance_from_net.count().reset_index(name = 'Goals')
+        #goals and shots of every (distance interval, shot type) bin, counted in one pass, bins without goals included
+        binning = GoalRateBinning(df_dist, (df_dist['event_type'] == 'GOAL').to_numpy(), closed='right')
+        table = binning.table(('distance_from_net', 'shot_type'), (bins, None))
+        intervals, shot_types = table.labels
         
-        hist_goaldists['Total Shots'] = arg['Total_Shots']
+        hist_goaldists = pd.DataFrame({
+            'dist_intervals': intervals.repeat(len(shot_types)),
+            'shot_type': np.tile(shot_types, len(intervals)),
+            'Goals': table.goals.ravel(),
+            #all shots of the distance interval, whatever their type
+            'Total Shots': table.shots.sum(axis=1).repeat(len(shot_types)),
+        })
         hist_goaldists['Goals_over_Shots'] = hist_goaldists['Goals']/hist_goaldists['Total Shots']
         
         #returning a dataframe with the number of goals and total number of shots for each distance interval and the probability of that goal being that shot type
@@ -0,0 +1,65 @@
+import argparse
+import shutil
+import tempfile
+import time
+from package.ift6758.data import SeasonType
+from package.ift6758.data.acquisition import NHLGameData
+from package.ift6758.data.replay_server import ReplayServer
+
+
+def main(opts):
+    # Seasons cached as a single legacy pickle are split into per-game files the server can read
+    source = NHLGameData(opts.data_path, keep_in_memory=False)
+    for season_type in SeasonType:
+        source._get_from_cache(opts.season, season_type)
+
+    server = ReplayServer(opts.data_path, latency=opts.latency, error_rate=opts.error_rate, serve_schedule=not opts.probe, seed=0).start()
+    num_cached = sum(len(server.store.game_ids(opts.season, season_type)) for season_type in SeasonType)
+    print(f'Replaying {num_cached} games of season {opts.season} at {server.game_url}')
+
+    baseline = None
+    try:
+        for workers in opts.workers:
+            out_path = tempfile.mkdtemp()
+            try:
+                nhl_games_data = NHLGameData(out_path, base_url=server.game_url, workers=workers, max_requests_per_second=opts.rate_limit,
+                                             schedule_url=server.schedule_url)
+                start = time.perf_counter()
+                nhl_games_data.fetch_season(opts.season)
+                elapsed = time.perf_counter() - start
+            finally:
+                shutil.rmtree(out_path)
+
+            num_games = sum(len(games) for games in nhl_games_data.data[opts.season].values())
+            baseline = baseline or elapsed
+            print(f'workers={workers:3d}  games={num_games}  time={elapsed:7.2f}s  '
+                  f'throughput={num_games / elapsed:8.1f} games/s  speedup={baseline / elapsed:5.2f}x')
+    finally:
+        server.stop()
+    print(f'Server answers: {dict(server.stats)}')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_raw/', help='Raw cache folder that contains the season to replay')
+    parser.add_argument('--season', type=int, default=2016, help='Season to replay')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4, 8, 16], help='Worker counts to benchmark')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated latency of the replay server in seconds')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Probability of the replay server answering 429 or 503')
+    parser.add_argument('--probe', action='store_true', help='Do not serve the schedule so game IDs have to be probed')
+    parser.add_argument('--rate_limit', type=float, default=None, help='Per-host rate limit in requests per second')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
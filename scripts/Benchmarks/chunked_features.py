@@ -0,0 +1,64 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from package.ift6758.features import FeatureEng
+from package.ift6758.features.chunked import ChunkedFeatures, read_features
+
+
+def measure(compute):
+    # Peak of the memory allocated while computing (NumPy and pandas buffers included)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = compute()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(opts):
+    in_memory, elapsed, peak = measure(lambda: getattr(FeatureEng(opts.data_path), opts.function)(opts.start, opts.end))
+    print(f'in memory  rows={len(in_memory)}  time={elapsed:7.3f}s  peak={peak:8.1f} MB')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, 'features.parquet')
+        chunked = ChunkedFeatures(FeatureEng(opts.data_path), max_memory_mb=opts.max_memory_mb)
+        rows, elapsed, peak = measure(lambda: chunked.write(opts.function, opts.start, opts.end, output_file))
+        print(f'chunked    rows={rows}  time={elapsed:7.3f}s  peak={peak:8.1f} MB  (ceiling {opts.max_memory_mb} MB)')
+
+        # Chunked output must be exactly the in-memory one
+        try:
+            pd.testing.assert_frame_equal(read_features(output_file), in_memory.reset_index(drop=True))
+            print('identical=True')
+        except AssertionError as error:
+            print(f'identical=False\n{error}')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_clean/', help='Cleaned data folder, cleaned with keepPreviousEventInfo')
+    parser.add_argument('--function', type=str, default='features_2', help='FeatureEng feature function')
+    parser.add_argument('--start', type=int, default=2016, help='First season')
+    parser.add_argument('--end', type=int, default=2018, help='Last season (excluded)')
+    parser.add_argument('--max_memory_mb', type=float, default=1, help='Memory ceiling of a block of games, in MB')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import pandas as pd
+from package.ift6758.data import CLEANING_GAME_KEYS, SeasonType
+from package.ift6758.data.acquisition import NHLGameData
+from package.ift6758.data.cleaning import DataCleaner
+from package.ift6758.data.events import concat_events, memory_report
+
+
+def clean_objects(cleaner, games, keep_prev, power_play):
+    # What clean_season used to save: one dict per event, strings as Python objects and types inferred by pandas
+    season_events = []
+    for game_data in games:
+        season_events.extend(cleaner.extract_events(game_data, game_data['id'], True, keep_prev, power_play))
+    return cleaner.remove_bad_data(pd.DataFrame(season_events), keep_prev)
+
+
+def main(opts):
+    nhl_games_data = NHLGameData(opts.data_path, keep_in_memory=False)
+    cleaner = DataCleaner(nhl_games_data, tempfile.mkdtemp())
+
+    before = []
+    after = []
+    for season in opts.seasons:
+        for season_type in SeasonType:
+            nhl_games_data._get_from_cache(season, season_type)
+        games = nhl_games_data.iter_games(season, keys=CLEANING_GAME_KEYS)
+        before.append(clean_objects(cleaner, games, opts.keep_prev, opts.power_play))
+        after.append(cleaner.get_cleaned_data(season, keepPreviousEventInfo=opts.keep_prev, includePowerPlay=opts.power_play))
+
+    # Seasons put together the way FeatureEng._fetch_data used to, then the way it does now
+    before = pd.concat(before, ignore_index=True)
+    after = concat_events(after)
+    print(f'seasons={opts.seasons}  events={len(after)}')
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(memory_report({'before': before, 'after': after}))
+
+    file = os.path.join(cleaner.data_path_clean, 'reload.pkl')
+    after.to_pickle(file)
+    reloaded = pd.read_pickle(file)
+    same_types = all(reloaded[name].dtype == after[name].dtype for name in after.columns)
+    print(f'types preserved on reload: {same_types}')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_raw/', help='Raw cache folder')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[2016, 2017], help='Seasons to clean')
+    parser.add_argument('--keep_prev', action='store_true', help='Keep previous event info')
+    parser.add_argument('--power_play', action='store_true', help='Include power play info')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
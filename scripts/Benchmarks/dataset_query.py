@@ -0,0 +1,58 @@
+import argparse
+import time
+import pandas as pd
+from package.ift6758.data import SeasonType
+from package.ift6758.data.dataset import CleanedDataset, cleaned_season_file
+
+
+def read_pickles(data_path, seasons, columns):
+    # What FeatureEng._fetch_data used to do: whole seasons, filtered on game IDs turned into strings
+    dfs = []
+    key = CleanedDataset(data_path).key
+    for year in seasons:
+        df = pd.read_pickle(cleaned_season_file(data_path, year, key))
+        df['game_id'] = df['game_id'].astype(str)
+        df = df[df['game_id'].str.startswith(f'{year}02')]
+        df['game_id'] = df['game_id'].astype(int)
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True)[columns]
+
+
+def read_dataset(data_path, seasons, columns):
+    return CleanedDataset(data_path).read(seasons, [SeasonType.REGULAR], columns)
+
+
+def main(opts):
+    seasons = list(range(opts.start, opts.end))
+    baseline = None
+    for name, read in [('pickles', read_pickles), ('dataset', read_dataset)]:
+        start = time.perf_counter()
+        for _ in range(opts.repeat):
+            df = read(opts.data_path, seasons, opts.columns)
+        elapsed = (time.perf_counter() - start) / opts.repeat
+        baseline = baseline or elapsed
+        print(f'{name:8s} seasons={seasons}  columns={opts.columns}  events={len(df)}  time={elapsed * 1000:7.1f} ms  speedup={baseline / elapsed:5.2f}x')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_clean/', help='Cleaned data folder, with the pickles and the dataset')
+    parser.add_argument('--start', type=int, default=2016, help='First season')
+    parser.add_argument('--end', type=int, default=2020, help='Last season (excluded)')
+    parser.add_argument('--columns', type=str, nargs='+', default=['x', 'y', 'type'], help='Columns to read')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of reads to average')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
@@ -0,0 +1,74 @@
+import argparse
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from package.ift6758.data import CLEANING_GAME_KEYS, SeasonType
+from package.ift6758.data.acquisition import NHLGameData
+from package.ift6758.data.cleaning import DataCleaner
+from package.ift6758.data.events import EventBuilder
+
+
+def measure(clean):
+    start = time.perf_counter()
+    df = clean()
+    elapsed = time.perf_counter() - start
+
+    # Timed separately since tracing allocations slows cleaning down a lot
+    tracemalloc.start()
+    clean()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak / 2**20
+
+
+def clean_dicts(cleaner, games):
+    # What clean_season used to do: one dict per event, types inferred by pandas from the whole list
+    season_events = []
+    for game_data in games:
+        season_events.extend(cleaner.extract_events(game_data, game_data['id'], True, False, False))
+    return cleaner.remove_bad_data(pd.DataFrame(season_events))
+
+
+def clean_columns(cleaner, games):
+    builder = EventBuilder()
+    for game_data in games:
+        cleaner.extract_events(game_data, game_data['id'], True, False, False, builder=builder)
+    return cleaner.remove_bad_data(builder.to_frame())
+
+
+def main(opts):
+    nhl_games_data = NHLGameData(opts.data_path, keep_in_memory=False)
+    for season_type in SeasonType:
+        nhl_games_data._get_from_cache(opts.season, season_type)
+    # Games are decoded once up front so only event extraction is measured
+    games = list(nhl_games_data.iter_games(opts.season, keys=CLEANING_GAME_KEYS))
+    cleaner = DataCleaner(nhl_games_data, tempfile.mkdtemp())
+
+    baseline = None
+    for name, clean in [('list of dicts', clean_dicts), ('event builder', clean_columns)]:
+        df, elapsed, peak = measure(lambda: clean(cleaner, games))
+        baseline = baseline or elapsed
+        print(f'{name:15s} games={len(games)}  events={len(df)}  time={elapsed:6.2f}s  speedup={baseline / elapsed:5.2f}x  '
+              f'peak memory={peak:7.1f} MB  frame={df.memory_usage(deep=True).sum() / 2**20:6.1f} MB')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_raw/', help='Raw cache folder')
+    parser.add_argument('--season', type=int, default=2016, help='Season to clean')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
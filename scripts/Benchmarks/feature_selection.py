@@ -0,0 +1,51 @@
+import argparse
+import pandas as pd
+import xgboost as xgb
+from sklearn.datasets import make_classification
+from ift6758.training.trainBoost import AdvancedModel
+
+
+def main(opts):
+    # Class imbalance like goals among shots
+    X, y = make_classification(n_samples=opts.n_samples, n_features=opts.n_features, n_informative=opts.n_informative,
+                               weights=[0.9], random_state=0)
+    X = pd.DataFrame(X, columns=[f'feature_{i}' for i in range(opts.n_features)])
+
+    modes = [('fast', dict(fast=True, step=opts.step, importance=opts.importance))]
+    if not opts.skip_rfecv:
+        modes.insert(0, ('RFECV step=1', dict(fast=False)))
+
+    baseline = None
+    for name, options in modes:
+        model = AdvancedModel(xgb.XGBClassifier(n_jobs=1))
+        model.featureSelect(X, y, **options)
+        scores = model.featScores['mean_test_score']
+        fits = getattr(model.rfecv, 'n_fits_', None) or len(scores) * 15
+        baseline = baseline or model.selectTime
+        print(f'{name:13s} time={model.selectTime:8.1f}s  speedup={baseline / model.selectTime:6.1f}x  fits={fits:5d}  '
+              f'selected={len(model.selectedFeatures):3d}  best mean {scores.max():.4f}')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_samples', type=int, default=3000, help='Shots')
+    parser.add_argument('--n_features', type=int, default=20, help='Features')
+    parser.add_argument('--n_informative', type=int, default=5, help='Features that tell goals from shots')
+    parser.add_argument('--step', type=float, default=0.2, help='Fraction of the features the fast mode drops every round')
+    parser.add_argument('--importance', type=str, default='model', help="'model' or 'permutation' importances")
+    parser.add_argument('--skip_rfecv', action='store_true', help='Only run the fast mode')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
@@ -0,0 +1,68 @@
+import argparse
+import time
+import numpy as np
+from package.ift6758.features.geometry import goal_distance, mirror_coordinates, shot_angle
+from package.ift6758.features.ingenierie import FeatureEng, get_dist_goal
+
+
+def row_features(df):
+    # What features_2 used to do, one row at a time
+    distance = df.apply(lambda row: get_dist_goal(row['opposite_team_side'], row['x'], row['y']), axis=1)
+    prev_distance = df.apply(lambda row: get_dist_goal(row['opposite_team_side'], row['prev_x'], row['prev_y']), axis=1)
+    angle = np.where(distance == 0, 0, round(np.degrees(np.arcsin(df['y'] / distance)), 2))
+    prev_angle = np.where(prev_distance == 0, 0, round(np.degrees(np.arcsin(df['prev_y'] / prev_distance)), 2))
+    left = df['opposite_team_side'] == 'left'
+    x = np.where(left, -df['x'], df['x'])
+    y = np.where(left, -df['y'], df['y'])
+    return [distance, prev_distance, angle, prev_angle, x, y]
+
+
+def array_features(df):
+    distance = goal_distance(df['opposite_team_side'], df['x'], df['y'])
+    prev_distance = goal_distance(df['opposite_team_side'], df['prev_x'], df['prev_y'])
+    angle = shot_angle(df['y'], distance, decimals=2)
+    prev_angle = shot_angle(df['prev_y'], prev_distance, decimals=2)
+    x, y = mirror_coordinates(df['opposite_team_side'], df['x'], df['y'])
+    return [distance, prev_distance, angle, prev_angle, x, y]
+
+
+def main(opts):
+    df = FeatureEng(opts.data_path)._fetch_data(opts.start, opts.end, keepPlayoffs=True)
+
+    results = {}
+    baseline = None
+    for name, compute in [('row apply', row_features), ('numpy kernel', array_features)]:
+        start = time.perf_counter()
+        results[name] = compute(df)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f'{name:12s} events={len(df)}  time={elapsed:7.3f}s  speedup={baseline / elapsed:7.1f}x')
+
+    names = ['distance_goal', 'prev_distance_goal', 'angle_shot', 'prev_angle_shot', 'mirrored x', 'mirrored y']
+    for name, expected, result in zip(names, *results.values()):
+        expected = np.asarray(expected, dtype=np.float64)
+        # Missing values match missing values, everything else must be exactly equal
+        mismatches = np.sum(~((expected == result) | (np.isnan(expected) & np.isnan(result))))
+        print(f'{name:18s} mismatches={mismatches}')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_clean/', help='Cleaned data folder, cleaned with keepPreviousEventInfo')
+    parser.add_argument('--start', type=int, default=2016, help='First season')
+    parser.add_argument('--end', type=int, default=2017, help='Last season (excluded)')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
@@ -0,0 +1,74 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from package.ift6758.features.binning import GoalRateBinning
+from package.ift6758.features.ingenierie import FeatureEng
+
+
+def cut_counts(df, columns, resolution):
+    # What getProbabilities used to do: pd.cut every feature, then group the shots and the goals apart
+    cuts = [pd.cut(df[column].to_numpy(), bins=bins, include_lowest=True, right=False) for column, bins in zip(columns, resolution)]
+    shots = df.groupby(cuts, observed=False)['is_goal'].count()
+    goals = df.loc[df['is_goal'] == 1].groupby([cut[df['is_goal'].to_numpy() == 1] for cut in cuts], observed=False)['is_goal'].count()
+    shape = [len(cut.categories) for cut in cuts]
+    return shots.to_numpy().reshape(shape), goals.reindex(shots.index, fill_value=0).to_numpy().reshape(shape)
+
+
+def main(opts):
+    df = FeatureEng(opts.data_path).features_1(opts.start, opts.end)
+    if opts.random_goals:
+        df['is_goal'] = (np.random.default_rng(0).random(len(df)) < 0.1).astype(int)
+
+    grids = {
+        ('distance_goal',): [(bins,) for bins in opts.bins],
+        ('angle_shot',): [(bins,) for bins in opts.bins],
+        ('distance_goal', 'angle_shot'): [(bins, bins) for bins in opts.bins if bins <= 50],
+    }
+    num_tables = sum(len(resolutions) for resolutions in grids.values())
+
+    start = time.perf_counter()
+    expected = {(columns, resolution): cut_counts(df, columns, resolution) for columns, resolutions in grids.items() for resolution in resolutions}
+    baseline = time.perf_counter() - start
+    print(f'pd.cut + groupby  shots={len(df)}  tables={num_tables}  time={baseline:7.3f}s')
+
+    start = time.perf_counter()
+    binning = GoalRateBinning(df, 'is_goal')
+    tables = {(columns, resolution): table for columns, resolutions in grids.items() for resolution, table in binning.tables(columns, resolutions).items()}
+    elapsed = time.perf_counter() - start
+    print(f'bincount engine   shots={len(df)}  tables={num_tables}  time={elapsed:7.3f}s  speedup={baseline / elapsed:7.1f}x')
+
+    start = time.perf_counter()
+    for columns, resolutions in grids.items():
+        binning.tables(columns, resolutions)
+    print(f'cached tables     time={time.perf_counter() - start:7.4f}s')
+
+    mismatches = sum(
+        np.sum(shots != tables[key].shots) + np.sum(goals != tables[key].goals)
+        for key, (shots, goals) in expected.items()
+    )
+    print(f'mismatches={mismatches}')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_clean/', help='Cleaned data folder')
+    parser.add_argument('--start', type=int, default=2016, help='First season')
+    parser.add_argument('--end', type=int, default=2018, help='Last season (excluded)')
+    parser.add_argument('--bins', type=int, nargs='+', default=[5, 10, 20, 25, 50, 100], help='Numbers of bins to count')
+    parser.add_argument('--random_goals', action='store_true', help='Draw is_goal at random, for data where it is never set')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
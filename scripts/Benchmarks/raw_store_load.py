@@ -0,0 +1,66 @@
+import argparse
+import time
+import tracemalloc
+from package.ift6758.data import CLEANING_GAME_KEYS, SeasonType
+from package.ift6758.data.acquisition import NHLGameData
+
+
+def measure(load):
+    start = time.perf_counter()
+    num_games = load()
+    elapsed = time.perf_counter() - start
+
+    # Timed separately since tracing allocations slows the load down a lot
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return num_games, elapsed, peak / 2**20
+
+
+def load_all(nhl_games_data, seasons):
+    # What cleaning used to do: every game of every season fully decoded and kept in memory
+    games = [nhl_games_data.load_games(season, season_type) for season in seasons for season_type in SeasonType]
+    return sum(len(season_games) for season_games in games)
+
+
+def iter_cleaning_keys(nhl_games_data, seasons):
+    num_games = 0
+    for season in seasons:
+        for game in nhl_games_data.iter_games(season, keys=CLEANING_GAME_KEYS):
+            num_games += 1
+    return num_games
+
+
+def main(opts):
+    nhl_games_data = NHLGameData(opts.data_path, keep_in_memory=False)
+    seasons = range(opts.start_season, opts.end_season)
+    for season in seasons:
+        for season_type in SeasonType:
+            nhl_games_data._get_from_cache(season, season_type)
+
+    for name, load in [('full load', load_all), ('lazy, cleaning keys', iter_cleaning_keys)]:
+        num_games, elapsed, peak = measure(lambda: load(nhl_games_data, seasons))
+        print(f'{name:20s} games={num_games}  time={elapsed:6.2f}s  peak memory={peak:8.1f} MB')
+
+
+def parse_opts(known=False):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_path', type=str, default='./ift6758/data/json_raw/', help='Raw cache folder')
+    parser.add_argument('--start_season', type=int, default=2016, help='First season to load')
+    parser.add_argument('--end_season', type=int, default=2021, help='Season after the last one to load')
+
+    return parser.parse_known_args()[0] if known else parser.parse_args()
+
+
+def run(**kwargs):
+    opts = parse_opts(True)
+    for k, v in kwargs.items():
+        setattr(opts, k, v)
+    main(opts)
+    return opts
+
+
+if __name__ == '__main__':
+    opts = parse_opts()
+    main(opts)
@@ -5,6 +5,7 @@ import pandas as pd
 from comet_ml import Experiment
 import os
 from ift6758.training.train import BasicModel
+from ift6758.features import ENCODER_FILE, CategoryEncoder, FeatureEng, FeatureStore
 
 def main(opts):
     # Create train folder
@@ -12,13 +13,25 @@ def main(opts):
         os.makedirs(os.path.join(opts.exp_path, opts.exp_name))
 
     # Get Data
-    train_val = pd.read_pickle(opts.data_path)
+    store = FeatureStore(FeatureEng(opts.clean_path), opts.store_path)
+    if opts.feature_key:
+        train_val = store.load(opts.feature_key, opts.start_year, opts.end_year)
+    elif opts.feature_set == 'features':
+        # Only computes the features the model is trained with, see FeatureGraph
+        train_val = store.get('features', opts.start_year, opts.end_year, names=opts.use_features + ['is_goal'])
+    else:
+        train_val = store.get(opts.feature_set, opts.start_year, opts.end_year)
     X_all = train_val.drop(['is_goal'], axis=1)[opts.use_features]
     y_all = train_val['is_goal']
 
     # Split into train val
     X_train, X_val, y_train, y_val = train_test_split(X_all, y_all, test_size=0.3, random_state=42)
 
+    # Encode with a layout fixed on the train set, saved with the model so serving encodes shots the same way
+    encoder = CategoryEncoder().fit(X_train, opts.categorical_features)
+    X_train = encoder.transform(X_train)
+    X_val = encoder.transform(X_val)
+
     # Setup Experiment
     exp = Experiment(
         api_key=os.environ.get('COMET_API_KEY'),
@@ -43,15 +56,24 @@ def main(opts):
     model_path = os.path.join(opts.exp_path, opts.exp_name, 'model.pkl')
     model.save(model_path)
     exp.log_model('Model', model_path)
+    encoder_path = os.path.join(opts.exp_path, opts.exp_name, ENCODER_FILE)
+    encoder.save(encoder_path)
+    exp.log_model('Model', encoder_path)
 
     exp.end()
 
 def parse_opts(known=False):
     parser = argparse.ArgumentParser()
-    parser.add_argument('--data_path', type=str, default= './ift6758/features/trainVal/TrainValSets.pk', help='Data path that contains train and val data')
+    parser.add_argument('--clean_path', type=str, default= './ift6758/data/json_clean/', help='Cleaned data folder the features are computed from')
+    parser.add_argument('--store_path', type=str, default= './ift6758/features/store/', help='Feature store folder')
+    parser.add_argument('--feature_set', type=str, default= 'features_1', help="FeatureEng function of the train and val data, 'features' for only use_features")
+    parser.add_argument('--feature_key', type=str, default= None, help='Key of a stored feature set, instead of feature_set')
+    parser.add_argument('--start_year', type=int, default= 2016, help='First season of the train and val data')
+    parser.add_argument('--end_year', type=int, default= 2020, help='Last season of the train and val data (excluded)')
     parser.add_argument('--exp_path', type=str, default= './train/', help='Experience path of parent folder')
     parser.add_argument('--exp_name', type=str, default= 'exp', help='Experience name for comet ml')
     parser.add_argument('--use_features', nargs='+', type=str, default= '[distance]', help='Feature to train LogisticRegression with')
+    parser.add_argument('--categorical_features', nargs='+', type=str, default= None, help='Features to one-hot encode, by default the categorical columns')
     
     return parser.parse_known_args()[0] if known else parser.parse_args()
 
@@ -8,6 +8,7 @@ import torch.nn as nn
 import pandas as pd
 import os
 from ift6758.training.net_model import Net
+from ift6758.features import ENCODER_FILE, CategoryEncoder, FeatureEng, FeatureStore
 from torch.utils.data import TensorDataset, DataLoader
 import numpy as np
 
@@ -75,7 +76,7 @@ def val_mlp(model, criterion, val_loader):
 
     return val_loss, probabilities
 
-def run_nn_config(model_name, hidden_layers, input_shape, train_loader, val_loader, y_val, exp_folder):
+def run_nn_config(model_name, hidden_layers, input_shape, train_loader, val_loader, y_val, exp_folder, encoder):
     print(f'------ Training nn model: {model_name} ------')
     # Setup Experiment
     exp = Experiment(
@@ -118,6 +119,9 @@ def run_nn_config(model_name, hidden_layers, input_shape, train_loader, val_load
     model_path = os.path.join(model_folder, 'model.pt')
     torch.save(model.state_dict(), model_path)
     exp.log_model('Model', model_path)
+    encoder_path = os.path.join(model_folder, ENCODER_FILE)
+    encoder.save(encoder_path)
+    exp.log_model('Model', encoder_path)
     id = np.argmax(f1_scores)
     exp.log_metric('Accuracy', accuracy_scores[id])
     exp.log_metric('Recall', recall_scores[id])
@@ -132,18 +136,25 @@ def main(opts):
         os.makedirs(exp_folder)
 
     # Get Data
-    train_val = pd.read_pickle(opts.data_path)
+    store = FeatureStore(FeatureEng(opts.clean_path), opts.store_path)
+    if opts.feature_key:
+        train_val = store.load(opts.feature_key, opts.start_year, opts.end_year)
+    else:
+        train_val = store.get(opts.feature_set, opts.start_year, opts.end_year)
     X_all = train_val.drop(['is_goal'], axis=1)
     y_all = train_val['is_goal']
     
     # Split into train val
     X_train, X_val, y_train, y_val = train_test_split(X_all, y_all, test_size=0.3, random_state=42)
 
+    # One-hot encode the categorical features with a layout fixed on the train set
+    encoder = CategoryEncoder().fit(X_train)
+
     # Create dataloaders for NN
     # Feature Scaling
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_val_scaled = scaler.transform(X_val)
+    X_train_scaled = scaler.fit_transform(encoder.transform(X_train, dense=True))
+    X_val_scaled = scaler.transform(encoder.transform(X_val, dense=True))
 
     # Converting to PyTorch tensors
     X_train_tensor = torch.tensor(X_train_scaled, dtype=torch.float32)
@@ -162,12 +173,17 @@ def main(opts):
 
     # Train NN models
     for (model_name, hidden_layers) in nn_configs.items():
-        run_nn_config(model_name, hidden_layers, X_train.shape[1], train_loader, val_loader, y_val, exp_folder)
+        run_nn_config(model_name, hidden_layers, X_train_scaled.shape[1], train_loader, val_loader, y_val, exp_folder, encoder)
 
     
 def parse_opts(known=False):
     parser = argparse.ArgumentParser()
-    parser.add_argument('--data_path', type=str, default= './notebooks/Milestone2/TrainValSets2.pkl', help='Data path that contains train and val data')
+    parser.add_argument('--clean_path', type=str, default= './ift6758/data/json_clean/', help='Cleaned data folder the features are computed from')
+    parser.add_argument('--store_path', type=str, default= './ift6758/features/store/', help='Feature store folder')
+    parser.add_argument('--feature_set', type=str, default= 'features_2', help='FeatureEng function of the train and val data')
+    parser.add_argument('--feature_key', type=str, default= None, help='Key of a stored feature set, instead of feature_set')
+    parser.add_argument('--start_year', type=int, default= 2016, help='First season of the train and val data')
+    parser.add_argument('--end_year', type=int, default= 2020, help='Last season of the train and val data (excluded)')
     parser.add_argument('--exp_path', type=str, default= './train/', help='Experience path of parent folder')
     parser.add_argument('--exp_name', type=str, default= 'exp', help='Experience name for comet ml')
     
@@ -1,7 +1,9 @@
 import pandas as pd
 import json
+from ift6758.features import FeatureEng, FeatureStore
 
-df = pd.read_pickle('./ift6758/features/TrainValSets.pkl')
+store = FeatureStore(FeatureEng('./ift6758/data/json_clean/'), './ift6758/features/store/')
+df = store.get('features_1', 2016, 2020)
 json_data_test = df.iloc[3:5].to_json()
 
 #json_data = json.loads('{"empty_net":{"3":0,"4":0},"is_goal":{"3":0,"4":0},"distance":{"3":58.9406481132,"4":62.60990337},"angle":{"3":-14.7435628365,"4":26.5650511771}}')
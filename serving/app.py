@@ -15,6 +15,7 @@ app = Flask(__name__)
 
 # Global variables
 model = None
+encoder = None
 workspace='ift6758-a5-nhl'
 model_list = None
 data_dir = './download'
@@ -30,13 +31,14 @@ def before_first_request():
     Hook to handle any initialization before the first request (e.g. load model,
     setup logging handler, etc.)
     """    
-    global model, comet_api
+    global model, encoder, comet_api
 
     # Initialization before the first request
     comet_api = CometMLClient(workspace=workspace, data_dir=data_dir)
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
     model = comet_api.get_model(model_name=default_model, logger=app.logger)
+    encoder = comet_api.get_encoder(model_name=default_model, logger=app.logger)
 
 @app.route("/logs", methods=["GET"])
 def logs():
@@ -69,7 +71,7 @@ def download_registry_model():
         }
     
     """
-    global model
+    global model, encoder
 
     # Get POST json data
     json_request = request.get_json()
@@ -80,6 +82,7 @@ def download_registry_model():
 
     if new_model is not None:
         model = new_model
+        encoder = comet_api.get_encoder(model_name=json_request['version'], logger=app.logger)
         response = {
             "message": "Model loaded successfully"
         }
@@ -100,17 +103,23 @@ def predict():
 
     Returns predictions
     """
-    global model
+    global model, encoder
 
     # Get POST json data
     json_data = request.get_json()
     app.logger.info(json_data)
 
-    # Load JSON data into a DataFrame
-    df = pd.read_json(json_data, orient='split')
+    if encoder is not None:
+        # Encode the columns of the payload with the layout the model was trained on,
+        # dense so tree models never take a 0 for a missing value
+        payload = json.loads(json_data)
+        X = encoder.transform(dict(zip(payload['columns'], zip(*payload['data']))), dense=True)
+    else:
+        # Load JSON data into a DataFrame
+        X = pd.read_json(json_data, orient='split')
 
     # Perform predictions using the loaded model
-    predictions = model.predict_proba(df)
+    predictions = model.predict_proba(X)
 
     response = {
         'predictions': predictions.tolist()